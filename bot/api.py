@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, time
+from typing import Optional
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+from bot.config import Config
+from bot.db import RESERVATION_DURATION, SLOT_STEP, fetch_free_slots
+
+
+log = logging.getLogger(__name__)
+
+MAX_GUESTS = 20
+DEFAULT_DAYS = 14
+MAX_DAYS = 31
+
+CONFIG_KEY = web.AppKey("config", Config)
+
+
+def _allowed_origin(config: Config) -> str:
+    """Origin of the Mini App page; any origin when WEBAPP_URL is not set."""
+
+    if not config.webapp_url:
+        return "*"
+    parts = urlsplit(config.webapp_url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+@web.middleware
+async def _cors(request: web.Request, handler) -> web.StreamResponse:
+    if request.method == "OPTIONS":
+        response: web.StreamResponse = web.Response(status=204)
+    else:
+        response = await handler(request)
+    response.headers["Access-Control-Allow-Origin"] = _allowed_origin(request.app[CONFIG_KEY])
+    response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    response.headers["Vary"] = "Origin"
+    return response
+
+
+def _int_param(request: web.Request, name: str, default: int, lo: int, hi: int) -> int:
+    raw = request.query.get(name, "").strip()
+    try:
+        value = int(raw) if raw else default
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name} must be an integer")
+    if not lo <= value <= hi:
+        raise web.HTTPBadRequest(text=f"{name} must be between {lo} and {hi}")
+    return value
+
+
+async def availability(request: web.Request) -> web.Response:
+    """GET /api/availability?guests=2&days=14
+
+    Free start times per day for the party, ready to render as a picker.
+    """
+
+    config = request.app[CONFIG_KEY]
+    guests = _int_param(request, "guests", 2, 1, MAX_GUESTS)
+    days = _int_param(request, "days", DEFAULT_DAYS, 1, MAX_DAYS)
+
+    now = datetime.now()
+    today = now.date()
+    slots = await fetch_free_slots(config.db_path, guests, today, days)
+
+    def is_future(day: date, t: time) -> bool:
+        return datetime.combine(day, t) > now
+
+    payload = {
+        "guests": guests,
+        "slot_minutes": int(SLOT_STEP.total_seconds() // 60),
+        "duration_minutes": int(RESERVATION_DURATION.total_seconds() // 60),
+        "days": [
+            {
+                "date": day.isoformat(),
+                "slots": [t.strftime("%H:%M") for t in times if is_future(day, t)],
+            }
+            for day, times in slots.items()
+        ],
+    }
+    return web.json_response(payload, headers={"Cache-Control": "no-store"})
+
+
+def build_api_app(config: Config) -> web.Application:
+    app = web.Application(middlewares=[_cors])
+    app[CONFIG_KEY] = config
+    app.router.add_get("/api/availability", availability)
+    return app
+
+
+async def start_api(config: Config) -> Optional[web.AppRunner]:
+    """Serve the availability API on API_HOST:API_PORT; None when API_PORT is unset."""
+
+    if config.api_port is None:
+        return None
+    runner = web.AppRunner(build_api_app(config), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, config.api_host, config.api_port)
+    await site.start()
+    log.info("Availability API listening on %s:%s", config.api_host, config.api_port)
+    return runner
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import os
+import re
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 from dotenv import load_dotenv
 
@@ -14,11 +16,68 @@ class Config:
     admin_chat_id: Optional[int]
     admin_user_ids: frozenset[int]
     db_path: str
+    db_pool_size: int
+    db_report_pool_size: int
+    db_write_batch_ms: float
     hall_plan_path: str
+    hall_layout_path: str
     webapp_url: Optional[str]
+    api_host: str
+    api_port: Optional[int]
+    api_public_url: Optional[str]
+    bot_mode: str
+    webhook_url: Optional[str]
+    webhook_path: str
+    webhook_secret: Optional[str]
+    webhook_host: str
+    webhook_port: int
+    webhook_max_connections: int
+    update_concurrency: int
+    reservation_confirm_timeout_min: int
+    event_loop: str
+    bot_http_timeout: float
+    bot_http_upload_timeout: float
+    bot_http_method_timeouts: dict[str, float]
+    notify_global_rate: float
+    notify_chat_rate: float
+    notify_group_rate_per_min: float
+    outbox_batch_size: int
+    outbox_max_attempts: int
+    outbox_warn_depth: int
 
+    @property
+    def webapp_launch_url(self) -> Optional[str]:
+        """WEBAPP_URL with the availability API address passed as `?api=`."""
+
+        if not self.webapp_url or not self.api_public_url:
+            return self.webapp_url
+        parts = urlsplit(self.webapp_url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        query.append(("api", self.api_public_url))
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+BOT_MODES = ("polling", "webhook")
+EVENT_LOOPS = ("auto", "asyncio", "uvloop")
+
+
+def parse_method_timeouts(raw: str) -> dict[str, float]:
+    """"sendPhoto=120, answerCallbackQuery=5" -> {"sendPhoto": 120.0, ...}"""
+
+    timeouts: dict[str, float] = {}
+    for part in raw.replace(";", ",").split(","):
+        if not part.strip():
+            continue
+        method, sep, seconds = part.partition("=")
+        if not sep or not method.strip():
+            raise RuntimeError(f"BOT_HTTP_TIMEOUTS: expected method=seconds, got {part.strip()!r}")
+        timeouts[method.strip()] = float(seconds)
+    return timeouts
+
+
+def load_config(*, bot_mode: Optional[str] = None) -> Config:
+    """Read .env/environment; `bot_mode` (from the command line) overrides BOT_MODE."""
 
-def load_config() -> Config:
     load_dotenv()
 
     bot_token = os.getenv("BOT_TOKEN", "").strip()
@@ -38,7 +97,11 @@ def load_config() -> Config:
             admin_user_ids.add(int(p))
 
     db_path = os.getenv("DB_PATH", "data/cafe.db").strip()
+    db_pool_size = int(os.getenv("DB_POOL_SIZE", "").strip() or 4)
+    db_report_pool_size = int(os.getenv("DB_REPORT_POOL_SIZE", "").strip() or 2)
+    db_write_batch_ms = float(os.getenv("DB_WRITE_BATCH_MS", "").strip() or 2)
     hall_plan_path = os.getenv("HALL_PLAN_PATH", "assets/hall_plan.png").strip()
+    hall_layout_path = os.getenv("HALL_LAYOUT_PATH", "assets/hall_layout.json").strip()
     webapp_url = os.getenv("WEBAPP_URL", "").strip() or None
     if webapp_url and not webapp_url.startswith("https://"):
         raise RuntimeError(
@@ -46,12 +109,89 @@ def load_config() -> Config:
             "For local dev, use a tunnel like ngrok/Cloudflare Tunnel."
         )
 
+    api_host = os.getenv("API_HOST", "").strip() or "127.0.0.1"
+    api_port_raw = os.getenv("API_PORT", "").strip()
+    api_port = int(api_port_raw) if api_port_raw else None
+    api_public_url = os.getenv("API_PUBLIC_URL", "").strip().rstrip("/") or None
+    if api_public_url and not api_public_url.startswith("https://"):
+        raise RuntimeError(
+            "API_PUBLIC_URL must start with https:// (the Mini App is served over HTTPS)."
+        )
+
+    bot_mode = (bot_mode or os.getenv("BOT_MODE", "").strip() or "polling").lower()
+    if bot_mode not in BOT_MODES:
+        raise RuntimeError(f"BOT_MODE must be one of: {', '.join(BOT_MODES)}")
+    webhook_url = os.getenv("WEBHOOK_URL", "").strip().rstrip("/") or None
+    if webhook_url and not webhook_url.startswith("https://"):
+        raise RuntimeError("WEBHOOK_URL must start with https:// (Telegram only calls HTTPS webhooks).")
+    webhook_path = os.getenv("WEBHOOK_PATH", "").strip() or "/telegram/webhook"
+    if not webhook_path.startswith("/"):
+        webhook_path = "/" + webhook_path
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "").strip() or None
+    if bot_mode == "webhook" and not webhook_secret:
+        raise RuntimeError("WEBHOOK_SECRET is not set. It is required in webhook mode")
+    if webhook_secret and not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", webhook_secret):
+        raise RuntimeError("WEBHOOK_SECRET may only contain A-Z, a-z, 0-9, _ and - (up to 256 chars)")
+    webhook_host = os.getenv("WEBHOOK_HOST", "").strip() or "0.0.0.0"
+    webhook_port = int(os.getenv("WEBHOOK_PORT", "").strip() or 8080)
+    webhook_max_connections = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "").strip() or 40)
+    if not 1 <= webhook_max_connections <= 100:
+        raise RuntimeError("WEBHOOK_MAX_CONNECTIONS must be between 1 and 100")
+    update_concurrency = int(os.getenv("UPDATE_CONCURRENCY", "").strip() or 64)
+    if update_concurrency < 1:
+        raise RuntimeError("UPDATE_CONCURRENCY must be at least 1")
+    reservation_confirm_timeout_min = int(os.getenv("RESERVATION_CONFIRM_TIMEOUT_MIN", "").strip() or 0)
+    if reservation_confirm_timeout_min < 0:
+        raise RuntimeError("RESERVATION_CONFIRM_TIMEOUT_MIN must be 0 (off) or a number of minutes")
+    event_loop = (os.getenv("EVENT_LOOP", "").strip() or "auto").lower()
+    if event_loop not in EVENT_LOOPS:
+        raise RuntimeError(f"EVENT_LOOP must be one of: {', '.join(EVENT_LOOPS)}")
+    bot_http_timeout = float(os.getenv("BOT_HTTP_TIMEOUT", "").strip() or 20)
+    bot_http_upload_timeout = float(os.getenv("BOT_HTTP_UPLOAD_TIMEOUT", "").strip() or 120)
+    bot_http_method_timeouts = parse_method_timeouts(os.getenv("BOT_HTTP_TIMEOUTS", ""))
+    notify_global_rate = float(os.getenv("NOTIFY_GLOBAL_RATE", "").strip() or 30)
+    notify_chat_rate = float(os.getenv("NOTIFY_CHAT_RATE", "").strip() or 1)
+    notify_group_rate_per_min = float(os.getenv("NOTIFY_GROUP_RATE_PER_MIN", "").strip() or 20)
+    outbox_batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", "").strip() or 50)
+    if outbox_batch_size < 1:
+        raise RuntimeError("OUTBOX_BATCH_SIZE must be at least 1")
+    outbox_max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "").strip() or 10)
+    if outbox_max_attempts < 1:
+        raise RuntimeError("OUTBOX_MAX_ATTEMPTS must be at least 1")
+    outbox_warn_depth = int(os.getenv("OUTBOX_WARN_DEPTH", "").strip() or 20)
+
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
     return Config(
         bot_token=bot_token,
         admin_chat_id=admin_chat_id,
         admin_user_ids=frozenset(admin_user_ids),
         db_path=db_path,
+        db_pool_size=db_pool_size,
+        db_report_pool_size=db_report_pool_size,
+        db_write_batch_ms=db_write_batch_ms,
         hall_plan_path=hall_plan_path,
+        hall_layout_path=hall_layout_path,
         webapp_url=webapp_url,
+        api_host=api_host,
+        api_port=api_port,
+        api_public_url=api_public_url,
+        bot_mode=bot_mode,
+        webhook_url=webhook_url,
+        webhook_path=webhook_path,
+        webhook_secret=webhook_secret,
+        webhook_host=webhook_host,
+        webhook_port=webhook_port,
+        webhook_max_connections=webhook_max_connections,
+        update_concurrency=update_concurrency,
+        reservation_confirm_timeout_min=reservation_confirm_timeout_min,
+        event_loop=event_loop,
+        bot_http_timeout=bot_http_timeout,
+        bot_http_upload_timeout=bot_http_upload_timeout,
+        bot_http_method_timeouts=bot_http_method_timeouts,
+        notify_global_rate=notify_global_rate,
+        notify_chat_rate=notify_chat_rate,
+        notify_group_rate_per_min=notify_group_rate_per_min,
+        outbox_batch_size=outbox_batch_size,
+        outbox_max_attempts=outbox_max_attempts,
+        outbox_warn_depth=outbox_warn_depth,
     )
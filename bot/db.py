@@ -1,15 +1,60 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, TypeVar
 
 import aiosqlite
 
+from bot.dbpool import ConnectionPool, apply_pragmas
+from bot.dbwriter import WriteFn, WriteQueue
+from bot.migrations import migrate
+from bot.occupancy import OccupancyIndex
+from bot.seating import Hall, best_fit, table_groups
+
 
 SCHEMA_PATH = Path(__file__).with_name("schema.sql")
 
+# How long a booking holds its table.
+RESERVATION_DURATION = timedelta(hours=2, minutes=15)
+# Reservations in these statuses block their table.
+ACTIVE_RESERVATION_STATUSES = ("pending", "confirmed")
+# Moving a reservation to one of these hands its table to the waitlist.
+FREEING_RESERVATION_STATUSES = ("canceled", "no_show", "expired")
+# Opening hours, used to estimate how many bookings a table takes per day.
+OPENING_TIME = time(12, 0)
+CLOSING_TIME = time(23, 0)
+
+# Background jobs (see bot/scheduler.py and bot/jobs.py), scheduled in the
+# same transaction as the booking/order they watch.
+JOB_RESERVATION_EXPIRE = "reservation_expire"
+JOB_RESERVATION_NO_SHOW = "reservation_no_show"
+JOB_ORDER_STALE = "order_stale"
+# A confirmed guest not seated this long after the start is a no-show.
+NO_SHOW_GRACE = timedelta(minutes=20)
+# Admins are reminded about orders still 'new' after this long.
+ORDER_STALE_AFTER = timedelta(minutes=15)
+
+T = TypeVar("T")
+
+_pools: dict[str, ConnectionPool] = {}
+_report_pools: dict[str, ConnectionPool] = {}
+_writers: dict[str, WriteQueue] = {}
+_catalogs: dict[str, MenuCatalog] = {}
+_catalog_locks: dict[str, asyncio.Lock] = {}
+_occupancy: dict[str, OccupancyIndex] = {}
+_halls: dict[str, Hall] = {}
+_month_load: dict[str, dict[tuple[int, int], dict[date, float]]] = {}
+# db_path -> (guests, first day, days) -> free start times per day
+_free_slots: dict[str, dict[tuple[int, date, int], dict[date, list[time]]]] = {}
+_job_listeners: dict[str, Callable[[list[ScheduledJob]], None]] = {}
+_outbox_listeners: dict[str, Callable[[], None]] = {}
+# db_path -> seconds a pending booking may wait for an admin to confirm it
+_confirm_timeouts: dict[str, int] = {}
+
 
 def reference_menu_items() -> list[tuple[str, str, str, int]]:
     # Prices are stored in kopeks (RUB * 100)
@@ -88,6 +133,43 @@ class MenuItem:
     is_active: int
 
 
+@dataclass(frozen=True)
+class MenuCatalog:
+    """In-memory snapshot of menu_item.
+
+    The menu changes a few times a day but is read on every tap, so reads are
+    served from this snapshot. Writers rebuild it and swap the reference, which
+    keeps readers lock-free.
+    """
+
+    by_id: dict[int, MenuItem]
+    # Active items only; the newest row wins, like the old ORDER BY id DESC lookup.
+    by_category_title: dict[tuple[str, str], MenuItem]
+    by_category: dict[str, list[MenuItem]]
+    categories: list[str]
+
+    @classmethod
+    def from_items(cls, items: list[MenuItem]) -> MenuCatalog:
+        by_id: dict[int, MenuItem] = {}
+        by_category_title: dict[tuple[str, str], MenuItem] = {}
+        by_category: dict[str, list[MenuItem]] = {}
+        for item in sorted(items, key=lambda it: it.id):
+            by_id[item.id] = item
+            if not item.is_active:
+                continue
+            by_category_title[(item.category, item.title)] = item
+            by_category.setdefault(item.category, []).append(item)
+        return cls(
+            by_id=by_id,
+            by_category_title=by_category_title,
+            by_category=by_category,
+            categories=sorted(by_category),
+        )
+
+    def active_items(self) -> list[MenuItem]:
+        return [it for cat in self.categories for it in self.by_category[cat]]
+
+
 @dataclass(frozen=True)
 class CafeTable:
     id: int
@@ -103,8 +185,8 @@ class CafeOrder:
     user_id: int
     type: str
     status: str
-    created_at: str
-    scheduled_for: Optional[str]
+    created_at: int
+    scheduled_for: Optional[int]
     name: str
     phone: str
     address: Optional[str]
@@ -112,30 +194,200 @@ class CafeOrder:
     total_cents: int
 
 
+@dataclass(frozen=True)
+class CartLine:
+    category: str
+    title: str
+    description: str
+    qty: int
+    price_cents: int
+
+
+@dataclass(frozen=True)
+class OrderLine:
+    menu_item_id: int
+    title: str
+    qty: int
+    price_cents: int
+
+
+@dataclass(frozen=True)
+class CheckoutResult:
+    order_id: int
+    total_cents: int
+    items: list[OrderLine]
+
+
+@dataclass(frozen=True)
+class TableAssignment:
+    # One reservation row per table; the first id is the booking number.
+    reservation_ids: list[int]
+    tables: list[CafeTable]
+    start_at: int
+    end_at: int
+
+    @property
+    def reservation_id(self) -> int:
+        return self.reservation_ids[0]
+
+
+@dataclass(frozen=True)
+class ScheduledJob:
+    id: int
+    kind: str
+    ref_id: int
+    due_at: int
+    attempts: int
+
+
+@dataclass(frozen=True)
+class OutboxMessage:
+    id: int
+    chat_id: int
+    text: str
+    attempts: int
+
+
+@dataclass(frozen=True)
+class WaitlistPromotion:
+    waitlist_id: int
+    user_id: int
+    guests: int
+    assignment: TableAssignment
+
+
 @dataclass(frozen=True)
 class Reservation:
     id: int
     user_id: int
     table_id: int
     table_code: str
-    start_at: str
-    end_at: str
+    start_at: int
+    end_at: int
     guests: int
     name: str
     phone: str
     status: str
-    created_at: str
+    created_at: int
+
+
+def _dt_to_ts(value: datetime) -> int:
+    # Naive datetimes are local wall-clock time throughout the bot.
+    return int(value.replace(microsecond=0).timestamp())
+
+
+async def open_pool(db_path: str, *, size: int = 4) -> ConnectionPool:
+    """Open the process-wide connection pool for `db_path`.
+
+    Until a pool is open (scripts, one-off tools) every call falls back to a
+    short-lived connection, so opening the pool is optional.
+    """
+
+    if db_path in _pools:
+        return _pools[db_path]
+    pool = ConnectionPool(db_path, size=size)
+    await pool.open()
+    _pools[db_path] = pool
+    return pool
+
+
+async def close_pool(db_path: str) -> None:
+    pool = _pools.pop(db_path, None)
+    if pool is not None:
+        await pool.close()
+
+
+async def open_report_pool(db_path: str, *, size: int = 2) -> ConnectionPool:
+    """Open read-only (`mode=ro`) connections for admin lists and reports.
+
+    The pool size caps how many reporting queries run at once, and they never
+    borrow the connections used by checkouts and bookings.
+    """
+
+    if db_path in _report_pools:
+        return _report_pools[db_path]
+    pool = ConnectionPool(db_path, size=size, read_only=True)
+    await pool.open()
+    _report_pools[db_path] = pool
+    return pool
+
+
+async def close_report_pool(db_path: str) -> None:
+    pool = _report_pools.pop(db_path, None)
+    if pool is not None:
+        await pool.close()
+
+
+async def start_writer(
+    db_path: str,
+    *,
+    batch_window: float = 0.002,
+) -> WriteQueue:
+    """Route every write for `db_path` through one group-committing writer task.
+
+    Without a running writer, writes fall back to their own transaction on a
+    pooled (or short-lived) connection.
+    """
+
+    if db_path in _writers:
+        return _writers[db_path]
+    writer = WriteQueue(db_path, batch_window=batch_window)
+    await writer.start()
+    _writers[db_path] = writer
+    return writer
+
+
+async def stop_writer(db_path: str) -> None:
+    writer = _writers.pop(db_path, None)
+    if writer is not None:
+        await writer.stop()
+
+
+async def _write(db_path: str, fn: WriteFn[T]) -> T:
+    writer = _writers.get(db_path)
+    if writer is not None:
+        return await writer.submit(fn)
+
+    async with _connect(db_path) as db:
+        await db.execute("BEGIN IMMEDIATE")
+        result = await fn(db)
+        await db.commit()
+    return result
 
 
-def _dt_to_iso(value: datetime) -> str:
-    return value.replace(microsecond=0).isoformat(sep=" ")
+@asynccontextmanager
+async def _connect(db_path: str) -> AsyncIterator[aiosqlite.Connection]:
+    pool = _pools.get(db_path)
+    if pool is not None:
+        async with pool.acquire() as db:
+            yield db
+        return
 
+    async with aiosqlite.connect(db_path) as db:
+        await apply_pragmas(db)
+        yield db
+
+
+@asynccontextmanager
+async def _connect_report(db_path: str) -> AsyncIterator[aiosqlite.Connection]:
+    pool = _report_pools.get(db_path)
+    if pool is None:
+        async with _connect(db_path) as db:
+            yield db
+        return
+
+    async with pool.acquire() as db:
+        yield db
 
-def _iso_to_dt(value: str) -> datetime:
-    return datetime.fromisoformat(value)
 
+async def init_db(db_path: str, *, table_links: Iterable[tuple[str, str]] = ()) -> None:
+    """Create/upgrade the schema and seed reference data.
+
+    `table_links` (pairs of table codes, see bot.hall_render.load_table_links)
+    are only seeded into an empty cafe_table_link, so links removed later
+    stay removed.
+    """
 
-async def init_db(db_path: str) -> None:
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
 
     async with aiosqlite.connect(db_path) as db:
@@ -144,12 +396,13 @@ async def init_db(db_path: str) -> None:
         schema_sql = SCHEMA_PATH.read_text(encoding="utf-8")
         await db.executescript(schema_sql)
         await db.commit()
+        await migrate(db)
 
-        await _seed_if_empty(db)
+        await _seed_if_empty(db, list(table_links))
         await db.commit()
 
 
-async def _seed_if_empty(db: aiosqlite.Connection) -> None:
+async def _seed_if_empty(db: aiosqlite.Connection, links: list[tuple[str, str]]) -> None:
     tables = [
         ("T1", 2, "main"),
         ("T2", 2, "main"),
@@ -161,12 +414,36 @@ async def _seed_if_empty(db: aiosqlite.Connection) -> None:
         ("T8", 2, "main"),
         ("T9", 4, "main"),
         ("T10", 6, "main"),
+        ("T11", 6, "main"),
+        ("T12", 4, "main"),
+        ("T13", 4, "main"),
+        ("T14", 4, "main"),
+        ("T15", 4, "main"),
+        ("T16", 4, "main"),
+        ("T17", 4, "main"),
+        ("T18", 4, "main"),
+        ("T19", 4, "main"),
     ]
     await db.executemany(
         "INSERT OR IGNORE INTO cafe_table(code, seats, zone) VALUES (?, ?, ?)",
         tables,
     )
 
+    cur = await db.execute("SELECT COUNT(*) FROM cafe_table_link")
+    (link_count,) = await cur.fetchone()
+    await cur.close()
+    if link_count == 0 and links:
+        # Pairs naming tables that do not exist are skipped by the join.
+        await db.executemany(
+            """
+            INSERT OR IGNORE INTO cafe_table_link(table_id, other_table_id)
+            SELECT MIN(a.id, b.id), MAX(a.id, b.id)
+            FROM cafe_table a, cafe_table b
+            WHERE a.code = ? AND b.code = ? AND a.id <> b.id
+            """,
+            links,
+        )
+
     cur = await db.execute("SELECT COUNT(*) FROM menu_item")
     (menu_count,) = await cur.fetchone()
     await cur.close()
@@ -186,181 +463,187 @@ async def apply_reference_menu(db_path: str) -> None:
     """
 
     items = reference_menu_items()
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute("PRAGMA foreign_keys=ON;")
-        await db.execute("UPDATE menu_item SET is_active = 0")
-
-        for category, title, description, price_cents in items:
-            cur = await db.execute(
-                "SELECT id FROM menu_item WHERE category = ? AND title = ? LIMIT 1",
-                (category, title),
-            )
-            row = await cur.fetchone()
-            await cur.close()
-
-            if row:
-                (item_id,) = row
-                await db.execute(
-                    """
-                    UPDATE menu_item
-                    SET description = ?, price_cents = ?, is_active = 1
-                    WHERE id = ?
-                    """,
-                    (description, int(price_cents), int(item_id)),
-                )
-            else:
-                await db.execute(
-                    """
-                    INSERT INTO menu_item(category, title, description, price_cents, is_active)
-                    VALUES (?, ?, ?, ?, 1)
-                    """,
-                    (category, title, description, int(price_cents)),
-                )
-
-        await db.commit()
 
+    async def _tx(db: aiosqlite.Connection) -> None:
+        await db.execute("UPDATE menu_item SET is_active = 0")
+        await _upsert_menu_items(db, items)
 
-async def fetch_categories(db_path: str) -> list[str]:
-    async with aiosqlite.connect(db_path) as db:
-        cur = await db.execute(
-            "SELECT DISTINCT category FROM menu_item WHERE is_active = 1 ORDER BY category"
-        )
-        rows = await cur.fetchall()
-        await cur.close()
-    return [r[0] for r in rows]
+    await _write(db_path, _tx)
+    await refresh_menu_catalog(db_path)
 
 
-async def fetch_menu_items(db_path: str, category: str) -> list[MenuItem]:
-    async with aiosqlite.connect(db_path) as db:
+async def _load_menu_catalog(db_path: str) -> MenuCatalog:
+    async with _connect(db_path) as db:
         cur = await db.execute(
             """
             SELECT id, category, title, description, price_cents, is_active
             FROM menu_item
-            WHERE is_active = 1 AND category = ?
             ORDER BY id
-            """,
-            (category,),
+            """
         )
         rows = await cur.fetchall()
         await cur.close()
-    return [MenuItem(*row) for row in rows]
+    return MenuCatalog.from_items([MenuItem(*row) for row in rows])
+
+
+def _catalog_lock(db_path: str) -> asyncio.Lock:
+    lock = _catalog_locks.get(db_path)
+    if lock is None:
+        lock = _catalog_locks[db_path] = asyncio.Lock()
+    return lock
+
+
+async def get_menu_catalog(db_path: str) -> MenuCatalog:
+    catalog = _catalogs.get(db_path)
+    if catalog is not None:
+        return catalog
+
+    async with _catalog_lock(db_path):
+        catalog = _catalogs.get(db_path)
+        if catalog is None:
+            catalog = await _load_menu_catalog(db_path)
+            _catalogs[db_path] = catalog
+    return catalog
+
+
+async def refresh_menu_catalog(db_path: str) -> MenuCatalog:
+    """Rebuild the catalog snapshot after a menu write and swap it in."""
+
+    async with _catalog_lock(db_path):
+        catalog = await _load_menu_catalog(db_path)
+        _catalogs[db_path] = catalog
+    return catalog
+
+
+async def fetch_categories(db_path: str) -> list[str]:
+    catalog = await get_menu_catalog(db_path)
+    return list(catalog.categories)
+
+
+async def fetch_menu_items(db_path: str, category: str) -> list[MenuItem]:
+    catalog = await get_menu_catalog(db_path)
+    return list(catalog.by_category.get(category, ()))
 
 
 async def fetch_active_menu_items(db_path: str) -> list[MenuItem]:
-    async with aiosqlite.connect(db_path) as db:
-        cur = await db.execute(
-            """
-            SELECT id, category, title, description, price_cents, is_active
-            FROM menu_item
-            WHERE is_active = 1
-            ORDER BY category, id
-            """
-        )
-        rows = await cur.fetchall()
-        await cur.close()
-    return [MenuItem(*row) for row in rows]
+    catalog = await get_menu_catalog(db_path)
+    return catalog.active_items()
 
 
 async def fetch_menu_item(db_path: str, item_id: int) -> Optional[MenuItem]:
-    async with aiosqlite.connect(db_path) as db:
-        cur = await db.execute(
-            """
-            SELECT id, category, title, description, price_cents, is_active
-            FROM menu_item
-            WHERE id = ?
-            """,
-            (item_id,),
-        )
-        row = await cur.fetchone()
-        await cur.close()
-    return MenuItem(*row) if row else None
+    catalog = await get_menu_catalog(db_path)
+    return catalog.by_id.get(int(item_id))
 
 
 async def update_menu_item_price(db_path: str, item_id: int, price_cents: int) -> None:
-    async with aiosqlite.connect(db_path) as db:
+    async def _tx(db: aiosqlite.Connection) -> None:
         await db.execute(
             "UPDATE menu_item SET price_cents = ? WHERE id = ?",
             (int(price_cents), int(item_id)),
         )
-        await db.commit()
 
+    await _write(db_path, _tx)
+    await refresh_menu_catalog(db_path)
 
-async def upsert_menu_item(
-    db_path: str,
-    *,
-    category: str,
-    title: str,
-    description: str,
-    price_cents: int,
-) -> MenuItem:
-    async with aiosqlite.connect(db_path) as db:
-        cur = await db.execute(
-            "SELECT id FROM menu_item WHERE category = ? AND title = ? LIMIT 1",
-            (category, title),
-        )
-        row = await cur.fetchone()
-        await cur.close()
 
-        if row:
-            (item_id,) = row
-            await db.execute(
-                """
-                UPDATE menu_item
-                SET description = ?, price_cents = ?, is_active = 1
-                WHERE id = ?
-                """,
-                (description, int(price_cents), int(item_id)),
-            )
-        else:
-            cur = await db.execute(
-                """
-                INSERT INTO menu_item(category, title, description, price_cents, is_active)
-                VALUES (?, ?, ?, ?, 1)
-                """,
-                (category, title, description, int(price_cents)),
-            )
-            item_id = cur.lastrowid
-            await cur.close()
+async def _upsert_menu_items(
+    db: aiosqlite.Connection,
+    rows: list[tuple[str, str, str, int]],
+) -> list[int]:
+    """Insert or reactivate (category, title, description, price_cents) rows.
 
-        await db.commit()
+    Runs inside the caller's transaction and returns ids in input order.
+    """
+
+    # Last row wins when the same (category, title) appears twice.
+    latest = {(row[0], row[1]): row for row in rows}
+    if not latest:
+        return []
+
+    await db.executemany(
+        """
+        INSERT INTO menu_item(category, title, description, price_cents, is_active)
+        VALUES (?, ?, ?, ?, 1)
+        ON CONFLICT(category, title) DO UPDATE SET
+            description = excluded.description,
+            price_cents = excluded.price_cents,
+            is_active = 1
+        """,
+        [
+            (category, title, description, int(price_cents))
+            for category, title, description, price_cents in latest.values()
+        ],
+    )
+
+    placeholders = ", ".join("(?, ?)" for _ in latest)
+    cur = await db.execute(
+        f"""
+        SELECT category, title, id
+        FROM menu_item
+        WHERE (category, title) IN (VALUES {placeholders})
+        """,
+        [v for key in latest for v in key],
+    )
+    existing: dict[tuple[str, str], int] = {
+        (category, title): int(item_id) for category, title, item_id in await cur.fetchall()
+    }
+    await cur.close()
 
+    return [existing[(category, title)] for category, title, _, _ in rows]
+
+
+async def fetch_media_file_id(db_path: str, media_key: str, content_hash: str) -> Optional[str]:
+    async with _connect(db_path) as db:
         cur = await db.execute(
-            """
-            SELECT id, category, title, description, price_cents, is_active
-            FROM menu_item
-            WHERE id = ?
-            """,
-            (int(item_id),),
+            "SELECT file_id FROM media_cache WHERE media_key = ? AND content_hash = ?",
+            (media_key, content_hash),
         )
         row = await cur.fetchone()
         await cur.close()
-    return MenuItem(*row)
+    return str(row[0]) if row else None
 
 
-async def fetch_menu_item_by_category_title(
+async def save_media_file_id(
     db_path: str,
+    media_key: str,
+    content_hash: str,
+    file_id: str,
     *,
-    category: str,
-    title: str,
-) -> Optional[MenuItem]:
-    async with aiosqlite.connect(db_path) as db:
-        cur = await db.execute(
+    max_age: timedelta = timedelta(days=30),
+) -> None:
+    """Store a file_id and drop rows of `media_key` older than `max_age`."""
+
+    cutoff_ts = _dt_to_ts(datetime.now() - max_age)
+
+    async def _tx(db: aiosqlite.Connection) -> None:
+        await db.execute(
             """
-            SELECT id, category, title, description, price_cents, is_active
-            FROM menu_item
-            WHERE is_active = 1 AND category = ? AND title = ?
-            ORDER BY id DESC
-            LIMIT 1
+            INSERT INTO media_cache(media_key, content_hash, file_id)
+            VALUES (?, ?, ?)
+            ON CONFLICT(media_key, content_hash) DO UPDATE SET file_id = excluded.file_id
             """,
-            (category, title),
+            (media_key, content_hash, file_id),
         )
-        row = await cur.fetchone()
-        await cur.close()
-    return MenuItem(*row) if row else None
+        await db.execute(
+            "DELETE FROM media_cache WHERE media_key = ? AND created_at < ?",
+            (media_key, cutoff_ts),
+        )
+
+    await _write(db_path, _tx)
+
+
+async def forget_media_file_id(db_path: str, media_key: str, content_hash: str) -> None:
+    async def _tx(db: aiosqlite.Connection) -> None:
+        await db.execute(
+            "DELETE FROM media_cache WHERE media_key = ? AND content_hash = ?",
+            (media_key, content_hash),
+        )
+
+    await _write(db_path, _tx)
 
 
 async def fetch_tables(db_path: str, min_seats: int) -> list[CafeTable]:
-    async with aiosqlite.connect(db_path) as db:
+    async with _connect(db_path) as db:
         cur = await db.execute(
             """
             SELECT id, code, seats, zone, is_active
@@ -376,7 +659,7 @@ async def fetch_tables(db_path: str, min_seats: int) -> list[CafeTable]:
 
 
 async def fetch_table(db_path: str, table_id: int) -> Optional[CafeTable]:
-    async with aiosqlite.connect(db_path) as db:
+    async with _connect(db_path) as db:
         cur = await db.execute(
             """
             SELECT id, code, seats, zone, is_active
@@ -390,135 +673,1184 @@ async def fetch_table(db_path: str, table_id: int) -> Optional[CafeTable]:
     return CafeTable(*row) if row else None
 
 
-async def table_is_available(
-    db_path: str,
+async def _table_is_free(
+    db: aiosqlite.Connection,
     table_id: int,
-    start_at: datetime,
-    end_at: datetime,
+    start_ts: int,
+    end_ts: int,
 ) -> bool:
-    async with aiosqlite.connect(db_path) as db:
-        cur = await db.execute(
-            """
-            SELECT COUNT(*)
+    cur = await db.execute(
+        """
+        SELECT EXISTS (
+            SELECT 1
             FROM reservation
             WHERE
                 table_id = ?
                 AND status IN ('pending', 'confirmed')
-                AND NOT (end_at <= ? OR start_at >= ?)
+                AND start_at < ?
+                AND end_at > ?
+        )
+        """,
+        (int(table_id), int(end_ts), int(start_ts)),
+    )
+    (busy,) = await cur.fetchone()
+    await cur.close()
+    return not busy
+
+
+async def _load_hall(db: aiosqlite.Connection) -> Hall:
+    cur = await db.execute(
+        """
+        SELECT id, code, seats, zone, is_active
+        FROM cafe_table
+        WHERE is_active = 1
+        ORDER BY seats, code
+        """
+    )
+    tables = [CafeTable(*row) for row in await cur.fetchall()]
+    await cur.close()
+
+    cur = await db.execute("SELECT table_id, other_table_id FROM cafe_table_link")
+    links = frozenset(frozenset(row) for row in await cur.fetchall())
+    await cur.close()
+    return Hall(tables=tables, links=links)
+
+
+async def _load_busy(
+    db: aiosqlite.Connection,
+    lo_ts: int,
+    hi_ts: int,
+) -> dict[int, list[tuple[int, int]]]:
+    """Active bookings overlapping [lo_ts, hi_ts) per table, by start."""
+
+    cur = await db.execute(
+        """
+        SELECT table_id, start_at, end_at
+        FROM reservation
+        WHERE
+            status IN ('pending', 'confirmed')
+            AND start_at < ?
+            AND end_at > ?
+        ORDER BY start_at
+        """,
+        (int(hi_ts), int(lo_ts)),
+    )
+    rows = await cur.fetchall()
+    await cur.close()
+    busy: dict[int, list[tuple[int, int]]] = {}
+    for table_id, start_ts, end_ts in rows:
+        busy.setdefault(table_id, []).append((start_ts, end_ts))
+    return busy
+
+
+async def _hall_and_busy(
+    db_path: str,
+    lo_ts: int,
+    hi_ts: int,
+) -> tuple[Hall, dict[int, list[tuple[int, int]]]]:
+    index = _occupancy.get(db_path)
+    if index is not None:
+        hall = _halls[db_path]
+        busy = {t.id: index.intervals_between(t.id, lo_ts, hi_ts) for t in hall.tables}
+        return hall, busy
+
+    async with _connect(db_path) as db:
+        return await _load_hall(db), await _load_busy(db, lo_ts, hi_ts)
+
+
+def _day_bounds(start_at: datetime) -> tuple[int, int]:
+    """Epoch seconds of opening and closing time on the day of `start_at`."""
+
+    day = start_at.date()
+    return (
+        _dt_to_ts(datetime.combine(day, OPENING_TIME)),
+        _dt_to_ts(datetime.combine(day, CLOSING_TIME)),
+    )
+
+
+async def load_occupancy(db_path: str) -> OccupancyIndex:
+    """Build the in-memory occupancy index from active tables and reservations.
+
+    Once loaded, availability checks for the booking flow are answered from
+    memory and reservation writes keep the index current. Call it at startup,
+    before the bot starts taking bookings.
+    """
+
+    async with _connect(db_path) as db:
+        hall = await _load_hall(db)
+
+        # Bookings that ended before today can no longer clash with anything.
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        cur = await db.execute(
+            """
+            SELECT id, table_id, start_at, end_at
+            FROM reservation
+            WHERE status IN ('pending', 'confirmed') AND start_at >= ?
             """,
-            (table_id, _dt_to_iso(start_at), _dt_to_iso(end_at)),
+            (_dt_to_ts(today - RESERVATION_DURATION),),
         )
-        (cnt,) = await cur.fetchone()
+        rows = await cur.fetchall()
         await cur.close()
-    return cnt == 0
 
+    index = OccupancyIndex()
+    for reservation_id, table_id, start_ts, end_ts in rows:
+        index.add(reservation_id, table_id, start_ts, end_ts)
+    # The query's margin also loads yesterday's evening; keep only today on.
+    index.prune(today.date())
+    _occupancy[db_path] = index
+    _halls[db_path] = hall
+    return index
 
-async def create_reservation(
+
+def unload_occupancy(db_path: str) -> None:
+    _occupancy.pop(db_path, None)
+    _halls.pop(db_path, None)
+
+
+async def table_is_available(
     db_path: str,
-    *,
-    user_id: int,
     table_id: int,
     start_at: datetime,
-    guests: int,
-    name: str,
-    phone: str,
-) -> int:
-    end_at = start_at + timedelta(hours=2, minutes=15)
-    async with aiosqlite.connect(db_path) as db:
+    end_at: datetime,
+) -> bool:
+    start_ts, end_ts = _dt_to_ts(start_at), _dt_to_ts(end_at)
+    index = _occupancy.get(db_path)
+    if index is not None:
+        return index.is_free(table_id, start_ts, end_ts)
+
+    async with _connect(db_path) as db:
+        return await _table_is_free(db, table_id, start_ts, end_ts)
+
+
+async def fetch_table_availability(
+    db_path: str,
+    min_seats: int,
+    start_at: datetime,
+    end_at: datetime,
+) -> list[tuple[CafeTable, bool]]:
+    """Every active table with >= min_seats and whether it is free in [start_at, end_at)."""
+
+    start_ts, end_ts = _dt_to_ts(start_at), _dt_to_ts(end_at)
+    index = _occupancy.get(db_path)
+    if index is not None:
+        return [
+            (table, index.is_free(table.id, start_ts, end_ts))
+            for table in _halls[db_path].tables
+            if table.seats >= min_seats
+        ]
+
+    async with _connect(db_path) as db:
         cur = await db.execute(
             """
-            INSERT INTO reservation(user_id, table_id, start_at, end_at, guests, name, phone, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+            SELECT
+                t.id, t.code, t.seats, t.zone, t.is_active,
+                NOT EXISTS (
+                    SELECT 1
+                    FROM reservation r
+                    WHERE
+                        r.table_id = t.id
+                        AND r.status IN ('pending', 'confirmed')
+                        AND r.start_at < ?
+                        AND r.end_at > ?
+                ) AS is_free
+            FROM cafe_table t
+            WHERE t.is_active = 1 AND t.seats >= ?
+            ORDER BY t.seats, t.code
             """,
-            (
-                user_id,
-                table_id,
-                _dt_to_iso(start_at),
-                _dt_to_iso(end_at),
-                guests,
-                name,
-                phone,
-            ),
+            (end_ts, start_ts, int(min_seats)),
         )
-        await db.commit()
-        reservation_id = cur.lastrowid
+        rows = await cur.fetchall()
         await cur.close()
-    return int(reservation_id)
+    return [(CafeTable(*row[:5]), bool(row[5])) for row in rows]
 
 
-async def create_order(
+async def fetch_free_start_times(
     db_path: str,
+    guests: int,
+    around: datetime,
     *,
-    user_id: int,
-    order_type: str,
-    scheduled_for: Optional[datetime],
-    name: str,
-    phone: str,
-    address: Optional[str],
-    comment: str,
-    items: list[dict[str, Any]],
-) -> int:
-    total_cents = sum(int(it["price_cents"]) * int(it["qty"]) for it in items)
-    scheduled_for_iso = _dt_to_iso(scheduled_for) if scheduled_for else None
-    async with aiosqlite.connect(db_path) as db:
+    window: timedelta = timedelta(hours=2),
+    step: timedelta = timedelta(minutes=15),
+    limit: int = 4,
+) -> list[datetime]:
+    """Up to `limit` start times within +-window of `around`, nearest first,
+    at which the party can be seated (on one table or a combined group).
+    Past times are skipped.
+
+    The result is returned in chronological order.
+    """
+
+    steps = int(window / step)
+    now = datetime.now()
+    candidates = [
+        around + step * k
+        for k in sorted(range(-steps, steps + 1), key=lambda k: (abs(k), k))
+        if k != 0 and around + step * k > now
+    ]
+    if not candidates:
+        return []
+
+    # One pass: every active booking that overlaps the whole window.
+    duration = int(RESERVATION_DURATION.total_seconds())
+    hall, busy = await _hall_and_busy(
+        db_path,
+        _dt_to_ts(around - window),
+        _dt_to_ts(around + window) + duration,
+    )
+    groups = table_groups(hall, guests)
+
+    def is_free(table_id: int, start_ts: int, end_ts: int) -> bool:
+        return all(not (s < end_ts and e > start_ts) for s, e in busy.get(table_id, ()))
+
+    found: list[datetime] = []
+    for candidate in candidates:
+        start_ts = _dt_to_ts(candidate)
+        end_ts = start_ts + duration
+        if any(all(is_free(t.id, start_ts, end_ts) for t in group) for group in groups):
+            found.append(candidate)
+            if len(found) >= limit:
+                break
+    return sorted(found)
+
+
+async def find_best_fit(db_path: str, guests: int, start_at: datetime) -> Optional[list[CafeTable]]:
+    """Tables the assignment engine would give this party right now, or None."""
+
+    start_ts = _dt_to_ts(start_at)
+    end_ts = _dt_to_ts(start_at + RESERVATION_DURATION)
+    open_ts, close_ts = _day_bounds(start_at)
+    hall, busy = await _hall_and_busy(db_path, min(open_ts, start_ts), max(close_ts, end_ts))
+    group = best_fit(
+        hall,
+        guests,
+        busy,
+        start_ts,
+        end_ts,
+        open_ts=open_ts,
+        close_ts=close_ts,
+        min_gap=int(RESERVATION_DURATION.total_seconds()),
+    )
+    return list(group) if group else None
+
+
+def _seatings_per_table() -> int:
+    open_for = datetime.combine(date.min, CLOSING_TIME) - datetime.combine(date.min, OPENING_TIME)
+    return max(1, int(open_for / RESERVATION_DURATION))
+
+
+async def fetch_month_load(db_path: str, year: int, month: int) -> dict[date, float]:
+    """Share of the day's booking capacity already taken, per day of the month.
+
+    Capacity is active tables x bookings that fit into opening hours. Days
+    without bookings are omitted. One aggregate query per month, cached until
+    the next reservation write.
+    """
+
+    cache = _month_load.setdefault(db_path, {})
+    cached = cache.get((year, month))
+    if cached is not None:
+        return cached
+
+    first = datetime(year, month, 1)
+    after = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    async with _connect(db_path) as db:
         cur = await db.execute(
             """
-            INSERT INTO cafe_order(user_id, type, status, scheduled_for, name, phone, address, comment, total_cents)
-            VALUES (?, ?, 'new', ?, ?, ?, ?, ?, ?)
+            SELECT
+                date(r.start_at, 'unixepoch', 'localtime') AS day,
+                COUNT(*) AS booked,
+                (SELECT COUNT(*) FROM cafe_table WHERE is_active = 1) AS tables
+            FROM reservation r
+            JOIN cafe_table t ON t.id = r.table_id AND t.is_active = 1
+            WHERE
+                r.status IN ('pending', 'confirmed')
+                AND r.start_at >= ?
+                AND r.start_at < ?
+            GROUP BY day
             """,
-            (
-                user_id,
-                order_type,
-                scheduled_for_iso,
-                name,
-                phone,
-                address,
-                comment,
-                total_cents,
-            ),
-        )
-        order_id = int(cur.lastrowid)
+            (_dt_to_ts(first), _dt_to_ts(after)),
+        )
+        rows = await cur.fetchall()
         await cur.close()
 
-        await db.executemany(
+    seatings = _seatings_per_table()
+    load = {
+        date.fromisoformat(day): booked / (tables * seatings)
+        for day, booked, tables in rows
+        if tables
+    }
+    cache[(year, month)] = load
+    return load
+
+
+SLOT_STEP = timedelta(minutes=30)
+
+
+def is_slot_start(start_at: datetime, *, step: timedelta = SLOT_STEP) -> bool:
+    """True if `start_at` is one of the start times fetch_free_slots offers:
+    on the `step` grid from opening time, ending by closing time."""
+
+    open_ts, close_ts = _day_bounds(start_at)
+    start_ts = _dt_to_ts(start_at)
+    if start_at.second or start_at.microsecond:
+        return False
+    return (
+        open_ts <= start_ts <= close_ts - int(RESERVATION_DURATION.total_seconds())
+        and (start_ts - open_ts) % int(step.total_seconds()) == 0
+    )
+
+
+async def fetch_free_slots(
+    db_path: str,
+    guests: int,
+    first_day: date,
+    days: int,
+    *,
+    step: timedelta = SLOT_STEP,
+) -> dict[date, list[time]]:
+    """Start times, every `step` within opening hours, at which the party can be
+    seated (single or combined tables), for `days` days from `first_day`.
+
+    Each table's free start times are computed once as a bitmask per day, so a
+    combined group is a single AND. Results are cached until the next
+    reservation write; past times are not filtered out here.
+    """
+
+    key = (int(guests), first_day, int(days))
+    cache = _free_slots.setdefault(db_path, {})
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    duration = int(RESERVATION_DURATION.total_seconds())
+    step_s = int(step.total_seconds())
+    day_list = [first_day + timedelta(days=i) for i in range(days)]
+    if not day_list:
+        return {}
+    first_open, _ = _day_bounds(datetime.combine(day_list[0], OPENING_TIME))
+    _, last_close = _day_bounds(datetime.combine(day_list[-1], OPENING_TIME))
+    hall, busy = await _hall_and_busy(db_path, first_open, last_close)
+    groups = table_groups(hall, guests)
+    needed = {t.id for group in groups for t in group}
+
+    result: dict[date, list[time]] = {}
+    for day in day_list:
+        open_ts, close_ts = _day_bounds(datetime.combine(day, OPENING_TIME))
+        starts = list(range(open_ts, close_ts - duration + 1, step_s))
+        full = (1 << len(starts)) - 1
+
+        masks: dict[int, int] = {}
+        for table_id in needed:
+            mask = full
+            for s, e in busy.get(table_id, ()):
+                for i, start_ts in enumerate(starts):
+                    if s < start_ts + duration and e > start_ts:
+                        mask &= ~(1 << i)
+            masks[table_id] = mask
+
+        free = 0
+        for group in groups:
+            group_mask = full
+            for t in group:
+                group_mask &= masks[t.id]
+            free |= group_mask
+            if free == full:
+                break
+        result[day] = [
+            datetime.fromtimestamp(start_ts).time()
+            for i, start_ts in enumerate(starts)
+            if free >> i & 1
+        ]
+
+    cache[key] = result
+    return result
+
+
+def _invalidate_availability(db_path: str) -> None:
+    """Drop the cached calendar load and free slots after a reservation write."""
+
+    _month_load.pop(db_path, None)
+    _free_slots.pop(db_path, None)
+
+
+def set_job_listener(
+    db_path: str,
+    listener: Optional[Callable[[list[ScheduledJob]], None]],
+) -> None:
+    """Register the callback told about jobs created by committed writes."""
+
+    if listener is None:
+        _job_listeners.pop(db_path, None)
+    else:
+        _job_listeners[db_path] = listener
+
+
+def _announce_jobs(db_path: str, jobs: list[ScheduledJob]) -> None:
+    listener = _job_listeners.get(db_path)
+    if jobs and listener is not None:
+        listener(jobs)
+
+
+async def _schedule_job(
+    db: aiosqlite.Connection,
+    jobs: list[ScheduledJob],
+    kind: str,
+    ref_id: int,
+    due_ts: int,
+) -> None:
+    """Insert a job inside the caller's transaction and collect it in `jobs`,
+    to be announced with `_announce_jobs` once the transaction has committed."""
+
+    cur = await db.execute(
+        "INSERT INTO scheduled_job(kind, ref_id, due_at) VALUES (?, ?, ?)",
+        (kind, int(ref_id), int(due_ts)),
+    )
+    jobs.append(ScheduledJob(id=int(cur.lastrowid), kind=kind, ref_id=int(ref_id), due_at=int(due_ts), attempts=0))
+    await cur.close()
+
+
+def set_reservation_confirm_timeout(db_path: str, timeout: Optional[timedelta]) -> None:
+    """Expire pending bookings not confirmed within `timeout` (or by their start).
+
+    Off (None) by default: bookings then stay pending until an admin acts.
+    """
+
+    if timeout is None:
+        _confirm_timeouts.pop(db_path, None)
+    else:
+        _confirm_timeouts[db_path] = int(timeout.total_seconds())
+
+
+async def _schedule_reservation_jobs(
+    db: aiosqlite.Connection,
+    jobs: list[ScheduledJob],
+    reservation_id: int,
+    start_ts: int,
+    confirm_timeout: Optional[int],
+) -> None:
+    if confirm_timeout is not None:
+        confirm_by = _dt_to_ts(datetime.now()) + confirm_timeout
+        await _schedule_job(db, jobs, JOB_RESERVATION_EXPIRE, reservation_id, min(confirm_by, start_ts))
+    await _schedule_job(
+        db,
+        jobs,
+        JOB_RESERVATION_NO_SHOW,
+        reservation_id,
+        start_ts + int(NO_SHOW_GRACE.total_seconds()),
+    )
+
+
+async def fetch_pending_jobs(db_path: str) -> list[ScheduledJob]:
+    async with _connect(db_path) as db:
+        cur = await db.execute(
+            """
+            SELECT id, kind, ref_id, due_at, attempts
+            FROM scheduled_job
+            WHERE status = 'pending'
+            ORDER BY due_at
+            """
+        )
+        rows = await cur.fetchall()
+        await cur.close()
+    return [ScheduledJob(*row) for row in rows]
+
+
+async def complete_job(db_path: str, job_id: int) -> None:
+    async def _tx(db: aiosqlite.Connection) -> None:
+        await db.execute("DELETE FROM scheduled_job WHERE id = ?", (int(job_id),))
+
+    await _write(db_path, _tx)
+
+
+async def retry_job(db_path: str, job: ScheduledJob, due_ts: int) -> ScheduledJob:
+    async def _tx(db: aiosqlite.Connection) -> None:
+        await db.execute(
+            "UPDATE scheduled_job SET due_at = ?, attempts = attempts + 1 WHERE id = ?",
+            (int(due_ts), int(job.id)),
+        )
+
+    await _write(db_path, _tx)
+    return ScheduledJob(id=job.id, kind=job.kind, ref_id=job.ref_id, due_at=int(due_ts), attempts=job.attempts + 1)
+
+
+async def fail_job(db_path: str, job_id: int) -> None:
+    async def _tx(db: aiosqlite.Connection) -> None:
+        await db.execute(
+            "UPDATE scheduled_job SET status = 'failed', attempts = attempts + 1 WHERE id = ?",
+            (int(job_id),),
+        )
+
+    await _write(db_path, _tx)
+
+
+def set_outbox_listener(db_path: str, listener: Optional[Callable[[], None]]) -> None:
+    """Register the callback told that committed writes queued outbox messages."""
+
+    if listener is None:
+        _outbox_listeners.pop(db_path, None)
+    else:
+        _outbox_listeners[db_path] = listener
+
+
+def _announce_outbox(db_path: str, queued: list[int]) -> None:
+    listener = _outbox_listeners.get(db_path)
+    if queued and listener is not None:
+        listener()
+
+
+async def _queue_alert(
+    db: aiosqlite.Connection,
+    queued: list[int],
+    chat_ids: Iterable[int],
+    text: str,
+) -> None:
+    """Insert one outbox row per chat inside the caller's transaction; the
+    ids are collected in `queued` for `_announce_outbox` after the commit."""
+
+    for chat_id in chat_ids:
+        cur = await db.execute(
+            "INSERT INTO outbox(chat_id, text) VALUES (?, ?)",
+            (int(chat_id), text),
+        )
+        queued.append(int(cur.lastrowid))
+        await cur.close()
+
+
+async def fetch_due_outbox(db_path: str, now_ts: int, *, limit: int = 50) -> list[OutboxMessage]:
+    async with _connect(db_path) as db:
+        cur = await db.execute(
+            """
+            SELECT id, chat_id, text, attempts
+            FROM outbox
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at, id
+            LIMIT ?
+            """,
+            (int(now_ts), int(limit)),
+        )
+        rows = await cur.fetchall()
+        await cur.close()
+    return [OutboxMessage(*row) for row in rows]
+
+
+async def fetch_outbox_depth(db_path: str) -> tuple[int, Optional[int]]:
+    """Number of pending outbox messages and the earliest next_attempt_at."""
+
+    async with _connect(db_path) as db:
+        cur = await db.execute(
+            "SELECT COUNT(*), MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+        )
+        count, next_ts = await cur.fetchone()
+        await cur.close()
+    return int(count), (int(next_ts) if next_ts is not None else None)
+
+
+async def settle_outbox(
+    db_path: str,
+    *,
+    delivered: list[int],
+    retries: list[tuple[int, int]],
+    failed: list[int],
+) -> None:
+    """Record the outcome of one delivery batch in a single write.
+
+    `retries` holds (id, next_attempt_at) pairs.
+    """
+
+    now_ts = _dt_to_ts(datetime.now())
+
+    async def _tx(db: aiosqlite.Connection) -> None:
+        if delivered:
+            await db.executemany(
+                "UPDATE outbox SET status = 'delivered', attempts = attempts + 1, delivered_at = ? WHERE id = ?",
+                [(now_ts, int(outbox_id)) for outbox_id in delivered],
+            )
+        if retries:
+            await db.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+                [(int(next_ts), int(outbox_id)) for outbox_id, next_ts in retries],
+            )
+        if failed:
+            await db.executemany(
+                "UPDATE outbox SET status = 'failed', attempts = attempts + 1 WHERE id = ?",
+                [(int(outbox_id),) for outbox_id in failed],
+            )
+
+    await _write(db_path, _tx)
+
+
+async def prune_outbox(db_path: str, before_ts: int) -> None:
+    """Delete messages delivered before `before_ts` (failed ones are kept)."""
+
+    async def _tx(db: aiosqlite.Connection) -> None:
+        await db.execute(
+            "DELETE FROM outbox WHERE status = 'delivered' AND delivered_at < ?",
+            (int(before_ts),),
+        )
+
+    await _write(db_path, _tx)
+
+
+async def _insert_reservation(
+    db: aiosqlite.Connection,
+    *,
+    user_id: int,
+    table_id: int,
+    start_ts: int,
+    end_ts: int,
+    guests: int,
+    name: str,
+    phone: str,
+) -> int:
+    cur = await db.execute(
+        """
+        INSERT INTO reservation(user_id, table_id, start_at, end_at, guests, name, phone, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+        """,
+        (
+            user_id,
+            table_id,
+            start_ts,
+            end_ts,
+            guests,
+            name,
+            phone,
+        ),
+    )
+    reservation_id = cur.lastrowid
+    await cur.close()
+    return int(reservation_id)
+
+
+async def create_reservation(
+    db_path: str,
+    *,
+    user_id: int,
+    table_id: int,
+    start_at: datetime,
+    guests: int,
+    name: str,
+    phone: str,
+    alert_to: Iterable[int] = (),
+    alert: Optional[Callable[[int], str]] = None,
+) -> Optional[int]:
+    """Book a table, or return None if the slot is already taken.
+
+    The overlap check and the insert share one write transaction (the
+    single writer or BEGIN IMMEDIATE), so concurrent bookings of the same
+    table can never both succeed. The SQL check stays authoritative; the
+    occupancy index is only updated once the booking has committed.
+
+    `alert(reservation_id)` is queued in the outbox for every chat in
+    `alert_to` within the same transaction.
+    """
+
+    end_at = start_at + RESERVATION_DURATION
+    start_ts, end_ts = _dt_to_ts(start_at), _dt_to_ts(end_at)
+
+    jobs: list[ScheduledJob] = []
+    queued: list[int] = []
+
+    async def _tx(db: aiosqlite.Connection) -> Optional[int]:
+        if not await _table_is_free(db, table_id, start_ts, end_ts):
+            return None
+        reservation_id = await _insert_reservation(
+            db,
+            user_id=user_id,
+            table_id=table_id,
+            start_ts=start_ts,
+            end_ts=end_ts,
+            guests=guests,
+            name=name,
+            phone=phone,
+        )
+        await _schedule_reservation_jobs(
+            db,
+            jobs,
+            reservation_id,
+            start_ts,
+            _confirm_timeouts.get(db_path),
+        )
+        if alert is not None:
+            await _queue_alert(db, queued, alert_to, alert(reservation_id))
+        return reservation_id
+
+    reservation_id = await _write(db_path, _tx)
+    _invalidate_availability(db_path)
+    _announce_jobs(db_path, jobs)
+    _announce_outbox(db_path, queued)
+    index = _occupancy.get(db_path)
+    if reservation_id is not None and index is not None:
+        index.add(reservation_id, table_id, start_ts, end_ts)
+    return reservation_id
+
+
+async def _assign_tables(
+    db: aiosqlite.Connection,
+    jobs: list[ScheduledJob],
+    *,
+    confirm_timeout: Optional[int],
+    user_id: int,
+    start_ts: int,
+    guests: int,
+    name: str,
+    phone: str,
+) -> Optional[TableAssignment]:
+    """Pick tables with bot.seating.best_fit and insert the reservation rows.
+
+    A party on several tables gets one row per table, all sharing
+    group_id = the first row's id.
+    """
+
+    duration = int(RESERVATION_DURATION.total_seconds())
+    end_ts = start_ts + duration
+    open_ts, close_ts = _day_bounds(datetime.fromtimestamp(start_ts))
+    hall = await _load_hall(db)
+    busy = await _load_busy(db, min(open_ts, start_ts), max(close_ts, end_ts))
+    group = best_fit(
+        hall,
+        guests,
+        busy,
+        start_ts,
+        end_ts,
+        open_ts=open_ts,
+        close_ts=close_ts,
+        min_gap=duration,
+    )
+    if group is None:
+        return None
+
+    ids = [
+        await _insert_reservation(
+            db,
+            user_id=user_id,
+            table_id=table.id,
+            start_ts=start_ts,
+            end_ts=end_ts,
+            guests=guests,
+            name=name,
+            phone=phone,
+        )
+        for table in group
+    ]
+    if len(ids) > 1:
+        await db.execute(
+            f"UPDATE reservation SET group_id = ? WHERE id IN ({','.join('?' * len(ids))})",
+            (ids[0], *ids),
+        )
+    # Status changes cascade over the group, so only the first row gets jobs.
+    await _schedule_reservation_jobs(db, jobs, ids[0], start_ts, confirm_timeout)
+    return TableAssignment(reservation_ids=ids, tables=list(group), start_at=start_ts, end_at=end_ts)
+
+
+def _index_assignment(db_path: str, assignment: TableAssignment) -> None:
+    index = _occupancy.get(db_path)
+    if index is None:
+        return
+    for reservation_id, table in zip(assignment.reservation_ids, assignment.tables):
+        index.add(reservation_id, table.id, assignment.start_at, assignment.end_at)
+
+
+async def reserve_best_fit(
+    db_path: str,
+    *,
+    user_id: int,
+    start_at: datetime,
+    guests: int,
+    name: str,
+    phone: str,
+    alert_to: Iterable[int] = (),
+    alert: Optional[Callable[[TableAssignment], str]] = None,
+) -> Optional[TableAssignment]:
+    """Book whatever the assignment engine picks, or return None if nothing fits.
+
+    The choice is made inside the write transaction against the day's
+    committed bookings. `alert(assignment)` is queued in the outbox for
+    every chat in `alert_to` in the same transaction.
+    """
+
+    start_ts = _dt_to_ts(start_at)
+    jobs: list[ScheduledJob] = []
+    queued: list[int] = []
+
+    async def _tx(db: aiosqlite.Connection) -> Optional[TableAssignment]:
+        assignment = await _assign_tables(
+            db,
+            jobs,
+            confirm_timeout=_confirm_timeouts.get(db_path),
+            user_id=user_id,
+            start_ts=start_ts,
+            guests=guests,
+            name=name,
+            phone=phone,
+        )
+        if assignment is not None and alert is not None:
+            await _queue_alert(db, queued, alert_to, alert(assignment))
+        return assignment
+
+    assignment = await _write(db_path, _tx)
+    _invalidate_availability(db_path)
+    _announce_jobs(db_path, jobs)
+    _announce_outbox(db_path, queued)
+    if assignment is not None:
+        _index_assignment(db_path, assignment)
+    return assignment
+
+
+async def join_waitlist(
+    db_path: str,
+    *,
+    user_id: int,
+    start_at: datetime,
+    guests: int,
+    name: str,
+    phone: str,
+) -> int:
+    async def _tx(db: aiosqlite.Connection) -> int:
+        cur = await db.execute(
             """
-            INSERT INTO cafe_order_item(order_id, menu_item_id, qty, item_price_cents, comment)
+            INSERT INTO waitlist(user_id, start_at, guests, name, phone)
             VALUES (?, ?, ?, ?, ?)
             """,
-            [
-                (
-                    order_id,
-                    int(it["menu_item_id"]),
-                    int(it["qty"]),
-                    int(it["price_cents"]),
-                    str(it.get("comment", "")),
-                )
+            (user_id, _dt_to_ts(start_at), guests, name, phone),
+        )
+        waitlist_id = cur.lastrowid
+        await cur.close()
+        return int(waitlist_id)
+
+    return await _write(db_path, _tx)
+
+
+async def _promote_waitlist(
+    db: aiosqlite.Connection,
+    jobs: list[ScheduledJob],
+    queued: list[int],
+    start_ts: int,
+    end_ts: int,
+    *,
+    confirm_timeout: Optional[int],
+    alert_to: Iterable[int] = (),
+    alert: Optional[Callable[[WaitlistPromotion], str]] = None,
+    notice: Optional[Callable[[WaitlistPromotion], str]] = None,
+) -> list[WaitlistPromotion]:
+    """Seat waiting guests whose booking would overlap the freed [start_ts, end_ts).
+
+    Only those requests can have been unblocked, so they are found with a
+    start_at range scan on ix_waitlist_waiting_start and tried oldest first.
+    Each promotion queues `notice(promotion)` to the guest and
+    `alert(promotion)` to `alert_to` in the outbox.
+    """
+
+    alert_to = list(alert_to)
+
+    duration = int(RESERVATION_DURATION.total_seconds())
+    now_ts = _dt_to_ts(datetime.now())
+    cur = await db.execute(
+        """
+        SELECT id, user_id, start_at, guests, name, phone
+        FROM waitlist
+        WHERE status = 'waiting' AND start_at > ? AND start_at < ?
+        ORDER BY created_at, id
+        """,
+        (max(start_ts - duration, now_ts), end_ts),
+    )
+    waiting = await cur.fetchall()
+    await cur.close()
+
+    promotions: list[WaitlistPromotion] = []
+    for waitlist_id, user_id, wait_start_ts, guests, name, phone in waiting:
+        assignment = await _assign_tables(
+            db,
+            jobs,
+            confirm_timeout=confirm_timeout,
+            user_id=user_id,
+            start_ts=wait_start_ts,
+            guests=guests,
+            name=name,
+            phone=phone,
+        )
+        if assignment is None:
+            continue
+        await db.execute(
+            "UPDATE waitlist SET status = 'promoted', reservation_id = ? WHERE id = ?",
+            (assignment.reservation_id, waitlist_id),
+        )
+        promotion = WaitlistPromotion(
+            waitlist_id=waitlist_id,
+            user_id=user_id,
+            guests=guests,
+            assignment=assignment,
+        )
+        if notice is not None and user_id:
+            await _queue_alert(db, queued, [user_id], notice(promotion))
+        if alert is not None:
+            await _queue_alert(db, queued, alert_to, alert(promotion))
+        promotions.append(promotion)
+    return promotions
+
+
+async def _insert_order(
+    db: aiosqlite.Connection,
+    jobs: list[ScheduledJob],
+    *,
+    user_id: int,
+    order_type: str,
+    scheduled_for: Optional[datetime],
+    name: str,
+    phone: str,
+    address: Optional[str],
+    comment: str,
+    items: list[dict[str, Any]],
+) -> int:
+    total_cents = sum(int(it["price_cents"]) * int(it["qty"]) for it in items)
+    scheduled_for_ts = _dt_to_ts(scheduled_for) if scheduled_for else None
+    cur = await db.execute(
+        """
+        INSERT INTO cafe_order(user_id, type, status, scheduled_for, name, phone, address, comment, total_cents)
+        VALUES (?, ?, 'new', ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            user_id,
+            order_type,
+            scheduled_for_ts,
+            name,
+            phone,
+            address,
+            comment,
+            total_cents,
+        ),
+    )
+    order_id = int(cur.lastrowid)
+    await cur.close()
+
+    await db.executemany(
+        """
+        INSERT INTO cafe_order_item(order_id, menu_item_id, qty, item_price_cents, comment)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                order_id,
+                int(it["menu_item_id"]),
+                int(it["qty"]),
+                int(it["price_cents"]),
+                str(it.get("comment", "")),
+            )
+            for it in items
+        ],
+    )
+    await _schedule_job(
+        db,
+        jobs,
+        JOB_ORDER_STALE,
+        order_id,
+        _dt_to_ts(datetime.now()) + int(ORDER_STALE_AFTER.total_seconds()),
+    )
+    return order_id
+
+
+async def create_order(
+    db_path: str,
+    *,
+    user_id: int,
+    order_type: str,
+    scheduled_for: Optional[datetime],
+    name: str,
+    phone: str,
+    address: Optional[str],
+    comment: str,
+    items: list[dict[str, Any]],
+    alert_to: Iterable[int] = (),
+    alert: Optional[Callable[[int], str]] = None,
+) -> int:
+    """Store an order; `alert(order_id)` is queued in the outbox for every
+    chat in `alert_to` in the same transaction."""
+
+    jobs: list[ScheduledJob] = []
+    queued: list[int] = []
+
+    async def _tx(db: aiosqlite.Connection) -> int:
+        order_id = await _insert_order(
+            db,
+            jobs,
+            user_id=user_id,
+            order_type=order_type,
+            scheduled_for=scheduled_for,
+            name=name,
+            phone=phone,
+            address=address,
+            comment=comment,
+            items=items,
+        )
+        if alert is not None:
+            await _queue_alert(db, queued, alert_to, alert(order_id))
+        return order_id
+
+    order_id = await _write(db_path, _tx)
+    _announce_jobs(db_path, jobs)
+    _announce_outbox(db_path, queued)
+    return order_id
+
+
+async def checkout_order(
+    db_path: str,
+    *,
+    user_id: int,
+    order_type: str,
+    scheduled_for: Optional[datetime],
+    name: str,
+    phone: str,
+    address: Optional[str],
+    comment: str,
+    lines: list[CartLine],
+    alert_to: Iterable[int] = (),
+    alert: Optional[Callable[[int], str]] = None,
+) -> CheckoutResult:
+    """Price a cart and store it as an order in a single transaction.
+
+    Lines are matched to active menu items by (category, title) with one SQL
+    lookup inside the write transaction, not against the MenuCatalog
+    snapshot, so a price changed by another write cannot slip in between
+    pricing and insert; unknown or repriced items are upserted first.
+    Everything, including the order and its items, is written under one
+    BEGIN IMMEDIATE and one commit (shared with other writes in the same
+    group commit), so a crash never leaves a half-written checkout behind. The same goes for `alert(order_id)`, queued in the
+    outbox for every chat in `alert_to`.
+    """
+
+    keys = list(dict.fromkeys((ln.category, ln.title) for ln in lines))
+    jobs: list[ScheduledJob] = []
+    queued: list[int] = []
+
+    async def _tx(db: aiosqlite.Connection) -> tuple[int, list[OrderLine], bool]:
+        known: dict[tuple[str, str], tuple[int, int]] = {}
+        if keys:
+            placeholders = ", ".join("(?, ?)" for _ in keys)
+            cur = await db.execute(
+                f"""
+                SELECT category, title, id, price_cents
+                FROM menu_item
+                WHERE is_active = 1 AND (category, title) IN (VALUES {placeholders})
+                ORDER BY id
+                """,
+                [v for key in keys for v in key],
+            )
+            for category, title, item_id, price_cents in await cur.fetchall():
+                known[(category, title)] = (int(item_id), int(price_cents))
+            await cur.close()
+
+        stale = [
+            (ln.category, ln.title, ln.description, int(ln.price_cents))
+            for ln in lines
+            if (ln.category, ln.title) not in known
+            or known[(ln.category, ln.title)][1] != int(ln.price_cents)
+        ]
+        if stale:
+            ids = await _upsert_menu_items(db, stale)
+            for (category, title, _, price_cents), item_id in zip(stale, ids):
+                known[(category, title)] = (item_id, price_cents)
+
+        items = [
+            OrderLine(
+                menu_item_id=known[(ln.category, ln.title)][0],
+                title=ln.title,
+                qty=int(ln.qty),
+                price_cents=known[(ln.category, ln.title)][1],
+            )
+            for ln in lines
+        ]
+        order_id = await _insert_order(
+            db,
+            jobs,
+            user_id=user_id,
+            order_type=order_type,
+            scheduled_for=scheduled_for,
+            name=name,
+            phone=phone,
+            address=address,
+            comment=comment,
+            items=[
+                {"menu_item_id": it.menu_item_id, "qty": it.qty, "price_cents": it.price_cents}
                 for it in items
             ],
         )
+        if alert is not None:
+            await _queue_alert(db, queued, alert_to, alert(order_id))
+        return order_id, items, bool(stale)
+
+    order_id, items, menu_changed = await _write(db_path, _tx)
+    _announce_jobs(db_path, jobs)
+    _announce_outbox(db_path, queued)
+    if menu_changed:
+        await refresh_menu_catalog(db_path)
+    return CheckoutResult(
+        order_id=order_id,
+        total_cents=sum(it.price_cents * it.qty for it in items),
+        items=items,
+    )
 
-        await db.commit()
-    return order_id
 
+def _keyset(
+    column: str,
+    *,
+    before_id: Optional[int],
+    after_id: Optional[int],
+) -> tuple[str, str, list[int]]:
+    """WHERE/ORDER BY for id-keyset pages: `before_id` pages back, `after_id` forward."""
 
-async def fetch_recent_orders(db_path: str, *, limit: int = 20) -> list[CafeOrder]:
-    async with aiosqlite.connect(db_path) as db:
+    if after_id is not None:
+        return f"WHERE {column} > ?", f"ORDER BY {column} ASC", [int(after_id)]
+    if before_id is not None:
+        return f"WHERE {column} < ?", f"ORDER BY {column} DESC", [int(before_id)]
+    return "", f"ORDER BY {column} DESC", []
+
+
+async def fetch_recent_orders(
+    db_path: str,
+    *,
+    limit: int = 20,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> list[CafeOrder]:
+    """Orders newest first, optionally keyset-paged by id (see `_keyset`)."""
+
+    where, order_by, params = _keyset("id", before_id=before_id, after_id=after_id)
+    async with _connect_report(db_path) as db:
         cur = await db.execute(
-            """
+            f"""
             SELECT id, user_id, type, status, created_at, scheduled_for, name, phone, address, comment, total_cents
             FROM cafe_order
-            ORDER BY id DESC
+            {where}
+            {order_by}
             LIMIT ?
             """,
-            (int(limit),),
+            (*params, int(limit)),
         )
         rows = await cur.fetchall()
         await cur.close()
-    return [CafeOrder(*row) for row in rows]
+    orders = [CafeOrder(*row) for row in rows]
+    if after_id is not None:
+        orders.reverse()
+    return orders
+
+
+async def fetch_order(db_path: str, order_id: int) -> Optional[CafeOrder]:
+    async with _connect_report(db_path) as db:
+        cur = await db.execute(
+            """
+            SELECT id, user_id, type, status, created_at, scheduled_for, name, phone, address, comment, total_cents
+            FROM cafe_order
+            WHERE id = ?
+            """,
+            (int(order_id),),
+        )
+        row = await cur.fetchone()
+        await cur.close()
+    return CafeOrder(*row) if row else None
 
 
 async def fetch_order_items(db_path: str, order_id: int) -> list[dict[str, Any]]:
-    async with aiosqlite.connect(db_path) as db:
+    async with _connect_report(db_path) as db:
         cur = await db.execute(
             """
             SELECT oi.menu_item_id, mi.title, oi.qty, oi.item_price_cents, oi.comment
@@ -547,35 +1879,218 @@ async def fetch_order_items(db_path: str, order_id: int) -> list[dict[str, Any]]
 
 
 async def update_order_status(db_path: str, order_id: int, status: str) -> None:
-    async with aiosqlite.connect(db_path) as db:
+    async def _tx(db: aiosqlite.Connection) -> None:
         await db.execute(
             "UPDATE cafe_order SET status = ? WHERE id = ?",
             (str(status), int(order_id)),
         )
-        await db.commit()
 
+    await _write(db_path, _tx)
 
-async def fetch_recent_reservations(db_path: str, *, limit: int = 20) -> list[Reservation]:
-    async with aiosqlite.connect(db_path) as db:
+
+# A combined-table booking is listed once, under its first row, with all
+# table codes joined ("T5+T6").
+_RESERVATION_COLUMNS = """
+    r.id, r.user_id, r.table_id,
+    COALESCE(
+        (
+            SELECT group_concat(gt.code, '+')
+            FROM reservation g
+            JOIN cafe_table gt ON gt.id = g.table_id
+            WHERE g.group_id = r.group_id
+        ),
+        t.code
+    ),
+    r.start_at, r.end_at, r.guests, r.name, r.phone, r.status, r.created_at
+"""
+
+
+async def fetch_recent_reservations(
+    db_path: str,
+    *,
+    limit: int = 20,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> list[Reservation]:
+    """Reservations newest first, optionally keyset-paged by id (see `_keyset`)."""
+
+    where, order_by, params = _keyset("r.id", before_id=before_id, after_id=after_id)
+    group_leader = "(r.group_id IS NULL OR r.group_id = r.id)"
+    where = f"{where} AND {group_leader}" if where else f"WHERE {group_leader}"
+    async with _connect_report(db_path) as db:
         cur = await db.execute(
-            """
-            SELECT r.id, r.user_id, r.table_id, t.code, r.start_at, r.end_at, r.guests, r.name, r.phone, r.status, r.created_at
+            f"""
+            SELECT {_RESERVATION_COLUMNS}
             FROM reservation r
             JOIN cafe_table t ON t.id = r.table_id
-            ORDER BY r.id DESC
+            {where}
+            {order_by}
             LIMIT ?
             """,
-            (int(limit),),
+            (*params, int(limit)),
         )
         rows = await cur.fetchall()
         await cur.close()
-    return [Reservation(*row) for row in rows]
+    reservations = [Reservation(*row) for row in rows]
+    if after_id is not None:
+        reservations.reverse()
+    return reservations
 
 
-async def update_reservation_status(db_path: str, reservation_id: int, status: str) -> None:
-    async with aiosqlite.connect(db_path) as db:
+async def fetch_reservation(db_path: str, reservation_id: int) -> Optional[Reservation]:
+    async with _connect_report(db_path) as db:
+        cur = await db.execute(
+            f"""
+            SELECT {_RESERVATION_COLUMNS}
+            FROM reservation r
+            JOIN cafe_table t ON t.id = r.table_id
+            WHERE r.id = ?
+            """,
+            (int(reservation_id),),
+        )
+        row = await cur.fetchone()
+        await cur.close()
+    return Reservation(*row) if row else None
+
+
+async def _set_reservation_status(
+    db_path: str,
+    reservation_id: int,
+    status: str,
+    *,
+    from_status: Optional[str] = None,
+    alert_to: Iterable[int] = (),
+    alert: Optional[Callable[[WaitlistPromotion], str]] = None,
+    notice: Optional[Callable[[WaitlistPromotion], str]] = None,
+) -> Optional[list[WaitlistPromotion]]:
+    jobs: list[ScheduledJob] = []
+    queued: list[int] = []
+
+    async def _tx(
+        db: aiosqlite.Connection,
+    ) -> Optional[tuple[list[tuple[int, int, int, int]], list[WaitlistPromotion]]]:
+        if from_status is not None:
+            cur = await db.execute("SELECT status FROM reservation WHERE id = ?", (int(reservation_id),))
+            row = await cur.fetchone()
+            await cur.close()
+            if row is None or row[0] != from_status:
+                return None
+
+        cur = await db.execute(
+            """
+            SELECT id, table_id, start_at, end_at, status
+            FROM reservation
+            WHERE id = ? OR group_id = (SELECT group_id FROM reservation WHERE id = ?)
+            """,
+            (int(reservation_id), int(reservation_id)),
+        )
+        group = await cur.fetchall()
+        await cur.close()
+        if status in ACTIVE_RESERVATION_STATUSES:
+            # Reactivating: the tables may have been rebooked or given to the
+            # waitlist meanwhile, so check them as create_reservation does.
+            for _, table_id, start_ts, end_ts, current in group:
+                if current not in ACTIVE_RESERVATION_STATUSES and not await _table_is_free(
+                    db, table_id, start_ts, end_ts
+                ):
+                    return None
+
         await db.execute(
-            "UPDATE reservation SET status = ? WHERE id = ?",
-            (str(status), int(reservation_id)),
+            """
+            UPDATE reservation
+            SET status = ?
+            WHERE id = ? OR group_id = (SELECT group_id FROM reservation WHERE id = ?)
+            """,
+            (str(status), int(reservation_id), int(reservation_id)),
         )
-        await db.commit()
+        rows = [(row_id, table_id, start_ts, end_ts) for row_id, table_id, start_ts, end_ts, _ in group]
+
+        promotions: list[WaitlistPromotion] = []
+        if rows and status in FREEING_RESERVATION_STATUSES:
+            _, _, start_ts, end_ts = rows[0]
+            promotions = await _promote_waitlist(
+                db,
+                jobs,
+                queued,
+                start_ts,
+                end_ts,
+                confirm_timeout=_confirm_timeouts.get(db_path),
+                alert_to=alert_to,
+                alert=alert,
+                notice=notice,
+            )
+        return rows, promotions
+
+    result = await _write(db_path, _tx)
+    if result is None:
+        return None
+
+    rows, promotions = result
+    _invalidate_availability(db_path)
+    _announce_jobs(db_path, jobs)
+    _announce_outbox(db_path, queued)
+    index = _occupancy.get(db_path)
+    if index is not None:
+        for row_id, table_id, start_ts, end_ts in rows:
+            if status in ACTIVE_RESERVATION_STATUSES:
+                index.add(row_id, table_id, start_ts, end_ts)
+            else:
+                index.remove(row_id)
+    for promotion in promotions:
+        _index_assignment(db_path, promotion.assignment)
+    return promotions
+
+
+async def update_reservation_status(
+    db_path: str,
+    reservation_id: int,
+    status: str,
+    *,
+    alert_to: Iterable[int] = (),
+    alert: Optional[Callable[[WaitlistPromotion], str]] = None,
+    notice: Optional[Callable[[WaitlistPromotion], str]] = None,
+) -> Optional[list[WaitlistPromotion]]:
+    """Set the status of a reservation and of every row in its table group.
+
+    Canceling, expiring or marking a no-show frees the tables, and the
+    waitlist is matched against the freed time in the same transaction.
+    The promoted guests' `notice` and the admins' `alert` are queued in the
+    outbox by that transaction too. Returns the guests who got a table.
+
+    Moving a freed reservation back to pending/confirmed re-checks its
+    tables in the same transaction; if one is taken by now, nothing
+    changes and None is returned.
+    """
+
+    return await _set_reservation_status(
+        db_path,
+        reservation_id,
+        status,
+        alert_to=alert_to,
+        alert=alert,
+        notice=notice,
+    )
+
+
+async def transition_reservation_status(
+    db_path: str,
+    reservation_id: int,
+    *,
+    from_status: str,
+    to_status: str,
+    alert_to: Iterable[int] = (),
+    alert: Optional[Callable[[WaitlistPromotion], str]] = None,
+    notice: Optional[Callable[[WaitlistPromotion], str]] = None,
+) -> Optional[list[WaitlistPromotion]]:
+    """Like update_reservation_status, but only if the reservation is still in
+    `from_status`; returns None (and changes nothing) otherwise."""
+
+    return await _set_reservation_status(
+        db_path,
+        reservation_id,
+        to_status,
+        from_status=from_status,
+        alert_to=alert_to,
+        alert=alert,
+        notice=notice,
+    )
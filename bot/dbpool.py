@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
+import aiosqlite
+
+
+BUSY_TIMEOUT_MS = 5000
+
+
+async def apply_pragmas(db: aiosqlite.Connection) -> None:
+    await db.execute("PRAGMA journal_mode=WAL;")
+    await db.execute("PRAGMA foreign_keys=ON;")
+    await db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+
+
+async def apply_read_only_pragmas(db: aiosqlite.Connection) -> None:
+    # journal_mode is persistent in the file and cannot be set on a
+    # read-only handle; WAL lets these readers run beside the writer.
+    await db.execute("PRAGMA query_only=ON;")
+    await db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+
+
+async def open_connection(db_path: str, *, read_only: bool = False) -> aiosqlite.Connection:
+    if read_only:
+        uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        db = await aiosqlite.connect(uri, uri=True)
+    else:
+        db = await aiosqlite.connect(db_path)
+    try:
+        if read_only:
+            await apply_read_only_pragmas(db)
+        else:
+            await apply_pragmas(db)
+    except Exception:
+        await db.close()
+        raise
+    return db
+
+
+class ConnectionPool:
+    """Fixed set of long-lived SQLite connections shared by all handlers.
+
+    Every aiosqlite connection owns a worker thread, so opening one per query
+    costs a thread start plus a schema parse. The pool opens `size` connections
+    once (with PRAGMAs applied) and hands them out one task at a time.
+
+    With `read_only=True` the connections are opened with `mode=ro`, which is
+    used to keep reporting queries off the connections serving customers.
+    """
+
+    def __init__(self, db_path: str, *, size: int = 4, read_only: bool = False) -> None:
+        if size < 1:
+            raise ValueError("pool size must be >= 1")
+        self.db_path = db_path
+        self.size = size
+        self.read_only = read_only
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._connections: list[aiosqlite.Connection] = []
+
+    async def open(self) -> None:
+        for _ in range(self.size):
+            db = await open_connection(self.db_path, read_only=self.read_only)
+            self._connections.append(db)
+            self._idle.put_nowait(db)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        db = await self._idle.get()
+        try:
+            yield db
+        finally:
+            try:
+                # A caller that failed mid-write must not leak its transaction
+                # into the next borrower.
+                if db.in_transaction:
+                    await db.rollback()
+            finally:
+                self._idle.put_nowait(db)
+
+    async def close(self) -> None:
+        connections, self._connections = self._connections, []
+        for db in connections:
+            await db.close()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import aiosqlite
+
+from bot.dbpool import open_connection
+
+
+T = TypeVar("T")
+WriteFn = Callable[[aiosqlite.Connection], Awaitable[T]]
+
+log = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    """Single owner of the SQLite write connection.
+
+    Callers submit `async def fn(db) -> result` callbacks. The writer task
+    collects everything that arrives within `batch_window` seconds and runs it
+    as one BEGIN IMMEDIATE transaction with one commit (group commit). Each
+    callback gets its own SAVEPOINT, so one failing write only rolls back
+    itself. A result is delivered only after the commit has succeeded.
+
+    Callbacks must not commit or roll back themselves.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        batch_window: float = 0.002,
+        max_batch: int = 128,
+    ) -> None:
+        self.db_path = db_path
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue[Optional[tuple[WriteFn, asyncio.Future]]] = asyncio.Queue()
+        self._db: Optional[aiosqlite.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._db = await open_connection(self.db_path)
+        self._task = asyncio.create_task(self._run(), name="db-writer")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    async def submit(self, fn: WriteFn[T]) -> T:
+        if self._task is None or self._stopping:
+            raise RuntimeError("DB writer is not running")
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((fn, fut))
+        return await fut
+
+    def _drain(self, batch: list[tuple[WriteFn, asyncio.Future]]) -> bool:
+        """Move queued requests into `batch`; return False once stop was requested."""
+
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return True
+            if item is None:
+                return False
+            batch.append(item)
+        return True
+
+    async def _run(self) -> None:
+        running = True
+        while running:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            running = self._drain(batch)
+            if running and self.batch_window > 0 and len(batch) < self.max_batch:
+                await asyncio.sleep(self.batch_window)
+                running = self._drain(batch)
+            await self._commit_batch(batch)
+
+    async def _commit_batch(self, batch: list[tuple[WriteFn, asyncio.Future]]) -> None:
+        db = self._db
+        assert db is not None
+        outcomes: list[tuple[asyncio.Future, object, bool]] = []
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            for fn, fut in batch:
+                if fut.cancelled():
+                    continue
+                await db.execute("SAVEPOINT write")
+                try:
+                    result = await fn(db)
+                except Exception as exc:
+                    await db.execute("ROLLBACK TO write")
+                    await db.execute("RELEASE write")
+                    outcomes.append((fut, exc, False))
+                else:
+                    await db.execute("RELEASE write")
+                    outcomes.append((fut, result, True))
+            await db.commit()
+        except Exception as exc:
+            log.exception("Group commit of %d writes failed", len(batch))
+            if db.in_transaction:
+                await db.rollback()
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+
+        for fut, value, ok in outcomes:
+            if fut.done():
+                continue
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)  # type: ignore[arg-type]
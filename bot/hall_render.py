@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:  # Pillow is optional: without it the static plan is sent as is
+    Image = None
+    ImageDraw = None
+
+if TYPE_CHECKING:
+    from bot.db import CafeTable
+
+
+log = logging.getLogger(__name__)
+
+FREE_FILL = (46, 160, 67, 150)
+BUSY_FILL = (218, 54, 51, 150)
+
+Box = tuple[int, int, int, int]
+# ((table code, is_free), ...): the picture carries no slot, so the same
+# availability renders (and uploads to Telegram) only once
+RenderKey = tuple[tuple[str, bool], ...]
+
+_renderers: dict[tuple[str, str], HallPlanRenderer] = {}
+
+
+def load_layout(path: str) -> dict[str, Box]:
+    """Table boxes from the layout file: {"tables": {code: [left, top, right, bottom]}}."""
+
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {str(code): tuple(int(v) for v in box) for code, box in data.get("tables", {}).items()}
+
+
+def load_table_links(path: str) -> list[tuple[str, str]]:
+    """Pairs of table codes that can be pushed together ("adjacent" in the layout file)."""
+
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return []
+    return [(str(a), str(b)) for a, b in data.get("adjacent", [])]
+
+
+class HallPlanRenderer:
+    """Draws the hall plan with every table tinted by availability for a slot.
+
+    The plan and layout are loaded once; rendered PNGs are kept in an LRU
+    keyed by the availability signature (the slot goes into the caption, not
+    the image), so each distinct picture is rendered once. Decoding, drawing and encoding run in a worker
+    thread. Without Pillow or a layout file the plain plan bytes are returned.
+    """
+
+    def __init__(self, plan_path: str, layout_path: str, *, cache_size: int = 64) -> None:
+        self.plan_path = plan_path
+        self.layout_path = layout_path
+        self.cache_size = cache_size
+        self._cache: OrderedDict[RenderKey, bytes] = OrderedDict()
+        self._inflight: dict[RenderKey, asyncio.Future] = {}
+        self._base: Optional[Image.Image] = None
+        self._layout: Optional[dict[str, Box]] = None
+        self._static: Optional[bytes] = None
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def render(self, availability: list[tuple[CafeTable, bool]]) -> Optional[bytes]:
+        """PNG bytes of the plan tinted by `availability`, or None if there is no plan image."""
+
+        await self._ensure_loaded()
+        if self._base is None or not self._layout:
+            return self._static
+
+        key: RenderKey = tuple(
+            sorted((t.code, bool(ok)) for t, ok in availability if t.code in self._layout)
+        )
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        # Concurrent requests for the same picture share one render.
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            image = await asyncio.to_thread(self._draw, key)
+        except Exception as exc:
+            fut.set_exception(exc)
+            fut.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        fut.set_result(image)
+        self._cache[key] = image
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return image
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                await asyncio.to_thread(self._load)
+                self._loaded = True
+
+    def _load(self) -> None:
+        plan = Path(self.plan_path)
+        if not plan.is_file():
+            return
+        self._static = plan.read_bytes()
+        if Image is None:
+            return
+        try:
+            self._layout = load_layout(self.layout_path)
+        except (OSError, ValueError) as exc:
+            log.warning("Hall layout %s not loaded (%s); sending the plain plan", self.layout_path, exc)
+            return
+        base = Image.open(io.BytesIO(self._static))
+        base.load()
+        self._base = base.convert("RGBA")
+
+    def _draw(self, key: RenderKey) -> bytes:
+        assert self._base is not None and self._layout is not None
+        overlay = Image.new("RGBA", self._base.size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        for code, is_free in key:
+            draw.rounded_rectangle(
+                self._layout[code],
+                radius=12,
+                fill=FREE_FILL if is_free else BUSY_FILL,
+                outline=(255, 255, 255, 255),
+                width=4,
+            )
+        image = Image.alpha_composite(self._base, overlay).convert("RGB")
+        out = io.BytesIO()
+        image.save(out, format="PNG")
+        return out.getvalue()
+
+
+def get_hall_renderer(plan_path: str, layout_path: str) -> HallPlanRenderer:
+    key = (plan_path, layout_path)
+    renderer = _renderers.get(key)
+    if renderer is None:
+        renderer = _renderers[key] = HallPlanRenderer(plan_path, layout_path)
+    return renderer
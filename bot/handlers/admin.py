@@ -1,21 +1,23 @@
 from __future__ import annotations
 
 import re
-from typing import Optional
+from typing import Optional, TypeVar
 
 from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 
 from bot.config import Config
 from bot.db import (
     fetch_active_menu_items,
     fetch_menu_item,
+    fetch_order,
     fetch_order_items,
     fetch_recent_orders,
     fetch_recent_reservations,
+    fetch_reservation,
     update_menu_item_price,
     update_order_status,
     update_reservation_status,
@@ -29,11 +31,22 @@ from bot.keyboards import (
     admin_orders_kb,
     main_menu_kb,
 )
-from bot.utils import format_price, is_admin_user
+from bot.utils import (
+    admin_targets,
+    format_price,
+    format_ts,
+    is_admin_user,
+    waitlist_promotion_alert,
+    waitlist_promotion_text,
+)
 
 
 router = Router(name=__name__)
 
+ADMIN_PAGE_SIZE = 20
+
+T = TypeVar("T")
+
 
 class AdminFlow(StatesGroup):
     waiting_price = State()
@@ -75,33 +88,104 @@ async def _admin_send_items(message: Message, config: Config) -> None:
     await message.answer("Выберите позицию для редактирования:", reply_markup=admin_items_kb(buttons))
 
 
-async def _admin_send_orders(message: Message, config: Config) -> None:
-    orders = await fetch_recent_orders(config.db_path, limit=20)
+def _page_window(
+    rows: list[T],
+    *,
+    before_id: Optional[int],
+    after_id: Optional[int],
+) -> tuple[list[T], bool, bool]:
+    """Trim a keyset fetch of ADMIN_PAGE_SIZE + 1 rows to one page.
+
+    Returns (rows, has_newer, has_older).
+    """
+
+    if after_id is not None:
+        return rows[-ADMIN_PAGE_SIZE:], len(rows) > ADMIN_PAGE_SIZE, True
+    return rows[:ADMIN_PAGE_SIZE], before_id is not None, len(rows) > ADMIN_PAGE_SIZE
+
+
+async def _orders_page(
+    config: Config,
+    *,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> Optional[tuple[str, InlineKeyboardMarkup]]:
+    orders = await fetch_recent_orders(
+        config.db_path,
+        limit=ADMIN_PAGE_SIZE + 1,
+        before_id=before_id,
+        after_id=after_id,
+    )
+    if after_id is not None and len(orders) <= ADMIN_PAGE_SIZE:
+        # Paged forward to the newest orders: show the regular first page.
+        return await _orders_page(config)
+    orders, has_newer, has_older = _page_window(orders, before_id=before_id, after_id=after_id)
     if not orders:
-        await message.answer("Заказов пока нет.")
-        return
+        return None
 
     buttons: list[tuple[int, str]] = []
     for o in orders:
-        when = o.scheduled_for or "сейчас"
+        when = format_ts(o.scheduled_for) if o.scheduled_for else "сейчас"
         buttons.append(
             (o.id, f"#{o.id} {o.type}/{o.status} — {format_price(o.total_cents)} ({when})")
         )
 
-    await message.answer("Последние заказы:", reply_markup=admin_orders_kb(buttons))
+    kb = admin_orders_kb(
+        buttons,
+        newer_cursor=orders[0].id if has_newer else None,
+        older_cursor=orders[-1].id if has_older else None,
+    )
+    return "Последние заказы:", kb
+
+
+async def _bookings_page(
+    config: Config,
+    *,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> Optional[tuple[str, InlineKeyboardMarkup]]:
+    res = await fetch_recent_reservations(
+        config.db_path,
+        limit=ADMIN_PAGE_SIZE + 1,
+        before_id=before_id,
+        after_id=after_id,
+    )
+    if after_id is not None and len(res) <= ADMIN_PAGE_SIZE:
+        return await _bookings_page(config)
+    res, has_newer, has_older = _page_window(res, before_id=before_id, after_id=after_id)
+    if not res:
+        return None
+
+    buttons: list[tuple[int, str]] = []
+    for r in res:
+        buttons.append((r.id, f"#{r.id} {r.table_code} {format_ts(r.start_at)} ({r.guests}) {r.status}"))
+
+    kb = admin_bookings_kb(
+        buttons,
+        newer_cursor=res[0].id if has_newer else None,
+        older_cursor=res[-1].id if has_older else None,
+    )
+    return "Последние брони:", kb
+
+
+async def _admin_send_orders(message: Message, config: Config) -> None:
+    page = await _orders_page(config)
+    if not page:
+        await message.answer("Заказов пока нет.")
+        return
+
+    text, kb = page
+    await message.answer(text, reply_markup=kb)
 
 
 async def _admin_send_bookings(message: Message, config: Config) -> None:
-    res = await fetch_recent_reservations(config.db_path, limit=20)
-    if not res:
+    page = await _bookings_page(config)
+    if not page:
         await message.answer("Броней пока нет.")
         return
 
-    buttons: list[tuple[int, str]] = []
-    for r in res:
-        buttons.append((r.id, f"#{r.id} {r.table_code} {r.start_at} ({r.guests}) {r.status}"))
-
-    await message.answer("Последние брони:", reply_markup=admin_bookings_kb(buttons))
+    text, kb = page
+    await message.answer(text, reply_markup=kb)
 
 
 @router.message(Command("admin"))
@@ -183,6 +267,50 @@ async def admin_bookings_cb(call: CallbackQuery, state: FSMContext, config: Conf
     await call.answer()
 
 
+@router.callback_query(F.data.startswith("admin:orders:"))
+async def admin_orders_page_cb(call: CallbackQuery, config: Config) -> None:
+    if not is_admin_user(config, user_id=call.from_user.id if call.from_user else None, chat_id=call.message.chat.id if call.message else None):
+        await call.answer("Нет доступа", show_alert=True)
+        return
+
+    _, _, direction, cursor_s = call.data.split(":", 3)
+    cursor = int(cursor_s)
+    page = await _orders_page(
+        config,
+        before_id=cursor if direction == "before" else None,
+        after_id=cursor if direction == "after" else None,
+    )
+    if not page:
+        await call.answer("Больше заказов нет")
+        return
+
+    text, kb = page
+    await call.message.edit_text(text, reply_markup=kb)
+    await call.answer()
+
+
+@router.callback_query(F.data.startswith("admin:bookings:"))
+async def admin_bookings_page_cb(call: CallbackQuery, config: Config) -> None:
+    if not is_admin_user(config, user_id=call.from_user.id if call.from_user else None, chat_id=call.message.chat.id if call.message else None):
+        await call.answer("Нет доступа", show_alert=True)
+        return
+
+    _, _, direction, cursor_s = call.data.split(":", 3)
+    cursor = int(cursor_s)
+    page = await _bookings_page(
+        config,
+        before_id=cursor if direction == "before" else None,
+        after_id=cursor if direction == "after" else None,
+    )
+    if not page:
+        await call.answer("Больше броней нет")
+        return
+
+    text, kb = page
+    await call.message.edit_text(text, reply_markup=kb)
+    await call.answer()
+
+
 @router.callback_query(F.data == "admin:back")
 async def admin_back(call: CallbackQuery, state: FSMContext, config: Config) -> None:
     if not is_admin_user(config, user_id=call.from_user.id if call.from_user else None, chat_id=call.message.chat.id if call.message else None):
@@ -224,8 +352,7 @@ async def admin_open_order(call: CallbackQuery, config: Config) -> None:
         return
 
     order_id = int(call.data.split(":")[-1])
-    orders = await fetch_recent_orders(config.db_path, limit=200)
-    order = next((o for o in orders if o.id == order_id), None)
+    order = await fetch_order(config.db_path, order_id)
     if not order:
         await call.answer("Не найдено")
         return
@@ -235,8 +362,8 @@ async def admin_open_order(call: CallbackQuery, config: Config) -> None:
         f"🧾 Заказ #{order.id}",
         f"Тип: {order.type}",
         f"Статус: {order.status}",
-        f"Создан: {order.created_at}",
-        f"Когда: {order.scheduled_for or 'сейчас'}",
+        f"Создан: {format_ts(order.created_at)}",
+        f"Когда: {format_ts(order.scheduled_for) if order.scheduled_for else 'сейчас'}",
         f"Имя: {order.name}",
         f"Тел: {order.phone}",
         f"Адрес: {order.address or '-'}",
@@ -275,8 +402,7 @@ async def admin_open_reservation(call: CallbackQuery, config: Config) -> None:
         return
 
     res_id = int(call.data.split(":")[-1])
-    items = await fetch_recent_reservations(config.db_path, limit=200)
-    r = next((x for x in items if x.id == res_id), None)
+    r = await fetch_reservation(config.db_path, res_id)
     if not r:
         await call.answer("Не найдено")
         return
@@ -285,11 +411,11 @@ async def admin_open_reservation(call: CallbackQuery, config: Config) -> None:
         f"🪑 Бронь #{r.id}\n"
         f"Стол: {r.table_code}\n"
         f"Статус: {r.status}\n"
-        f"Дата/время: {r.start_at}\n"
+        f"Дата/время: {format_ts(r.start_at)}\n"
         f"Гостей: {r.guests}\n"
         f"Имя: {r.name}\n"
         f"Тел: {r.phone}\n"
-        f"Создана: {r.created_at}"
+        f"Создана: {format_ts(r.created_at)}"
     )
     await call.message.answer(text, reply_markup=admin_booking_actions_kb(r.id))
     await call.answer()
@@ -303,7 +429,17 @@ async def admin_set_reservation_status(call: CallbackQuery, config: Config) -> N
 
     _, _, res_id_s, status = call.data.split(":", 3)
     res_id = int(res_id_s)
-    await update_reservation_status(config.db_path, res_id, status)
+    promotions = await update_reservation_status(
+        config.db_path,
+        res_id,
+        status,
+        alert_to=admin_targets(config),
+        alert=waitlist_promotion_alert,
+        notice=waitlist_promotion_text,
+    )
+    if promotions is None:
+        await call.answer("Стол на это время уже занят — статус не изменён", show_alert=True)
+        return
     await call.answer("Статус обновлён")
 
 
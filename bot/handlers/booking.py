@@ -8,11 +8,32 @@ from typing import Optional
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import BufferedInputFile, CallbackQuery, Message
+from aiogram.types import CallbackQuery, Message
 
 from bot.config import Config
-from bot.db import create_reservation, fetch_table, fetch_tables, table_is_available
-from bot.keyboards import calendar_month_kb, cancel_kb, contact_kb, main_menu_kb, tables_kb
+from bot.db import (
+    RESERVATION_DURATION,
+    create_reservation,
+    fetch_free_start_times,
+    fetch_month_load,
+    fetch_table,
+    fetch_table_availability,
+    find_best_fit,
+    join_waitlist,
+    reserve_best_fit,
+)
+from bot.hall_render import get_hall_renderer
+from bot.keyboards import (
+    DAY_FULL_MARK,
+    DAY_NEARLY_FULL_MARK,
+    calendar_month_kb,
+    cancel_kb,
+    contact_kb,
+    main_menu_kb,
+    tables_kb,
+    time_slots_kb,
+)
+from bot.media import send_cached_photo
 from bot.utils import combine_date_time, is_admin_user, parse_date, parse_time
 
 
@@ -29,7 +50,7 @@ class BookingFlow(StatesGroup):
 
 
 @router.message(F.text == "🪑 Бронь столика")
-async def start_booking(message: Message, state: FSMContext) -> None:
+async def start_booking(message: Message, state: FSMContext, config: Config) -> None:
     await state.clear()
     await state.set_state(BookingFlow.date)
     today = date.today()
@@ -37,14 +58,15 @@ async def start_booking(message: Message, state: FSMContext) -> None:
         "Выберите дату брони (или напишите: 'сегодня', 'завтра', YYYY-MM-DD):",
         reply_markup=cancel_kb(),
     )
+    load = await fetch_month_load(config.db_path, today.year, today.month)
     await message.answer(
-        "Календарь:",
-        reply_markup=calendar_month_kb(today.year, today.month, prefix="booking:cal"),
+        f"Календарь ({DAY_NEARLY_FULL_MARK} почти всё занято, {DAY_FULL_MARK} мест нет):",
+        reply_markup=calendar_month_kb(today.year, today.month, prefix="booking:cal", load=load),
     )
 
 
 @router.callback_query(BookingFlow.date, F.data.startswith("booking:cal:nav:"))
-async def booking_calendar_nav(call: CallbackQuery) -> None:
+async def booking_calendar_nav(call: CallbackQuery, config: Config) -> None:
     ym = call.data.split(":", 3)[3]
     try:
         y_s, m_s = ym.split("-", 1)
@@ -55,8 +77,9 @@ async def booking_calendar_nav(call: CallbackQuery) -> None:
         await call.answer("Не понял месяц")
         return
 
+    load = await fetch_month_load(config.db_path, y, m)
     await call.message.edit_reply_markup(
-        reply_markup=calendar_month_kb(y, m, prefix="booking:cal")
+        reply_markup=calendar_month_kb(y, m, prefix="booking:cal", load=load)
     )
     await call.answer()
 
@@ -118,29 +141,62 @@ async def booking_guests(message: Message, state: FSMContext, config: Config) ->
         return
     start_at = combine_date_time(d, t)
     await state.update_data(guests=guests, start_at=start_at.isoformat(sep=" "))
-
-    tables = await fetch_tables(config.db_path, guests)
-    if not tables:
-        await message.answer("Нет подходящих столов под это количество гостей.")
-        await state.clear()
+    await _offer_tables(message, state, config, guests=guests, start_at=start_at)
+
+
+async def _offer_tables(
+    message: Message,
+    state: FSMContext,
+    config: Config,
+    *,
+    guests: int,
+    start_at: datetime,
+) -> None:
+    tables = await fetch_table_availability(
+        config.db_path,
+        guests,
+        start_at,
+        start_at + RESERVATION_DURATION,
+    )
+    best = await find_best_fit(config.db_path, guests, start_at)
+
+    if best is None:
+        slots = await fetch_free_start_times(config.db_path, guests, start_at)
+        slot_buttons = [
+            (
+                slot.strftime("%H:%M" if slot.date() == start_at.date() else "%d.%m %H:%M"),
+                f"booking:slot:{slot.isoformat(timespec='minutes')}",
+            )
+            for slot in slots
+        ]
+        text = "😔 На это время все подходящие столы заняты."
+        if slots:
+            text += "\nБлижайшее свободное время:"
+        else:
+            text += "\nМожно встать в лист ожидания — напишем, если стол освободится."
+        await state.set_state(BookingFlow.choose_table)
+        await message.answer(text, reply_markup=time_slots_kb(slot_buttons, waitlist=True))
         return
 
-    buttons: list[tuple[str, str]] = []
-    from datetime import timedelta
+    auto_button = (f"🪄 Подобрать: {'+'.join(t.code for t in best)}", "booking:table:auto:1")
 
-    window_end = start_at + timedelta(hours=2, minutes=15)
-    for tbl in tables:
-        ok = await table_is_available(config.db_path, tbl.id, start_at, window_end)
+    buttons: list[tuple[str, str]] = []
+    for tbl, ok in tables:
         mark = "✅" if ok else "❌"
         buttons.append((f"{tbl.code} ({tbl.seats}) {mark}", f"booking:table:{tbl.id}:{int(ok)}"))
 
-    plan_path = Path(config.hall_plan_path)
-    if plan_path.exists() and plan_path.is_file():
+    renderer = get_hall_renderer(config.hall_plan_path, config.hall_layout_path)
+    plan = await renderer.render(tables)
+    if plan is not None:
         try:
-            plan = BufferedInputFile(plan_path.read_bytes(), filename=plan_path.name)
-            await message.answer_photo(
-                photo=plan,
-                caption="Схема зала (выберите стол):",
+            await send_cached_photo(
+                message.bot,
+                message.chat.id,
+                db_path=config.db_path,
+                media_key=config.hall_plan_path,
+                data=plan,
+                filename=Path(config.hall_plan_path).name,
+                caption=f"Схема зала на {start_at:%d.%m %H:%M} (выберите стол): зелёные свободны, красные заняты",
             )
         except Exception:
             await message.answer("Выберите стол:")
@@ -148,7 +204,10 @@ async def booking_guests(message: Message, state: FSMContext, config: Config) ->
         await message.answer("Выберите стол:")
 
     await state.set_state(BookingFlow.choose_table)
-    await message.answer("Доступность помечена ✅/❌", reply_markup=tables_kb(buttons))
+    await message.answer(
+        "Доступность помечена ✅/❌",
+        reply_markup=tables_kb(buttons, auto_button=auto_button),
+    )
 
 
 @router.callback_query(BookingFlow.choose_table, F.data.startswith("booking:table:"))
@@ -157,7 +216,43 @@ async def booking_choose_table(call: CallbackQuery, state: FSMContext) -> None:
     if ok != "1":
         await call.answer("Этот стол уже занят на выбранное время")
         return
-    await state.update_data(table_id=int(table_id))
+    if table_id == "auto":
+        await state.update_data(table_id=None, auto_table=True)
+    else:
+        await state.update_data(table_id=int(table_id), auto_table=False)
+    await state.set_state(BookingFlow.contact_name)
+    await call.message.answer("Как к вам обращаться?", reply_markup=cancel_kb())
+    await call.answer()
+
+
+@router.callback_query(BookingFlow.choose_table, F.data.startswith("booking:slot:"))
+async def booking_choose_slot(call: CallbackQuery, state: FSMContext, config: Config) -> None:
+    try:
+        start_at = datetime.fromisoformat(call.data.split(":", 2)[2])
+    except ValueError:
+        await call.answer("Не понял время")
+        return
+
+    data = await state.get_data()
+    guests = int(data.get("guests", 0))
+    if guests <= 0:
+        await state.set_state(BookingFlow.date)
+        await call.message.answer("Давайте заново. Введите дату.")
+        await call.answer()
+        return
+
+    await state.update_data(
+        date=start_at.date().isoformat(),
+        time=start_at.time().isoformat(timespec="minutes"),
+        start_at=start_at.isoformat(sep=" "),
+    )
+    await call.answer()
+    await _offer_tables(call.message, state, config, guests=guests, start_at=start_at)
+
+
+@router.callback_query(BookingFlow.choose_table, F.data == "booking:waitlist")
+async def booking_join_waitlist(call: CallbackQuery, state: FSMContext) -> None:
+    await state.update_data(table_id=None, auto_table=False, waitlist=True)
     await state.set_state(BookingFlow.contact_name)
     await call.message.answer("Как к вам обращаться?", reply_markup=cancel_kb())
     await call.answer()
@@ -206,38 +301,39 @@ async def _finalize_booking(message: Message, state: FSMContext, config: Config)
     data = await state.get_data()
     start_at_iso = data.get("start_at")
     table_id = data.get("table_id")
+    auto_table = bool(data.get("auto_table"))
+    waitlist = bool(data.get("waitlist"))
     guests = int(data.get("guests", 0))
-    if not start_at_iso or not table_id or guests <= 0:
+    if not start_at_iso or not (table_id or auto_table or waitlist) or guests <= 0:
         await message.answer("Не удалось оформить бронь. Попробуйте ещё раз.")
         await state.clear()
         return
 
     start_at = datetime.fromisoformat(start_at_iso)
-    reservation_id = await create_reservation(
-        config.db_path,
-        user_id=message.from_user.id,
-        table_id=int(table_id),
-        start_at=start_at,
-        guests=guests,
-        name=str(data.get("name", "")),
-        phone=str(data.get("phone", "")),
-    )
-
-    await message.answer(
-        f"✅ Бронь оформлена. Номер: {reservation_id}",
-        reply_markup=main_menu_kb(
-            include_admin=is_admin_user(
-                config,
-                user_id=message.from_user.id if message.from_user else None,
-                chat_id=message.chat.id,
-            )
-        ),
+    include_admin = is_admin_user(
+        config,
+        user_id=message.from_user.id if message.from_user else None,
+        chat_id=message.chat.id,
     )
+    if waitlist:
+        waitlist_id = await join_waitlist(
+            config.db_path,
+            user_id=message.from_user.id,
+            start_at=start_at,
+            guests=guests,
+            name=str(data.get("name", "")),
+            phone=str(data.get("phone", "")),
+        )
+        await message.answer(
+            f"📝 Вы в листе ожидания (№{waitlist_id}).\n"
+            "Если стол освободится, бронь оформится автоматически и мы пришлём сообщение.",
+            reply_markup=main_menu_kb(include_admin=include_admin),
+        )
+        await state.clear()
+        return
 
-    if config.admin_chat_id:
-        table = await fetch_table(config.db_path, int(table_id))
-        table_label = table.code if table else f"id={table_id}"
-        text = (
+    def booking_alert(reservation_id: int, table_label: str) -> str:
+        return (
             f"🪑 Новая бронь #{reservation_id}\n"
             f"Дата/время: {start_at}\n"
             f"Гостей: {guests}\n"
@@ -245,9 +341,43 @@ async def _finalize_booking(message: Message, state: FSMContext, config: Config)
             f"Имя: {data.get('name')}\n"
             f"Тел: {data.get('phone')}"
         )
-        try:
-            await message.bot.send_message(config.admin_chat_id, text)
-        except Exception:
-            pass
+
+    alert_to = [config.admin_chat_id] if config.admin_chat_id else []
+    reservation_id: Optional[int]
+    if auto_table:
+        assignment = await reserve_best_fit(
+            config.db_path,
+            user_id=message.from_user.id,
+            start_at=start_at,
+            guests=guests,
+            name=str(data.get("name", "")),
+            phone=str(data.get("phone", "")),
+            alert_to=alert_to,
+            alert=lambda a: booking_alert(a.reservation_id, "+".join(t.code for t in a.tables)),
+        )
+        reservation_id = assignment.reservation_id if assignment else None
+    else:
+        table = await fetch_table(config.db_path, int(table_id)) if alert_to else None
+        table_label = table.code if table else f"id={table_id}"
+        reservation_id = await create_reservation(
+            config.db_path,
+            user_id=message.from_user.id,
+            table_id=int(table_id),
+            start_at=start_at,
+            guests=guests,
+            name=str(data.get("name", "")),
+            phone=str(data.get("phone", "")),
+            alert_to=alert_to,
+            alert=lambda rid: booking_alert(rid, table_label),
+        )
+    if reservation_id is None:
+        await message.answer("😔 Пока вы оформляли бронь, этот стол заняли. Выберите другой.")
+        await _offer_tables(message, state, config, guests=guests, start_at=start_at)
+        return
+
+    await message.answer(
+        f"✅ Бронь оформлена. Номер: {reservation_id}",
+        reply_markup=main_menu_kb(include_admin=include_admin),
+    )
 
     await state.clear()
@@ -30,7 +30,7 @@ async def start(message: Message, config: Config) -> None:
         return
     await message.answer(
         "Откройте мини‑приложение меню:",
-        reply_markup=open_webapp_kb(config.webapp_url),
+        reply_markup=open_webapp_kb(config.webapp_launch_url),
     )
 
 
@@ -44,7 +44,7 @@ async def open_app(message: Message, config: Config) -> None:
         return
     await message.answer(
         "Откройте мини‑приложение меню:",
-        reply_markup=open_webapp_kb(config.webapp_url),
+        reply_markup=open_webapp_kb(config.webapp_launch_url),
     )
 
 
@@ -59,5 +59,5 @@ async def open_app_text(message: Message, config: Config) -> None:
         return
     await message.answer(
         "Откройте мини‑приложение меню:",
-        reply_markup=open_webapp_kb(config.webapp_url),
+        reply_markup=open_webapp_kb(config.webapp_launch_url),
     )
@@ -11,8 +11,7 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
 from bot.config import Config
-from bot.db import create_order, fetch_categories, fetch_menu_item, fetch_menu_items
-from bot.db import fetch_menu_item_by_category_title
+from bot.db import create_order, fetch_categories, fetch_menu_items, get_menu_catalog
 from bot.keyboards import (
     categories_kb,
     contact_kb,
@@ -65,6 +64,7 @@ async def webapp_cart(message: Message, state: FSMContext, config: Config) -> No
     address = str(payload.get("address", "")).strip() if isinstance(payload, dict) else ""
     comment = str(payload.get("comment", "")).strip() if isinstance(payload, dict) else ""
 
+    catalog = await get_menu_catalog(config.db_path)
     cart: dict[str, int] = {}
     for it in items:
         if not isinstance(it, dict):
@@ -80,11 +80,7 @@ async def webapp_cart(message: Message, state: FSMContext, config: Config) -> No
         if not category or not title or qty <= 0:
             continue
 
-        menu_item = await fetch_menu_item_by_category_title(
-            config.db_path,
-            category=category,
-            title=title,
-        )
+        menu_item = catalog.by_category_title.get((category, title))
         if not menu_item:
             continue
         cart[str(menu_item.id)] = cart.get(str(menu_item.id), 0) + qty
@@ -99,7 +95,7 @@ async def webapp_cart(message: Message, state: FSMContext, config: Config) -> No
     if name and phone and address:
         db_items: list[dict[str, Any]] = []
         for item_id_str, qty in cart.items():
-            mi = await fetch_menu_item(config.db_path, int(item_id_str))
+            mi = catalog.by_id.get(int(item_id_str))
             if not mi:
                 continue
             db_items.append(
@@ -116,6 +112,19 @@ async def webapp_cart(message: Message, state: FSMContext, config: Config) -> No
 
         await state.clear()
 
+        cart_text, _ = await _render_cart(config, cart)
+
+        def order_alert(order_id: int) -> str:
+            return (
+                f"🆕 Новый заказ #{order_id}\n"
+                f"Тип: delivery\n"
+                f"Имя: {name}\n"
+                f"Тел: {phone}\n"
+                f"Адрес: {address}\n\n"
+                f"{cart_text}\n\n"
+                f"Комментарий: {comment or '-'}"
+            )
+
         order_id = await create_order(
             config.db_path,
             user_id=message.from_user.id,
@@ -126,6 +135,8 @@ async def webapp_cart(message: Message, state: FSMContext, config: Config) -> No
             address=address,
             comment=comment,
             items=db_items,
+            alert_to=[config.admin_chat_id] if config.admin_chat_id else [],
+            alert=order_alert,
         )
 
         include_admin = is_admin_user(
@@ -138,22 +149,6 @@ async def webapp_cart(message: Message, state: FSMContext, config: Config) -> No
             reply_markup=main_menu_kb(include_admin=include_admin),
         )
 
-        if config.admin_chat_id:
-            cart_text, _ = await _render_cart(config, cart)
-            text = (
-                f"🆕 Новый заказ #{order_id}\n"
-                f"Тип: delivery\n"
-                f"Имя: {name}\n"
-                f"Тел: {phone}\n"
-                f"Адрес: {address}\n\n"
-                f"{cart_text}\n\n"
-                f"Комментарий: {comment or '-'}"
-            )
-            try:
-                await message.bot.send_message(config.admin_chat_id, text)
-            except Exception:
-                pass
-
         return
 
     # Fallback to the old chat-based checkout flow.
@@ -195,11 +190,11 @@ async def _set_cart(state: FSMContext, cart: dict[str, Any]) -> None:
 async def _render_cart(config: Config, cart: dict[str, Any]) -> tuple[str, int]:
     if not cart:
         return "Корзина пуста.", 0
+    catalog = await get_menu_catalog(config.db_path)
     lines: list[str] = ["🧺 Корзина:\n"]
     total = 0
     for item_id_str, qty in cart.items():
-        item_id = int(item_id_str)
-        item = await fetch_menu_item(config.db_path, item_id)
+        item = catalog.by_id.get(int(item_id_str))
         if not item:
             continue
         line_total = item.price_cents * int(qty)
@@ -437,9 +432,10 @@ async def order_confirm(message: Message, state: FSMContext, config: Config) ->
         await state.clear()
         return
 
+    catalog = await get_menu_catalog(config.db_path)
     items: list[dict[str, Any]] = []
     for item_id_str, qty in cart.items():
-        item = await fetch_menu_item(config.db_path, int(item_id_str))
+        item = catalog.by_id.get(int(item_id_str))
         if not item:
             continue
         items.append(
@@ -455,6 +451,19 @@ async def order_confirm(message: Message, state: FSMContext, config: Config) ->
         datetime.fromisoformat(scheduled_for_iso) if scheduled_for_iso else None
     )
 
+    cart_text, _ = await _render_cart(config, cart)
+
+    def order_alert(order_id: int) -> str:
+        return (
+            f"🆕 Новый заказ #{order_id}\n"
+            f"Тип: {data.get('order_type')}\n"
+            f"Имя: {data.get('name')}\n"
+            f"Тел: {data.get('phone')}\n"
+            f"Адрес: {data.get('address', '-') }\n\n"
+            f"{cart_text}\n\n"
+            f"Комментарий: {comment or '-'}"
+        )
+
     order_id = await create_order(
         config.db_path,
         user_id=message.from_user.id,
@@ -465,6 +474,8 @@ async def order_confirm(message: Message, state: FSMContext, config: Config) ->
         address=data.get("address"),
         comment=comment,
         items=items,
+        alert_to=[config.admin_chat_id] if config.admin_chat_id else [],
+        alert=order_alert,
     )
 
     await message.answer(
@@ -478,20 +489,4 @@ async def order_confirm(message: Message, state: FSMContext, config: Config) ->
         ),
     )
 
-    if config.admin_chat_id:
-        cart_text, _ = await _render_cart(config, cart)
-        text = (
-            f"🆕 Новый заказ #{order_id}\n"
-            f"Тип: {data.get('order_type')}\n"
-            f"Имя: {data.get('name')}\n"
-            f"Тел: {data.get('phone')}\n"
-            f"Адрес: {data.get('address', '-') }\n\n"
-            f"{cart_text}\n\n"
-            f"Комментарий: {comment or '-'}"
-        )
-        try:
-            await message.bot.send_message(config.admin_chat_id, text)
-        except Exception:
-            pass
-
     await state.clear()
@@ -1,15 +1,16 @@
 from __future__ import annotations
 
 import json
+from datetime import datetime
 from typing import Any
 
 from aiogram import F, Router
 from aiogram.types import Message
 
 from bot.config import Config
-from bot.db import create_order, fetch_menu_item_by_category_title, upsert_menu_item
+from bot.db import CartLine, TableAssignment, checkout_order, is_slot_start, reserve_best_fit
 from bot.keyboards import open_webapp_kb
-from bot.utils import format_price
+from bot.utils import admin_targets, combine_date_time, format_price, parse_date, parse_time
 
 
 router = Router(name=__name__)
@@ -22,14 +23,6 @@ def _clean_text(v: Any, *, max_len: int) -> str:
     return s
 
 
-def _admin_targets(config: Config) -> set[int]:
-    targets: set[int] = set()
-    if config.admin_chat_id is not None:
-        targets.add(int(config.admin_chat_id))
-    targets.update(int(x) for x in config.admin_user_ids)
-    return targets
-
-
 @router.message(F.web_app_data)
 async def webapp_checkout(message: Message, config: Config) -> None:
     raw = getattr(message.web_app_data, "data", None)
@@ -47,6 +40,10 @@ async def webapp_checkout(message: Message, config: Config) -> None:
         await message.answer("Неверный формат данных из мини‑приложения.")
         return
 
+    if payload.get("kind") == "booking":
+        await _webapp_booking(message, config, payload)
+        return
+
     order_type = _clean_text(payload.get("order_type"), max_len=16) or "delivery"
     if order_type not in {"delivery", "pickup"}:
         order_type = "delivery"
@@ -79,10 +76,7 @@ async def webapp_checkout(message: Message, config: Config) -> None:
         await message.answer("Корзина пуста.")
         return
 
-    items: list[dict[str, Any]] = []
-    human_lines: list[str] = []
-    total_cents = 0
-
+    lines: list[CartLine] = []
     for it in items_raw:
         if not isinstance(it, dict):
             continue
@@ -104,42 +98,47 @@ async def webapp_checkout(message: Message, config: Config) -> None:
 
         if not category or not title or qty <= 0 or qty > 100 or price_cents <= 0:
             continue
-
-        menu_item = await fetch_menu_item_by_category_title(
-            config.db_path,
-            category=category,
-            title=title,
-        )
-        if not menu_item or int(menu_item.price_cents) != int(price_cents):
-            menu_item = await upsert_menu_item(
-                config.db_path,
+        lines.append(
+            CartLine(
                 category=category,
                 title=title,
                 description=description,
+                qty=qty,
                 price_cents=price_cents,
             )
-
-        items.append(
-            {
-                "menu_item_id": int(menu_item.id),
-                "qty": int(qty),
-                "price_cents": int(menu_item.price_cents),
-            }
         )
 
-        line_total = int(menu_item.price_cents) * int(qty)
-        total_cents += line_total
-        human_lines.append(f"• {menu_item.title} ×{qty} = {format_price(line_total)}")
-
-    if not items:
+    if not lines:
         await message.answer(
             "Не смог сопоставить выбранные позиции с текущим меню. "
             "Попробуйте обновить мини‑приложение и собрать заказ заново.",
-            reply_markup=open_webapp_kb(config.webapp_url) if config.webapp_url else None,
+            reply_markup=open_webapp_kb(config.webapp_launch_url) if config.webapp_url else None,
         )
         return
 
-    order_id = await create_order(
+    # Checkout stores the lines at these prices, so the alert can be rendered
+    # up front and queued in the order's transaction.
+    alert_lines = "\n".join(
+        f"• {ln.title} ×{ln.qty} = {format_price(ln.price_cents * ln.qty)}" for ln in lines
+    )
+    alert_total = sum(ln.price_cents * ln.qty for ln in lines)
+
+    def order_alert(order_id: int) -> str:
+        return (
+            f"🆕 Новый заказ #{order_id}\n"
+            f"Тип: {order_type}\n"
+            f"Имя: {name}\n"
+            f"Тел: {phone}\n"
+            + (f"Адрес: {address}\n" if order_type == "delivery" else "")
+            + (f"Время доставки: {delivery_time}\n" if order_type == "delivery" else "")
+            + (f"Время самовывоза: {pickup_time}\n" if order_type == "pickup" else "")
+            + "\n"
+            + alert_lines
+            + f"\n\nИтого: {format_price(alert_total)}\n"
+            + (f"Комментарий: {comment}\n" if comment else "")
+        )
+
+    result = await checkout_order(
         config.db_path,
         user_id=message.from_user.id if message.from_user else 0,
         order_type=order_type,
@@ -148,8 +147,16 @@ async def webapp_checkout(message: Message, config: Config) -> None:
         phone=phone,
         address=address if order_type == "delivery" else None,
         comment=comment,
-        items=items,
+        lines=lines,
+        alert_to=admin_targets(config),
+        alert=order_alert,
     )
+    order_id = result.order_id
+    total_cents = result.total_cents
+    human_lines = [
+        f"• {it.title} ×{it.qty} = {format_price(it.price_cents * it.qty)}"
+        for it in result.items
+    ]
 
     text = (
         f"✅ Заказ оформлен. Номер: {order_id}\n\n"
@@ -165,26 +172,75 @@ async def webapp_checkout(message: Message, config: Config) -> None:
 
     await message.answer(
         text,
-        reply_markup=open_webapp_kb(config.webapp_url) if config.webapp_url else None,
+        reply_markup=open_webapp_kb(config.webapp_launch_url) if config.webapp_url else None,
     )
 
-    admin_targets = _admin_targets(config)
-    if admin_targets:
-        admin_text = (
-            f"🆕 Новый заказ #{order_id}\n"
-            f"Тип: {order_type}\n"
+
+async def _webapp_booking(message: Message, config: Config, payload: dict[str, Any]) -> None:
+    """Booking picked in the Mini App: tables are assigned like the chat "auto" choice."""
+
+    reply_markup = open_webapp_kb(config.webapp_launch_url) if config.webapp_url else None
+    day = parse_date(_clean_text(payload.get("date"), max_len=10))
+    at = parse_time(_clean_text(payload.get("time"), max_len=5))
+    name = _clean_text(payload.get("name"), max_len=64)
+    phone = _clean_text(payload.get("phone"), max_len=32)
+    try:
+        guests = int(payload.get("guests", 0))
+    except (TypeError, ValueError):
+        guests = 0
+
+    if day is None or at is None:
+        await message.answer("Не понял дату или время брони. Выберите слот в мини‑приложении ещё раз.")
+        return
+    start_at = combine_date_time(day, at)
+    if start_at <= datetime.now():
+        await message.answer("Это время уже прошло. Выберите другой слот.", reply_markup=reply_markup)
+        return
+    if not is_slot_start(start_at):
+        await message.answer(
+            "На это время бронь не принимается. Выберите слот в мини‑приложении.",
+            reply_markup=reply_markup,
+        )
+        return
+    if guests < 1 or guests > 20:
+        await message.answer("Количество гостей должно быть от 1 до 20.")
+        return
+    if len(name) < 2 or len(phone) < 6:
+        await message.answer("Не понял имя или телефон. Вернитесь в мини‑приложение и заполните их.")
+        return
+
+    def booking_alert(assignment: TableAssignment) -> str:
+        return (
+            f"🪑 Новая бронь #{assignment.reservation_id} (мини‑приложение)\n"
+            f"Дата/время: {start_at:%Y-%m-%d %H:%M}\n"
+            f"Гостей: {guests}\n"
+            f"Стол: {'+'.join(t.code for t in assignment.tables)}\n"
             f"Имя: {name}\n"
-            f"Тел: {phone}\n"
-            + (f"Адрес: {address}\n" if order_type == "delivery" else "")
-            + (f"Время доставки: {delivery_time}\n" if order_type == "delivery" else "")
-            + (f"Время самовывоза: {pickup_time}\n" if order_type == "pickup" else "")
-            + "\n"
-            + "\n".join(human_lines)
-            + f"\n\nИтого: {format_price(total_cents)}\n"
-            + (f"Комментарий: {comment}\n" if comment else "")
+            f"Тел: {phone}"
+        )
+
+    assignment = await reserve_best_fit(
+        config.db_path,
+        user_id=message.from_user.id if message.from_user else 0,
+        start_at=start_at,
+        guests=guests,
+        name=name,
+        phone=phone,
+        alert_to=admin_targets(config),
+        alert=booking_alert,
+    )
+    if assignment is None:
+        await message.answer(
+            "😔 Пока вы выбирали, это время заняли. Откройте мини‑приложение и выберите другой слот.",
+            reply_markup=reply_markup,
         )
-        for chat_id in admin_targets:
-            try:
-                await message.bot.send_message(chat_id, admin_text)
-            except Exception:
-                continue
+        return
+
+    table_label = "+".join(t.code for t in assignment.tables)
+    await message.answer(
+        f"✅ Бронь оформлена. Номер: {assignment.reservation_id}\n"
+        f"Дата/время: {start_at:%Y-%m-%d %H:%M}\n"
+        f"Гостей: {guests}\n"
+        f"Стол: {table_label}",
+        reply_markup=reply_markup,
+    )
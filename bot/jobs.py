@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from bot.config import Config
+from bot.db import (
+    JOB_ORDER_STALE,
+    JOB_RESERVATION_EXPIRE,
+    JOB_RESERVATION_NO_SHOW,
+    ORDER_STALE_AFTER,
+    ScheduledJob,
+    fetch_order,
+    fetch_reservation,
+    transition_reservation_status,
+)
+from bot.notifier import Notifier
+from bot.scheduler import JobHandler
+from bot.utils import admin_targets, format_ts, waitlist_promotion_alert, waitlist_promotion_text
+
+
+def build_job_handlers(notifier: Notifier, config: Config) -> dict[str, JobHandler]:
+    """Handlers for the job kinds scheduled by bot.db.
+
+    Each one re-checks the current status first, so a job that fires after
+    the admin already acted (or twice, after a crash) does nothing.
+    """
+
+    async def expire_reservation(job: ScheduledJob) -> None:
+        if not config.reservation_confirm_timeout_min:
+            # Scheduled while expiry was on; bookings no longer expire.
+            return
+        promotions = await transition_reservation_status(
+            config.db_path,
+            job.ref_id,
+            from_status="pending",
+            to_status="expired",
+            alert_to=admin_targets(config),
+            alert=waitlist_promotion_alert,
+            notice=waitlist_promotion_text,
+        )
+        if promotions is None:
+            return
+        r = await fetch_reservation(config.db_path, job.ref_id)
+        if r is not None and r.user_id:
+            notifier.send(
+                r.user_id,
+                f"⌛ Бронь #{r.id} на {format_ts(r.start_at)} не была подтверждена и снята.",
+            )
+
+    async def mark_no_show(job: ScheduledJob) -> None:
+        promotions = await transition_reservation_status(
+            config.db_path,
+            job.ref_id,
+            from_status="confirmed",
+            to_status="no_show",
+            alert_to=admin_targets(config),
+            alert=waitlist_promotion_alert,
+            notice=waitlist_promotion_text,
+        )
+        if promotions is None:
+            return
+        notifier.fan_out(
+            admin_targets(config),
+            f"🚫 Бронь #{job.ref_id}: гости не пришли, отмечено no-show.",
+        )
+
+    async def escalate_stale_order(job: ScheduledJob) -> None:
+        order = await fetch_order(config.db_path, job.ref_id)
+        if order is None or order.status != "new":
+            return
+        minutes = int(ORDER_STALE_AFTER.total_seconds() // 60)
+        text = (
+            f"⏰ Заказ #{order.id} больше {minutes} мин в статусе «новый».\n"
+            f"Создан: {format_ts(order.created_at)}\n"
+            f"Имя: {order.name}\n"
+            f"Тел: {order.phone}"
+        )
+        notifier.fan_out(admin_targets(config), text)
+
+    return {
+        JOB_RESERVATION_EXPIRE: expire_reservation,
+        JOB_RESERVATION_NO_SHOW: mark_no_show,
+        JOB_ORDER_STALE: escalate_stale_order,
+    }
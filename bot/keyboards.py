@@ -49,7 +49,32 @@ def admin_item_actions_kb(item_id: int) -> InlineKeyboardMarkup:
     )
 
 
-def admin_orders_kb(orders: list[tuple[int, str]]) -> InlineKeyboardMarkup:
+def _page_nav_row(
+    prefix: str,
+    *,
+    newer_cursor: int | None,
+    older_cursor: int | None,
+) -> list[InlineKeyboardButton]:
+    """Keyset pagination buttons: {prefix}:after:ID (newer) / {prefix}:before:ID (older)."""
+
+    row: list[InlineKeyboardButton] = []
+    if newer_cursor is not None:
+        row.append(
+            InlineKeyboardButton(text="⬅️ Новее", callback_data=f"{prefix}:after:{int(newer_cursor)}")
+        )
+    if older_cursor is not None:
+        row.append(
+            InlineKeyboardButton(text="Старее ➡️", callback_data=f"{prefix}:before:{int(older_cursor)}")
+        )
+    return row
+
+
+def admin_orders_kb(
+    orders: list[tuple[int, str]],
+    *,
+    newer_cursor: int | None = None,
+    older_cursor: int | None = None,
+) -> InlineKeyboardMarkup:
     b = InlineKeyboardBuilder()
     for order_id, label in orders:
         b.add(
@@ -59,6 +84,9 @@ def admin_orders_kb(orders: list[tuple[int, str]]) -> InlineKeyboardMarkup:
             )
         )
     b.adjust(1)
+    nav = _page_nav_row("admin:orders", newer_cursor=newer_cursor, older_cursor=older_cursor)
+    if nav:
+        b.row(*nav)
     return b.as_markup()
 
 
@@ -84,7 +112,12 @@ def admin_order_actions_kb(order_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def admin_bookings_kb(items: list[tuple[int, str]]) -> InlineKeyboardMarkup:
+def admin_bookings_kb(
+    items: list[tuple[int, str]],
+    *,
+    newer_cursor: int | None = None,
+    older_cursor: int | None = None,
+) -> InlineKeyboardMarkup:
     b = InlineKeyboardBuilder()
     for reservation_id, label in items:
         b.add(
@@ -94,6 +127,9 @@ def admin_bookings_kb(items: list[tuple[int, str]]) -> InlineKeyboardMarkup:
             )
         )
     b.adjust(1)
+    nav = _page_nav_row("admin:bookings", newer_cursor=newer_cursor, older_cursor=older_cursor)
+    if nav:
+        b.row(*nav)
     return b.as_markup()
 
 
@@ -204,18 +240,58 @@ def yes_no_kb(yes_cb: str, no_cb: str) -> InlineKeyboardMarkup:
     )
 
 
-def tables_kb(table_buttons: list[tuple[str, str]]) -> InlineKeyboardMarkup:
+def tables_kb(
+    table_buttons: list[tuple[str, str]],
+    *,
+    auto_button: tuple[str, str] | None = None,
+) -> InlineKeyboardMarkup:
     b = InlineKeyboardBuilder()
+    if auto_button is not None:
+        text, cb = auto_button
+        b.add(InlineKeyboardButton(text=text, callback_data=cb))
     for text, cb in table_buttons:
         b.add(InlineKeyboardButton(text=text, callback_data=cb))
-    b.adjust(2)
+    if auto_button is not None:
+        b.adjust(1, 2)
+    else:
+        b.adjust(2)
     b.row(InlineKeyboardButton(text="❌ Отмена", callback_data="booking:cancel"))
     return b.as_markup()
 
 
-def calendar_month_kb(year: int, month: int, *, prefix: str) -> InlineKeyboardMarkup:
+def time_slots_kb(
+    slot_buttons: list[tuple[str, str]],
+    *,
+    waitlist: bool = False,
+) -> InlineKeyboardMarkup:
+    b = InlineKeyboardBuilder()
+    for text, cb in slot_buttons:
+        b.add(InlineKeyboardButton(text=text, callback_data=cb))
+    b.adjust(4)
+    if waitlist:
+        b.row(InlineKeyboardButton(text="📝 Лист ожидания", callback_data="booking:waitlist"))
+    b.row(InlineKeyboardButton(text="❌ Отмена", callback_data="booking:cancel"))
+    return b.as_markup()
+
+
+# Day marks in the booking calendar, by share of capacity already booked.
+NEARLY_FULL_SHARE = 0.75
+DAY_NEARLY_FULL_MARK = "🟡"
+DAY_FULL_MARK = "🔴"
+
+
+def calendar_month_kb(
+    year: int,
+    month: int,
+    *,
+    prefix: str,
+    load: dict[date, float] | None = None,
+) -> InlineKeyboardMarkup:
     """Simple inline calendar.
 
+    `load` maps days to the booked share of capacity (see fetch_month_load);
+    nearly full and fully booked days are marked.
+
     Callback data:
     - {prefix}:day:YYYY-MM-DD
     - {prefix}:nav:YYYY-MM
@@ -254,9 +330,15 @@ def calendar_month_kb(year: int, month: int, *, prefix: str) -> InlineKeyboardMa
             if d < today:
                 row.append(InlineKeyboardButton(text=f"{day}", callback_data="noop"))
             else:
+                share = (load or {}).get(d, 0.0)
+                mark = ""
+                if share >= 1:
+                    mark = DAY_FULL_MARK
+                elif share >= NEARLY_FULL_SHARE:
+                    mark = DAY_NEARLY_FULL_MARK
                 row.append(
                     InlineKeyboardButton(
-                        text=f"{day}",
+                        text=f"{mark}{day}",
                         callback_data=f"{prefix}:day:{d.isoformat()}",
                     )
                 )
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, Message
+
+from bot.db import fetch_media_file_id, forget_media_file_id, save_media_file_id
+
+
+# Upper bound of _file_ids; older entries are re-read from media_cache.
+FILE_ID_CACHE_SIZE = 512
+# media_cache rows older than this are dropped (an old render is re-uploaded once).
+MEDIA_CACHE_MAX_AGE = timedelta(days=30)
+
+# (db_path, media_key, content_hash) -> file_id; an LRU over media_cache
+_file_ids: OrderedDict[tuple[str, str, str], str] = OrderedDict()
+# path -> ((mtime_ns, size), content_hash), so unchanged files are not re-read
+_file_hashes: dict[str, tuple[tuple[int, int], str]] = {}
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+async def _cached_file_id(db_path: str, media_key: str, digest: str) -> str | None:
+    key = (db_path, media_key, digest)
+    file_id = _file_ids.get(key)
+    if file_id is not None:
+        _file_ids.move_to_end(key)
+        return file_id
+    file_id = await fetch_media_file_id(db_path, media_key, digest)
+    if file_id is not None:
+        _remember(key, file_id)
+    return file_id
+
+
+def _remember(key: tuple[str, str, str], file_id: str) -> None:
+    _file_ids[key] = file_id
+    _file_ids.move_to_end(key)
+    while len(_file_ids) > FILE_ID_CACHE_SIZE:
+        _file_ids.popitem(last=False)
+
+
+async def _send_photo(
+    bot: Bot,
+    chat_id: int,
+    *,
+    db_path: str,
+    media_key: str,
+    digest: str,
+    filename: str,
+    load: Callable[[], Awaitable[bytes]],
+    **kwargs: Any,
+) -> Message:
+    file_id = await _cached_file_id(db_path, media_key, digest)
+    if file_id is not None:
+        try:
+            return await bot.send_photo(chat_id, file_id, **kwargs)
+        except TelegramBadRequest:
+            _file_ids.pop((db_path, media_key, digest), None)
+            await forget_media_file_id(db_path, media_key, digest)
+
+    data = await load()
+    message = await bot.send_photo(chat_id, BufferedInputFile(data, filename=filename), **kwargs)
+    if message.photo:
+        file_id = message.photo[-1].file_id
+        _remember((db_path, media_key, digest), file_id)
+        await save_media_file_id(db_path, media_key, digest, file_id, max_age=MEDIA_CACHE_MAX_AGE)
+    return message
+
+
+async def send_cached_photo(
+    bot: Bot,
+    chat_id: int,
+    *,
+    db_path: str,
+    media_key: str,
+    data: bytes,
+    filename: str,
+    **kwargs: Any,
+) -> Message:
+    """Send a photo, uploading the bytes only the first time.
+
+    Telegram's file_id for (media_key, content hash) is stored in media_cache
+    and reused afterwards; changed content has a new hash and is uploaded
+    once again. A file_id Telegram no longer accepts is dropped and replaced.
+    """
+
+    async def load() -> bytes:
+        return data
+
+    return await _send_photo(
+        bot,
+        chat_id,
+        db_path=db_path,
+        media_key=media_key,
+        digest=content_hash(data),
+        filename=filename,
+        load=load,
+        **kwargs,
+    )
+
+
+def _file_hash(path: Path) -> str:
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    known = _file_hashes.get(str(path))
+    if known is not None and known[0] == signature:
+        return known[1]
+    digest = content_hash(path.read_bytes())
+    _file_hashes[str(path)] = (signature, digest)
+    return digest
+
+
+async def send_cached_photo_file(
+    bot: Bot,
+    chat_id: int,
+    *,
+    db_path: str,
+    path: str,
+    **kwargs: Any,
+) -> Message:
+    """send_cached_photo for a file on disk (menu photos etc.), keyed by its path.
+
+    The file is hashed again only when its mtime or size changes, and read
+    for upload only when no file_id is cached for its content.
+    """
+
+    file_path = Path(path)
+    digest = await asyncio.to_thread(_file_hash, file_path)
+    return await _send_photo(
+        bot,
+        chat_id,
+        db_path=db_path,
+        media_key=path,
+        digest=digest,
+        filename=file_path.name,
+        load=lambda: asyncio.to_thread(file_path.read_bytes),
+        **kwargs,
+    )
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import ErrorEvent, TelegramObject, Update
+
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]]
+
+
+class ChatOrderMiddleware(BaseMiddleware):
+    """Runs updates of different chats in parallel and of one chat in order.
+
+    Register it as an outer middleware on `dp.update`. Each update becomes a
+    task chained after the previous update of the same chat (or user, for
+    updates without a chat), so FSM steps never race. At most `limit`
+    updates are in flight; the next one waits for a free slot, which stalls
+    the feeding loop instead of growing memory under a burst. A queued
+    update reloads its FSM state once the previous one has finished.
+
+    With `wait=False` (polling with handle_as_tasks=False) the middleware
+    returns as soon as the update is queued, so polling keeps reading while
+    other chats are busy; a handler's exception no longer reaches the
+    dispatcher's ErrorsMiddleware, so it is propagated to the errors routers
+    (`dp.errors`) from the task. With `wait=True` (webhook) it returns the
+    handler's result, and the HTTP request is answered when the update is
+    handled.
+    """
+
+    def __init__(self, *, limit: int = 64, wait: bool = False) -> None:
+        self.limit = limit
+        self.wait = wait
+        self._slots = asyncio.Semaphore(limit)
+        self._tails: dict[Hashable, asyncio.Task] = {}
+        self._running: set[asyncio.Task] = set()
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: dict[str, Any]) -> Any:
+        await self._slots.acquire()
+        key = self._key(event, data)
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._run(previous, handler, event, data))
+        self._tails[key] = task
+        self._running.add(task)
+        task.add_done_callback(lambda t: self._done(key, t))
+        if self.wait:
+            return await task
+        return None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._running)
+
+    async def drain(self) -> None:
+        """Wait for every queued update to finish (call on shutdown)."""
+
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    @staticmethod
+    def _key(event: TelegramObject, data: dict[str, Any]) -> Hashable:
+        chat = data.get("event_chat")
+        if chat is not None:
+            return ("chat", chat.id)
+        user = data.get("event_from_user")
+        if user is not None:
+            return ("user", user.id)
+        # Nothing to order against (e.g. polls): run on its own.
+        return ("update", id(event))
+
+    async def _run(
+        self,
+        previous: Optional[asyncio.Task],
+        handler: Handler,
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        try:
+            if previous is not None:
+                # Only the order matters here; its outcome is handled by its own task.
+                await asyncio.wait([previous])
+                state = data.get("state")
+                if state is not None:
+                    # FSMContextMiddleware read the state before the previous
+                    # update of this chat ran; route on the state it left.
+                    data["raw_state"] = await state.get_state()
+            return await handler(event, data)
+        except Exception as exc:
+            if self.wait:
+                raise
+            await self._report(exc, event, data)
+
+    @staticmethod
+    async def _report(exc: Exception, event: TelegramObject, data: dict[str, Any]) -> None:
+        # What ErrorsMiddleware does for updates handled inline.
+        dispatcher = data.get("dispatcher")
+        if dispatcher is not None and isinstance(event, Update):
+            try:
+                response = await dispatcher.propagate_event(
+                    update_type="error",
+                    event=ErrorEvent(update=event, exception=exc),
+                    **data,
+                )
+            except Exception:
+                log.exception("Error handler failed for update %s", event.update_id)
+                return
+            if response is not UNHANDLED:
+                return
+        log.error("Update %s failed", getattr(event, "update_id", "?"), exc_info=exc)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        self._slots.release()
+        self._running.discard(task)
+        if self._tails.get(key) is task:
+            del self._tails[key]
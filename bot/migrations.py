@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import aiosqlite
+
+
+# schema.sql is the baseline (user_version 0). Every later schema change is
+# appended here and never edited once released: MIGRATIONS[n - 1] upgrades a
+# database from user_version n - 1 to n.
+MIGRATIONS: list[str] = [
+    # 1: secondary indexes for the hot queries, UNIQUE(category, title) on menu_item
+    """
+    -- Collapse duplicate menu rows onto one survivor (active first, then newest)
+    -- so the unique index can be created. Order items follow the survivor.
+    CREATE TEMP TABLE menu_item_survivor AS
+    SELECT
+        m.id AS id,
+        (
+            SELECT k.id
+            FROM menu_item k
+            WHERE k.category = m.category AND k.title = m.title
+            ORDER BY k.is_active DESC, k.id DESC
+            LIMIT 1
+        ) AS keep_id
+    FROM menu_item m;
+
+    UPDATE cafe_order_item
+    SET menu_item_id = (
+        SELECT keep_id FROM menu_item_survivor WHERE id = cafe_order_item.menu_item_id
+    )
+    WHERE menu_item_id IN (SELECT id FROM menu_item_survivor WHERE id <> keep_id);
+
+    DELETE FROM menu_item
+    WHERE id IN (SELECT id FROM menu_item_survivor WHERE id <> keep_id);
+
+    DROP TABLE menu_item_survivor;
+
+    CREATE UNIQUE INDEX ux_menu_item_category_title
+        ON menu_item(category, title);
+    CREATE INDEX ix_menu_item_active_category
+        ON menu_item(category, id) WHERE is_active = 1;
+
+    -- table_is_available: only active reservations can block a table.
+    CREATE INDEX ix_reservation_active_table_time
+        ON reservation(table_id, start_at, end_at)
+        WHERE status IN ('pending', 'confirmed');
+    CREATE INDEX ix_reservation_user
+        ON reservation(user_id, id);
+
+    -- fetch_order_items: covering, already in oi.id order.
+    CREATE INDEX ix_cafe_order_item_order
+        ON cafe_order_item(order_id, id, menu_item_id, qty, item_price_cents, comment);
+    CREATE INDEX ix_cafe_order_user
+        ON cafe_order(user_id, id);
+    """,
+    # 2: time columns as INTEGER unix epoch seconds instead of ISO TEXT
+    """
+    -- start_at/end_at/scheduled_for were naive local wall-clock times
+    -- ('utc' modifier converts them); created_at came from datetime('now').
+    CREATE TABLE reservation_new (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      user_id INTEGER NOT NULL,
+      table_id INTEGER NOT NULL,
+      start_at INTEGER NOT NULL,
+      end_at INTEGER NOT NULL,
+      guests INTEGER NOT NULL,
+      name TEXT NOT NULL,
+      phone TEXT NOT NULL,
+      status TEXT NOT NULL,
+      created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+      FOREIGN KEY(table_id) REFERENCES cafe_table(id)
+    );
+    INSERT INTO reservation_new(id, user_id, table_id, start_at, end_at, guests, name, phone, status, created_at)
+    SELECT
+        id,
+        user_id,
+        table_id,
+        CAST(strftime('%s', start_at, 'utc') AS INTEGER),
+        CAST(strftime('%s', end_at, 'utc') AS INTEGER),
+        guests,
+        name,
+        phone,
+        status,
+        CAST(strftime('%s', created_at) AS INTEGER)
+    FROM reservation;
+    DROP TABLE reservation;
+    ALTER TABLE reservation_new RENAME TO reservation;
+
+    CREATE INDEX ix_reservation_active_table_time
+        ON reservation(table_id, start_at, end_at)
+        WHERE status IN ('pending', 'confirmed');
+    CREATE INDEX ix_reservation_active_start
+        ON reservation(start_at, table_id)
+        WHERE status IN ('pending', 'confirmed');
+    CREATE INDEX ix_reservation_user
+        ON reservation(user_id, id);
+
+    CREATE TABLE cafe_order_new (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      user_id INTEGER NOT NULL,
+      type TEXT NOT NULL,
+      status TEXT NOT NULL,
+      created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+      scheduled_for INTEGER,
+      name TEXT NOT NULL,
+      phone TEXT NOT NULL,
+      address TEXT,
+      comment TEXT NOT NULL DEFAULT '',
+      total_cents INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT INTO cafe_order_new(id, user_id, type, status, created_at, scheduled_for, name, phone, address, comment, total_cents)
+    SELECT
+        id,
+        user_id,
+        type,
+        status,
+        CAST(strftime('%s', created_at) AS INTEGER),
+        CAST(strftime('%s', scheduled_for, 'utc') AS INTEGER),
+        name,
+        phone,
+        address,
+        comment,
+        total_cents
+    FROM cafe_order;
+    DROP TABLE cafe_order;
+    ALTER TABLE cafe_order_new RENAME TO cafe_order;
+
+    CREATE INDEX ix_cafe_order_user
+        ON cafe_order(user_id, id);
+    CREATE INDEX ix_cafe_order_created
+        ON cafe_order(created_at);
+    """,
+    # 3: combined tables for large parties
+    """
+    -- Pairs of tables that can be pushed together (stored once, lower id first).
+    CREATE TABLE cafe_table_link (
+      table_id INTEGER NOT NULL,
+      other_table_id INTEGER NOT NULL,
+      PRIMARY KEY (table_id, other_table_id),
+      CHECK (table_id < other_table_id),
+      FOREIGN KEY(table_id) REFERENCES cafe_table(id),
+      FOREIGN KEY(other_table_id) REFERENCES cafe_table(id)
+    );
+
+    -- A party on several tables is one reservation row per table sharing
+    -- group_id (the id of the first row). NULL for single-table bookings.
+    ALTER TABLE reservation ADD COLUMN group_id INTEGER;
+    CREATE INDEX ix_reservation_group
+        ON reservation(group_id) WHERE group_id IS NOT NULL;
+    """,
+    # 4: waitlist for fully booked slots
+    """
+    -- status: waiting -> promoted (reservation_id set) | canceled
+    CREATE TABLE waitlist (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      user_id INTEGER NOT NULL,
+      start_at INTEGER NOT NULL,
+      guests INTEGER NOT NULL,
+      name TEXT NOT NULL,
+      phone TEXT NOT NULL,
+      status TEXT NOT NULL DEFAULT 'waiting',
+      reservation_id INTEGER,
+      created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+      FOREIGN KEY(reservation_id) REFERENCES reservation(id)
+    );
+    -- A freed interval is matched by start_at range, first come first served.
+    CREATE INDEX ix_waitlist_waiting_start
+        ON waitlist(start_at, created_at)
+        WHERE status = 'waiting';
+    """,
+    # 5: durable background jobs (bot/scheduler.py)
+    """
+    -- Finished jobs are deleted; status is 'pending' or, after the last
+    -- retry, 'failed'.
+    CREATE TABLE scheduled_job (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      kind TEXT NOT NULL,
+      ref_id INTEGER NOT NULL,
+      due_at INTEGER NOT NULL,
+      status TEXT NOT NULL DEFAULT 'pending',
+      attempts INTEGER NOT NULL DEFAULT 0,
+      created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE INDEX ix_scheduled_job_pending
+        ON scheduled_job(due_at)
+        WHERE status = 'pending';
+    """,
+    # 6: Telegram file_id of uploaded media (bot/media.py)
+    """
+    CREATE TABLE media_cache (
+      media_key TEXT NOT NULL,
+      content_hash TEXT NOT NULL,
+      file_id TEXT NOT NULL,
+      created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+      PRIMARY KEY (media_key, content_hash)
+    ) WITHOUT ROWID;
+    """,
+    # 7: notification outbox (bot/outbox.py), written with the order/booking
+    """
+    -- status is 'pending', 'delivered' or, after the last retry, 'failed'.
+    CREATE TABLE outbox (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      chat_id INTEGER NOT NULL,
+      text TEXT NOT NULL,
+      status TEXT NOT NULL DEFAULT 'pending',
+      attempts INTEGER NOT NULL DEFAULT 0,
+      next_attempt_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+      created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+      delivered_at INTEGER
+    );
+    CREATE INDEX ix_outbox_pending
+        ON outbox(next_attempt_at)
+        WHERE status = 'pending';
+    """,
+]
+
+
+async def _foreign_key_violations(db: aiosqlite.Connection) -> set[tuple]:
+    cur = await db.execute("PRAGMA foreign_key_check")
+    rows = await cur.fetchall()
+    await cur.close()
+    return {tuple(row) for row in rows}
+
+
+async def migrate(db: aiosqlite.Connection) -> int:
+    """Upgrade the database in place to len(MIGRATIONS) and return the version.
+
+    Each migration runs in its own transaction together with the user_version
+    bump, so an interrupted upgrade resumes from the last completed step.
+    """
+
+    cur = await db.execute("PRAGMA user_version")
+    (version,) = await cur.fetchone()
+    await cur.close()
+    if version >= len(MIGRATIONS):
+        return version
+
+    # Table rebuilds need foreign keys off; the pragma is a no-op inside a
+    # transaction, so it is toggled around the whole run. Violations that
+    # predate the upgrade are tolerated; new ones abort the step.
+    await db.execute("PRAGMA foreign_keys=OFF;")
+    try:
+        known_violations = await _foreign_key_violations(db)
+        for number in range(version + 1, len(MIGRATIONS) + 1):
+            try:
+                await db.executescript(
+                    "BEGIN IMMEDIATE;\n"
+                    f"{MIGRATIONS[number - 1]}\n"
+                    f"PRAGMA user_version = {number};\n"
+                )
+                violations = await _foreign_key_violations(db) - known_violations
+                if violations:
+                    raise RuntimeError(
+                        f"Migration {number} left foreign key violations: {sorted(violations)[:5]}"
+                    )
+                await db.commit()
+            except Exception:
+                if db.in_transaction:
+                    await db.rollback()
+                raise
+            version = number
+    finally:
+        await db.execute("PRAGMA foreign_keys=ON;")
+    return version
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.types import Message
+
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `capacity` saved up."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+
+        self._refill(now)
+        pause = max(0.0, self.paused_until - now)
+        if self.tokens >= 1:
+            return pause
+        return max(pause, (1 - self.tokens) / self.rate)
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until
+
+
+@dataclass
+class _Outgoing:
+    chat_id: int
+    text: str
+    kwargs: dict[str, Any]
+    future: asyncio.Future
+    attempts: int = 0
+
+
+@dataclass
+class _ChatQueue:
+    bucket: TokenBucket
+    messages: deque[_Outgoing] = field(default_factory=deque)
+    sending: bool = False
+
+
+class Notifier:
+    """Outbound message queue shared by handlers and background jobs.
+
+    `send()` and `fan_out()` only enqueue and return futures, so a handler
+    never waits for delivery. A dispatcher task sends messages respecting a
+    global token bucket (Telegram allows about 30 msg/s per bot) and one
+    bucket per chat (about 1 msg/s in a private chat, 20 msg/min in a group).
+    Messages to one chat go out in order; different chats are sent
+    concurrently, up to `concurrency` requests at once.
+
+    A 429 pauses that chat for `retry_after` and puts the message back at
+    the head of its queue; network and 5xx errors are retried with backoff.
+    Other errors fail the message's future (and are logged).
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20 / 60,
+        concurrency: int = 16,
+        max_attempts: int = 5,
+    ) -> None:
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_attempts = max_attempts
+        # No saved-up burst: at most `global_rate` sends in any one-second window.
+        self._global = TokenBucket(global_rate, 1)
+        self._chats: dict[int, _ChatQueue] = {}
+        # (ready_at, seq, chat_id): chats with queued messages and nothing in flight
+        self._ready: list[tuple[float, int, int]] = []
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._running: set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def send(self, chat_id: int, text: str, **kwargs: Any) -> asyncio.Future:
+        """Queue a message; the future resolves to the sent Message."""
+
+        future = asyncio.get_running_loop().create_future()
+        chat = self._chat(int(chat_id))
+        chat.messages.append(_Outgoing(int(chat_id), text, kwargs, future))
+        if not chat.sending and len(chat.messages) == 1:
+            self._schedule(int(chat_id), time.monotonic())
+        return future
+
+    def fan_out(self, chat_ids: Iterable[int], text: str, **kwargs: Any) -> list[asyncio.Future]:
+        """Queue the same message to every chat; they are delivered concurrently."""
+
+        return [self.send(chat_id, text, **kwargs) for chat_id in chat_ids]
+
+    @property
+    def queued(self) -> int:
+        return sum(len(chat.messages) for chat in self._chats.values())
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="notifier")
+
+    async def stop(self, *, timeout: float = 5.0) -> None:
+        """Give queued messages `timeout` seconds to go out, then cancel the rest."""
+
+        deadline = time.monotonic() + timeout
+        while (self.queued or self._running) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._running):
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        for chat in self._chats.values():
+            for outgoing in chat.messages:
+                outgoing.future.cancel()
+        self._chats.clear()
+        self._ready.clear()
+
+    def _chat(self, chat_id: int) -> _ChatQueue:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            # Negative ids are groups and channels, which have a per-minute limit.
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            chat = self._chats[chat_id] = _ChatQueue(TokenBucket(rate, 1))
+        return chat
+
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def _schedule(self, chat_id: int, ready_at: float) -> None:
+        heapq.heappush(self._ready, (ready_at, self._next_seq(), chat_id))
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            if not self._ready:
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            ready_at, _, chat_id = self._ready[0]
+            chat = self._chats[chat_id]
+            chat_ready = now + chat.bucket.wait_time(now)
+            if chat_ready > ready_at + 0.001:
+                # Its own bucket is empty: requeue it so other chats go first.
+                heapq.heapreplace(self._ready, (chat_ready, self._next_seq(), chat_id))
+                continue
+
+            delay = max(ready_at - now, self._global.wait_time(now))
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._ready)
+            await self._slots.acquire()
+            now = time.monotonic()
+            chat.bucket.take(now)
+            self._global.take(now)
+            chat.sending = True
+            outgoing = chat.messages[0]
+            task = asyncio.create_task(self._deliver(chat, outgoing), name=f"notify-{chat_id}")
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _deliver(self, chat: _ChatQueue, outgoing: _Outgoing) -> None:
+        retry_in = 0.0
+        try:
+            outgoing.attempts += 1
+            message: Message = await self.bot.send_message(
+                outgoing.chat_id,
+                outgoing.text,
+                **outgoing.kwargs,
+            )
+        except TelegramRetryAfter as exc:
+            chat.bucket.pause(exc.retry_after)
+            retry_in = float(exc.retry_after)
+            log.warning("Flood control for chat %s: retry in %s s", outgoing.chat_id, exc.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as exc:
+            if outgoing.attempts < self.max_attempts:
+                retry_in = float(2 ** (outgoing.attempts - 1))
+                chat.bucket.pause(retry_in)
+                log.warning("Sending to chat %s failed (%s), retry in %s s", outgoing.chat_id, exc, retry_in)
+            else:
+                self._fail(chat, outgoing, exc)
+        except Exception as exc:
+            self._fail(chat, outgoing, exc)
+        else:
+            chat.messages.popleft()
+            if not outgoing.future.done():
+                outgoing.future.set_result(message)
+        finally:
+            self._slots.release()
+            chat.sending = False
+            if chat.messages:
+                self._schedule(outgoing.chat_id, time.monotonic() + retry_in)
+            else:
+                self._forget_idle()
+
+    def _fail(self, chat: _ChatQueue, outgoing: _Outgoing, exc: Exception) -> None:
+        chat.messages.popleft()
+        log.warning("Message to chat %s not delivered: %s", outgoing.chat_id, exc)
+        if not outgoing.future.done():
+            outgoing.future.set_exception(exc)
+            outgoing.future.exception()  # mark retrieved: fire-and-forget callers never await it
+
+    def _forget_idle(self) -> None:
+        # Buckets of quiet chats are back to full and carry no state worth keeping.
+        if len(self._chats) < 1024:
+            return
+        now = time.monotonic()
+        idle = [
+            chat_id
+            for chat_id, chat in self._chats.items()
+            if not chat.messages and not chat.sending and chat.bucket.is_idle(now)
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
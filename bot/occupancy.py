@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+
+
+# (start_ts, end_ts, reservation_id), kept sorted by start
+Interval = tuple[int, int, int]
+
+
+def _days(start_ts: int, end_ts: int) -> Iterator[date]:
+    """Local calendar days touched by [start_ts, end_ts)."""
+
+    day = datetime.fromtimestamp(start_ts).date()
+    last = datetime.fromtimestamp(max(start_ts, end_ts - 1)).date()
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+class OccupancyIndex:
+    """Active (pending/confirmed) reservations per table per local day.
+
+    Each (table_id, day) maps to intervals sorted by start time; an interval
+    spanning midnight is filed under both days. A free/busy check is a bisect
+    plus a short backwards scan bounded by the longest booking, so the booking
+    keyboard is answered without touching SQLite.
+
+    Only this process's writes keep it current: it is loaded once at startup
+    and updated by bot.db after each reservation write commits. Days before
+    today are dropped by the first add() of each day, so a long-running
+    process only holds today and later.
+    """
+
+    def __init__(self) -> None:
+        self._intervals: dict[tuple[int, date], list[Interval]] = {}
+        self._by_id: dict[int, tuple[int, int, int]] = {}
+        self._max_len = 0
+        self._pruned_on: Optional[date] = None
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def add(self, reservation_id: int, table_id: int, start_ts: int, end_ts: int) -> None:
+        today = date.today()
+        if self._pruned_on != today:
+            self.prune(today)
+        self.remove(reservation_id)
+        self._by_id[reservation_id] = (table_id, start_ts, end_ts)
+        self._max_len = max(self._max_len, end_ts - start_ts)
+        for day in _days(start_ts, end_ts):
+            insort(self._intervals.setdefault((table_id, day), []), (start_ts, end_ts, reservation_id))
+
+    def remove(self, reservation_id: int) -> None:
+        entry = self._by_id.pop(reservation_id, None)
+        if entry is None:
+            return
+        table_id, start_ts, end_ts = entry
+        for day in _days(start_ts, end_ts):
+            intervals = self._intervals.get((table_id, day))
+            if not intervals:
+                continue
+            i = bisect_left(intervals, (start_ts, end_ts, reservation_id))
+            if i < len(intervals) and intervals[i][2] == reservation_id:
+                del intervals[i]
+            if not intervals:
+                del self._intervals[(table_id, day)]
+
+    def prune(self, before: date) -> int:
+        """Forget the days before `before`; returns how many bookings were dropped.
+
+        A booking running past midnight into `before` keeps its later day.
+        """
+
+        self._pruned_on = before
+        for key in [key for key in self._intervals if key[1] < before]:
+            del self._intervals[key]
+        cutoff = int(datetime.combine(before, time.min).timestamp())
+        stale = [reservation_id for reservation_id, (_, _, end_ts) in self._by_id.items() if end_ts <= cutoff]
+        for reservation_id in stale:
+            del self._by_id[reservation_id]
+        return len(stale)
+
+    def is_free(self, table_id: int, start_ts: int, end_ts: int) -> bool:
+        for day in _days(start_ts, end_ts):
+            intervals = self._intervals.get((table_id, day))
+            if not intervals:
+                continue
+            # Intervals starting before end_ts are intervals[:i]; only those that
+            # started within the longest booking length can still be running.
+            i = bisect_left(intervals, (end_ts,))
+            j = i - 1
+            while j >= 0 and intervals[j][0] > start_ts - self._max_len:
+                if intervals[j][1] > start_ts:
+                    return False
+                j -= 1
+        return True
+
+    def day_intervals(self, table_id: int, day: date) -> list[Interval]:
+        return list(self._intervals.get((table_id, day), ()))
+
+    def intervals_between(self, table_id: int, lo_ts: int, hi_ts: int) -> list[tuple[int, int]]:
+        """(start, end) of the table's bookings overlapping [lo_ts, hi_ts), by start."""
+
+        found: dict[int, tuple[int, int]] = {}
+        for day in _days(lo_ts, hi_ts):
+            for start_ts, end_ts, reservation_id in self._intervals.get((table_id, day), ()):
+                if start_ts < hi_ts and end_ts > lo_ts:
+                    found[reservation_id] = (start_ts, end_ts)
+        return sorted(found.values())
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from bot.db import (
+    OutboxMessage,
+    fetch_due_outbox,
+    fetch_outbox_depth,
+    prune_outbox,
+    set_outbox_listener,
+    settle_outbox,
+)
+from bot.notifier import Notifier
+
+
+log = logging.getLogger(__name__)
+
+# Telegram will refuse these again on retry (chat not found, bot blocked, ...).
+PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError)
+
+
+class OutboxDispatcher:
+    """Delivers the `outbox` table through the Notifier.
+
+    Alerts are inserted in the same transaction as the order or booking
+    they describe (see the `alert_to`/`alert` arguments in bot.db), so a
+    crash or network error never loses one. The dispatcher sends up to
+    `batch_size` due messages at once, then records the whole batch in one
+    write: sent rows are marked 'delivered', failed ones are retried after
+    `retry_delay * 2**attempts` (capped at `max_retry_delay`) and marked
+    'failed' after `max_attempts` or on an error Telegram will repeat.
+
+    Committed writes wake the loop (bot.db.set_outbox_listener); otherwise it
+    sleeps until the earliest retry. A message may be sent twice if the
+    process dies between the send and the batch write.
+
+    The pending depth is kept in `depth` (served by the webhook /healthz)
+    and, in any mode, logged as a warning every `report_interval` seconds
+    while it is at least `warn_depth`.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        notifier: Notifier,
+        *,
+        batch_size: int = 50,
+        max_attempts: int = 10,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 3600.0,
+        keep_delivered: float = 7 * 24 * 3600,
+        warn_depth: int = 20,
+        report_interval: float = 60.0,
+    ) -> None:
+        self.db_path = db_path
+        self.notifier = notifier
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.keep_delivered = keep_delivered
+        self.warn_depth = warn_depth
+        self.report_interval = report_interval
+        # Pending messages after the last batch (reported by /healthz).
+        self.depth = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._last_report = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await prune_outbox(self.db_path, int(time.time() - self.keep_delivered))
+        self._stopping = False
+        set_outbox_listener(self.db_path, self._wakeup.set)
+        self._task = asyncio.create_task(self._run(), name="outbox")
+
+    async def stop(self, *, timeout: float = 5.0) -> None:
+        """Let the current batch finish (up to `timeout` seconds), then stop.
+
+        Undelivered rows stay pending and go out after the next start.
+        """
+
+        set_outbox_listener(self.db_path, None)
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                full = await self._deliver_batch()
+                self.depth, next_ts = await fetch_outbox_depth(self.db_path)
+                self._report_depth()
+            except Exception:
+                log.exception("Outbox batch failed")
+                full, next_ts = False, time.time() + self.retry_delay
+            if full:
+                # More may be due right away.
+                continue
+
+            timeout = None if next_ts is None else max(0.0, next_ts - time.time())
+            if self.depth >= self.warn_depth:
+                # Keep re-checking (and reporting) a backlog even if nothing is due.
+                timeout = self.report_interval if timeout is None else min(timeout, self.report_interval)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver_batch(self) -> bool:
+        """Send one batch of due messages; True if the batch was full."""
+
+        batch = await fetch_due_outbox(self.db_path, int(time.time()), limit=self.batch_size)
+        if not batch:
+            return False
+
+        results = await asyncio.gather(
+            *(self.notifier.send(message.chat_id, message.text) for message in batch),
+            return_exceptions=True,
+        )
+        delivered: list[int] = []
+        retries: list[tuple[int, int]] = []
+        failed: list[int] = []
+        now = time.time()
+        for message, result in zip(batch, results):
+            if not isinstance(result, BaseException):
+                delivered.append(message.id)
+            elif isinstance(result, PERMANENT_ERRORS) or message.attempts + 1 >= self.max_attempts:
+                log.warning("Outbox message #%s to chat %s dropped: %s", message.id, message.chat_id, result)
+                failed.append(message.id)
+            else:
+                retries.append((message.id, int(now + self._backoff(message))))
+
+        await settle_outbox(self.db_path, delivered=delivered, retries=retries, failed=failed)
+        log.info(
+            "Outbox: %d delivered, %d to retry, %d failed",
+            len(delivered),
+            len(retries),
+            len(failed),
+        )
+        return len(batch) == self.batch_size
+
+    def _report_depth(self) -> None:
+        now = time.monotonic()
+        if self.depth < self.warn_depth or now - self._last_report < self.report_interval:
+            return
+        self._last_report = now
+        log.warning("Outbox backlog: %d messages pending", self.depth)
+
+    def _backoff(self, message: OutboxMessage) -> float:
+        return min(self.max_retry_delay, self.retry_delay * 2**message.attempts)
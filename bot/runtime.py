@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Mapping, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+
+from bot.config import Config
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (and not available on Windows)
+    uvloop = None
+
+
+log = logging.getLogger(__name__)
+
+# Uploads get their own, longer timeout unless BOT_HTTP_TIMEOUTS says otherwise.
+UPLOAD_METHODS = (
+    "sendPhoto",
+    "sendDocument",
+    "sendMediaGroup",
+    "sendVideo",
+    "sendAnimation",
+    "sendAudio",
+    "sendVoice",
+)
+
+
+class MethodTimeoutSession(AiohttpSession):
+    """AiohttpSession with per-method timeouts.
+
+    A call without an explicit timeout uses `method_timeouts[method]`, else
+    the session timeout, so uploads can wait longer than a sendMessage.
+    getUpdates passes its own timeout and is unaffected.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float = 20.0,
+        method_timeouts: Optional[Mapping[str, float]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(timeout=timeout, **kwargs)
+        self.method_timeouts = dict(method_timeouts or {})
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[Any],
+        timeout: Optional[int] = None,
+    ) -> Any:
+        if timeout is None:
+            timeout = self.method_timeouts.get(method.__api_method__)
+        return await super().make_request(bot, method, timeout)
+
+
+def build_session(config: Config) -> MethodTimeoutSession:
+    """Bot HTTP session from the BOT_HTTP_* settings."""
+
+    method_timeouts = {name: config.bot_http_upload_timeout for name in UPLOAD_METHODS}
+    method_timeouts.update(config.bot_http_method_timeouts)
+    return MethodTimeoutSession(
+        timeout=config.bot_http_timeout,
+        method_timeouts=method_timeouts,
+    )
+
+
+def run(main: Awaitable[None], *, event_loop: str = "auto") -> None:
+    """asyncio.run on uvloop when requested/available, else the default loop."""
+
+    use_uvloop = event_loop == "uvloop" or (event_loop == "auto" and uvloop is not None)
+    if use_uvloop and uvloop is None:
+        log.warning("EVENT_LOOP=uvloop but uvloop is not installed; using asyncio")
+        use_uvloop = False
+
+    if not use_uvloop:
+        asyncio.run(main)
+    elif hasattr(asyncio, "Runner"):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(main)
+    else:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(main)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from bot.db import (
+    ScheduledJob,
+    complete_job,
+    fail_job,
+    fetch_pending_jobs,
+    retry_job,
+    set_job_listener,
+)
+
+
+JobHandler = Callable[[ScheduledJob], Awaitable[None]]
+
+log = logging.getLogger(__name__)
+
+
+class JobScheduler:
+    """Runs the jobs stored in `scheduled_job` when they fall due.
+
+    Pending jobs are loaded once at start into a heap ordered by due time.
+    Writes that create jobs hand them over right after their transaction
+    commits (see bot.db.set_job_listener). The loop sleeps until the earliest
+    due time or until an earlier job arrives, so nothing polls the database.
+
+    A job is deleted once its handler returns; a failing handler is retried
+    with a growing delay and marked 'failed' after `max_attempts`. Handlers
+    must be idempotent: a crash between the handler and the delete runs the
+    job again after restart.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        handlers: dict[str, JobHandler],
+        *,
+        concurrency: int = 8,
+        max_attempts: int = 5,
+        retry_delay: float = 60.0,
+    ) -> None:
+        self.db_path = db_path
+        self.handlers = handlers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._heap: list[tuple[int, int, ScheduledJob]] = []
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._running: set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        # Register first so jobs created while loading are not missed; a job
+        # seen twice is harmless because handlers are idempotent.
+        set_job_listener(self.db_path, self.add)
+        self.add(await fetch_pending_jobs(self.db_path))
+        self._task = asyncio.create_task(self._run(), name="job-scheduler")
+
+    async def stop(self) -> None:
+        set_job_listener(self.db_path, None)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def add(self, jobs: list[ScheduledJob]) -> None:
+        for job in jobs:
+            heapq.heappush(self._heap, (job.due_at, job.id, job))
+        if jobs:
+            self._wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, job = heapq.heappop(self._heap)
+            await self._slots.acquire()
+            task = asyncio.create_task(self._execute(job), name=f"job-{job.id}")
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _execute(self, job: ScheduledJob) -> None:
+        try:
+            handler = self.handlers.get(job.kind)
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job.kind!r}")
+            await handler(job)
+        except Exception:
+            log.exception("Job #%s (%s) failed, attempt %d", job.id, job.kind, job.attempts + 1)
+            await self._retry(job)
+        else:
+            await complete_job(self.db_path, job.id)
+        finally:
+            self._slots.release()
+
+    async def _retry(self, job: ScheduledJob) -> None:
+        if job.attempts + 1 >= self.max_attempts:
+            await fail_job(self.db_path, job.id)
+            return
+        due_ts = int(time.time() + self.retry_delay * (job.attempts + 1))
+        self.add([await retry_job(self.db_path, job, due_ts)])
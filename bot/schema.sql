@@ -1,3 +1,5 @@
+-- Baseline schema (user_version 0). Later changes live in bot/migrations.py.
+
 CREATE TABLE IF NOT EXISTS menu_item (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   category TEXT NOT NULL,
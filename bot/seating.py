@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Mapping, Optional, Sequence
+
+if TYPE_CHECKING:
+    from bot.db import CafeTable
+
+
+# Larger parties are split across at most this many pushed-together tables.
+MAX_COMBINED_TABLES = 4
+
+
+@dataclass(frozen=True)
+class Hall:
+    """Active tables (ordered by seats, code) and which pairs can be pushed together."""
+
+    tables: list[CafeTable]
+    links: frozenset[frozenset[int]]
+
+
+def table_groups(hall: Hall, guests: int) -> list[tuple[CafeTable, ...]]:
+    """Every way to seat `guests`: single tables and connected groups of linked
+    tables in one zone, up to MAX_COMBINED_TABLES. Groups stop growing as soon
+    as they have enough seats, so no returned group has a table to spare.
+    """
+
+    by_id = {t.id: t for t in hall.tables}
+    adjacency: dict[int, set[int]] = {t.id: set() for t in hall.tables}
+    for pair in hall.links:
+        a, b = tuple(pair)
+        if a in by_id and b in by_id and by_id[a].zone == by_id[b].zone:
+            adjacency[a].add(b)
+            adjacency[b].add(a)
+
+    found: list[tuple[CafeTable, ...]] = []
+    seen: set[frozenset[int]] = set()
+    frontier = [frozenset([t.id]) for t in hall.tables]
+    while frontier:
+        grown: list[frozenset[int]] = []
+        for group in frontier:
+            if group in seen:
+                continue
+            seen.add(group)
+            if sum(by_id[i].seats for i in group) >= guests:
+                found.append(tuple(sorted((by_id[i] for i in group), key=lambda t: (t.seats, t.code))))
+                continue
+            if len(group) >= MAX_COMBINED_TABLES:
+                continue
+            for table_id in group:
+                for other in adjacency[table_id] - group:
+                    grown.append(group | {other})
+        frontier = grown
+    return found
+
+
+def _overlaps(intervals: Sequence[tuple[int, int]], start_ts: int, end_ts: int) -> bool:
+    return any(s < end_ts and e > start_ts for s, e in intervals)
+
+
+def _fragments(
+    intervals: Sequence[tuple[int, int]],
+    start_ts: int,
+    end_ts: int,
+    *,
+    open_ts: int,
+    close_ts: int,
+    min_gap: int,
+) -> int:
+    """Idle seconds left next to the booking that are too short for another one."""
+
+    before = max([e for _, e in intervals if e <= start_ts] + [open_ts])
+    after = min([s for s, _ in intervals if s >= end_ts] + [close_ts])
+    wasted = 0
+    for gap in (start_ts - before, after - end_ts):
+        if 0 < gap < min_gap:
+            wasted += gap
+    return wasted
+
+
+def best_fit(
+    hall: Hall,
+    guests: int,
+    busy: Mapping[int, Sequence[tuple[int, int]]],
+    start_ts: int,
+    end_ts: int,
+    *,
+    open_ts: int,
+    close_ts: int,
+    min_gap: int,
+) -> Optional[tuple[CafeTable, ...]]:
+    """Pick the tables for a party, or None if nothing fits.
+
+    Preference order: fewest empty seats, fewest tables, then the placement
+    that leaves the least idle time too short to sell (`min_gap` is one booking
+    length), so the evening packs tightly. `busy` holds each table's active
+    (start, end) intervals around the requested time.
+    """
+
+    best: Optional[tuple[CafeTable, ...]] = None
+    best_key: Optional[tuple] = None
+    for group in table_groups(hall, guests):
+        if any(_overlaps(busy.get(t.id, ()), start_ts, end_ts) for t in group):
+            continue
+        fragments = sum(
+            _fragments(
+                busy.get(t.id, ()),
+                start_ts,
+                end_ts,
+                open_ts=open_ts,
+                close_ts=close_ts,
+                min_gap=min_gap,
+            )
+            for t in group
+        )
+        key = (
+            sum(t.seats for t in group) - guests,
+            len(group),
+            fragments,
+            [t.code for t in group],
+        )
+        if best_key is None or key < best_key:
+            best, best_key = group, key
+    return best
+
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 from datetime import date, datetime, time, timedelta
+from typing import TYPE_CHECKING
 
 from bot.config import Config
 
+if TYPE_CHECKING:
+    from bot.db import WaitlistPromotion
+
 
 def format_price(price_cents: int) -> str:
     rub = price_cents / 100
@@ -12,6 +16,12 @@ def format_price(price_cents: int) -> str:
     return f"{rub:.2f} ₽"
 
 
+def format_ts(ts: int) -> str:
+    """Render a stored epoch timestamp as local wall-clock time."""
+
+    return datetime.fromtimestamp(int(ts)).strftime("%Y-%m-%d %H:%M")
+
+
 def parse_date(text: str) -> date | None:
     raw = text.strip().lower()
     today = date.today()
@@ -43,3 +53,34 @@ def is_admin_user(config: Config, *, user_id: int | None, chat_id: int | None) -
     if config.admin_chat_id is not None and chat_id == config.admin_chat_id:
         return True
     return False
+
+
+def admin_targets(config: Config) -> set[int]:
+    """Chats that receive admin notifications."""
+
+    targets: set[int] = set()
+    if config.admin_chat_id is not None:
+        targets.add(int(config.admin_chat_id))
+    targets.update(int(x) for x in config.admin_user_ids)
+    return targets
+
+
+def waitlist_promotion_alert(promotion: WaitlistPromotion) -> str:
+    tables = "+".join(t.code for t in promotion.assignment.tables)
+    return (
+        f"🪑 Новая бронь #{promotion.assignment.reservation_id} (из листа ожидания №{promotion.waitlist_id})\n"
+        f"Дата/время: {format_ts(promotion.assignment.start_at)}\n"
+        f"Гостей: {promotion.guests}\n"
+        f"Стол: {tables}"
+    )
+
+
+def waitlist_promotion_text(promotion: WaitlistPromotion) -> str:
+    tables = "+".join(t.code for t in promotion.assignment.tables)
+    return (
+        "🎉 Освободился стол — вы из листа ожидания!\n"
+        f"Бронь #{promotion.assignment.reservation_id}\n"
+        f"Дата/время: {format_ts(promotion.assignment.start_at)}\n"
+        f"Гостей: {promotion.guests}\n"
+        f"Стол: {tables}"
+    )
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from bot.config import Config
+from bot.outbox import OutboxDispatcher
+
+
+log = logging.getLogger(__name__)
+
+STARTED_AT_KEY = web.AppKey("started_at", float)
+OUTBOX_KEY = web.AppKey("outbox", OutboxDispatcher)
+
+
+async def healthz(request: web.Request) -> web.Response:
+    """Liveness: the process is up and serving HTTP (plus the outbox depth)."""
+
+    body = {"status": "ok", "uptime": round(time.monotonic() - request.app[STARTED_AT_KEY], 1)}
+    outbox = request.app.get(OUTBOX_KEY)
+    if outbox is not None:
+        body["outbox"] = outbox.depth
+    return web.json_response(body)
+
+
+def build_webhook_app(
+    dp: Dispatcher,
+    bot: Bot,
+    config: Config,
+    *,
+    outbox: Optional[OutboxDispatcher] = None,
+) -> web.Application:
+    """aiohttp app that feeds Telegram updates POSTed to WEBHOOK_PATH into `dp`.
+
+    Requests without the right X-Telegram-Bot-Api-Secret-Token get 401. Each
+    update is answered after its handlers finish, so Telegram's
+    max_connections (WEBHOOK_MAX_CONNECTIONS) bounds how many run at once and
+    a crash mid-update makes Telegram redeliver it.
+    """
+
+    app = web.Application()
+    app[STARTED_AT_KEY] = time.monotonic()
+    if outbox is not None:
+        app[OUTBOX_KEY] = outbox
+    app.router.add_get("/healthz", healthz)
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=False,
+        secret_token=config.webhook_secret,
+        config=config,
+    ).register(app, path=config.webhook_path)
+    setup_application(app, dp, bot=bot, config=config)
+    return app
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    config: Config,
+    *,
+    outbox: Optional[OutboxDispatcher] = None,
+) -> None:
+    """Serve the webhook app until cancelled.
+
+    The webhook is registered with Telegram only when WEBHOOK_URL is set;
+    without it the server just accepts POSTed updates (local replay).
+    """
+
+    runner = web.AppRunner(build_webhook_app(dp, bot, config, outbox=outbox), access_log=None)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, config.webhook_host, config.webhook_port)
+        await site.start()
+        log.info(
+            "Webhook server listening on %s:%s%s",
+            config.webhook_host,
+            config.webhook_port,
+            config.webhook_path,
+        )
+
+        if config.webhook_url:
+            await bot.set_webhook(
+                config.webhook_url + config.webhook_path,
+                secret_token=config.webhook_secret,
+                max_connections=config.webhook_max_connections,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+        else:
+            log.warning("WEBHOOK_URL is not set: the webhook is not registered with Telegram")
+
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -5,6 +5,11 @@ const tg = window.Telegram?.WebApp;
 const SHEET_CSV_URL =
   'https://docs.google.com/spreadsheets/d/e/2PACX-1vRKkNaFq35qpbgc5eI__DJwKFSn3iIZIld1xHIyEBol4DPqTOQz4E5ofZER07gaHU27ngCrKAToU-Cl/pub?gid=1187582404&single=true&output=csv';
 
+// Availability API of the bot (API_PUBLIC_URL), passed by the bot as ?api=...
+const API_URL = new URLSearchParams(window.location.search).get('api') || '';
+const BOOKING_DAYS = 14;
+const MAX_GUESTS = 20;
+
 function rub(n) {
   const val = Number(n);
   if (!Number.isFinite(val)) return '0.00 Br';
@@ -138,6 +143,21 @@ async function loadMenu() {
   return rowsToMenu(rows);
 }
 
+async function loadAvailability(guests) {
+  const url = new URL(`${API_URL}/api/availability`);
+  url.searchParams.set('guests', String(guests));
+  url.searchParams.set('days', String(BOOKING_DAYS));
+  const res = await fetch(url.toString());
+  if (!res.ok) throw new Error(`availability ${res.status}`);
+  return res.json();
+}
+
+function dayLabel(iso) {
+  const [y, m, d] = iso.split('-').map(Number);
+  const date = new Date(y, m - 1, d);
+  return date.toLocaleDateString('ru-RU', { weekday: 'short', day: 'numeric', month: 'numeric' });
+}
+
 function createEl(tag, className, text) {
   const el = document.createElement(tag);
   if (className) el.className = className;
@@ -200,12 +220,28 @@ function main() {
   const phoneInput = document.getElementById('phoneInput');
   const addressInput = document.getElementById('addressInput');
   const commentInput = document.getElementById('commentInput');
+  const bookingViewEl = document.getElementById('bookingView');
+  const navBookingBtn = document.getElementById('navBooking');
+  const guestsDecBtn = document.getElementById('guestsDec');
+  const guestsIncBtn = document.getElementById('guestsInc');
+  const guestsNumEl = document.getElementById('guestsNum');
+  const bookingDaysEl = document.getElementById('bookingDays');
+  const bookingSlotsEl = document.getElementById('bookingSlots');
+  const bookingNameInput = document.getElementById('bookingNameInput');
+  const bookingPhoneInput = document.getElementById('bookingPhoneInput');
+  const bookBtn = document.getElementById('bookBtn');
 
   const cart = new Map(); // key -> {category,title,price,qty}
   let currentCategory = null;
   let menu = null;
-  let view = 'home'; // 'home' | 'menu' | 'search' | 'cart' | 'order'
+  let view = 'home'; // 'home' | 'menu' | 'search' | 'cart' | 'order' | 'booking'
   let orderType = 'delivery'; // 'delivery' | 'pickup'
+  let guests = 2;
+  let availability = null; // {guests, days: [{date, slots: ['HH:MM']}]}
+  let availabilityError = false;
+  let availabilityRequest = 0;
+  let bookingDay = null;
+  let bookingTime = null;
 
   function cartEntries() {
     return Array.from(cart.values()).filter(x => x.qty > 0);
@@ -228,6 +264,7 @@ function main() {
     navMenuBtn?.classList.toggle('active', key === 'menu');
     navSearchBtn?.classList.toggle('active', key === 'search');
     navCartBtn?.classList.toggle('active', key === 'cart');
+    navBookingBtn?.classList.toggle('active', key === 'booking');
   }
 
   function setView(next) {
@@ -237,6 +274,7 @@ function main() {
     searchViewEl?.classList.toggle('hidden', view !== 'search');
     cartViewEl?.classList.toggle('hidden', view !== 'cart');
     orderViewEl?.classList.toggle('hidden', view !== 'order');
+    bookingViewEl?.classList.toggle('hidden', view !== 'booking');
     tabsEl?.classList.toggle('hidden', view !== 'menu');
 
     if (subtitleEl) {
@@ -245,6 +283,7 @@ function main() {
       if (view === 'search') subtitleEl.textContent = 'Поиск по названию блюда';
       if (view === 'cart') subtitleEl.textContent = 'Ваш выбор';
       if (view === 'order') subtitleEl.textContent = 'Проверьте заказ и заполните доставку';
+      if (view === 'booking') subtitleEl.textContent = 'Выберите день и время';
     }
 
     setNavActive(view === 'order' ? 'cart' : view);
@@ -607,6 +646,108 @@ function main() {
     }
   }
 
+  function bookingSlots() {
+    const day = availability?.days.find(d => d.date === bookingDay);
+    return day ? day.slots : [];
+  }
+
+  function isBookingValid() {
+    if (!bookingDay || !bookingTime) return false;
+    if ((bookingNameInput?.value || '').trim().length < 2) return false;
+    if ((bookingPhoneInput?.value || '').trim().length < 6) return false;
+    return true;
+  }
+
+  function updateBookBtn() {
+    if (!bookBtn) return;
+    bookBtn.textContent = bookingTime
+      ? `Забронировать · ${dayLabel(bookingDay)} ${bookingTime}`
+      : 'Забронировать';
+    bookBtn.disabled = !isBookingValid();
+  }
+
+  function renderBooking() {
+    if (guestsNumEl) guestsNumEl.textContent = String(guests);
+    if (guestsDecBtn) guestsDecBtn.disabled = guests <= 1;
+    if (guestsIncBtn) guestsIncBtn.disabled = guests >= MAX_GUESTS;
+
+    if (bookingDaysEl) {
+      bookingDaysEl.innerHTML = '';
+      for (const d of availability?.days || []) {
+        const btn = createEl('button', 'tab', dayLabel(d.date));
+        btn.type = 'button';
+        if (d.date === bookingDay) btn.classList.add('active');
+        btn.disabled = d.slots.length === 0;
+        btn.addEventListener('click', () => {
+          bookingDay = d.date;
+          bookingTime = null;
+          renderBooking();
+        });
+        bookingDaysEl.appendChild(btn);
+      }
+    }
+
+    if (bookingSlotsEl) {
+      bookingSlotsEl.innerHTML = '';
+      if (!API_URL) {
+        bookingSlotsEl.appendChild(createEl('div', 'tile', 'Бронирование доступно в чате с ботом'));
+      } else if (availabilityError) {
+        bookingSlotsEl.appendChild(createEl('div', 'tile', 'Не удалось загрузить свободное время'));
+      } else if (!availability) {
+        bookingSlotsEl.appendChild(createEl('div', 'tile', 'Загрузка…'));
+      } else if (bookingSlots().length === 0) {
+        bookingSlotsEl.appendChild(createEl('div', 'tile', 'Нет свободного времени на ближайшие дни'));
+      } else {
+        for (const t of bookingSlots()) {
+          const btn = createEl('button', 'slot-btn', t);
+          btn.type = 'button';
+          if (t === bookingTime) btn.classList.add('active');
+          btn.addEventListener('click', () => {
+            bookingTime = t;
+            renderBooking();
+          });
+          bookingSlotsEl.appendChild(btn);
+        }
+      }
+    }
+
+    updateBookBtn();
+  }
+
+  function refreshAvailability() {
+    if (!API_URL) {
+      renderBooking();
+      return;
+    }
+    // Only the answer to the latest request is rendered.
+    availabilityRequest += 1;
+    const request = availabilityRequest;
+    availability = null;
+    availabilityError = false;
+    renderBooking();
+    loadAvailability(guests)
+      .then((data) => {
+        if (request !== availabilityRequest) return;
+        availability = data;
+        if (!bookingSlots().length) {
+          bookingDay = data.days.find(d => d.slots.length > 0)?.date || null;
+        }
+        if (!bookingSlots().includes(bookingTime)) bookingTime = null;
+        renderBooking();
+      })
+      .catch((err) => {
+        if (request !== availabilityRequest) return;
+        console.error('Failed to load availability', err);
+        availabilityError = true;
+        renderBooking();
+      });
+  }
+
+  function setGuests(next) {
+    guests = Math.min(MAX_GUESTS, Math.max(1, next));
+    refreshAvailability();
+  }
+
   function renderTabs() {
     tabsEl.innerHTML = '';
     for (const c of menu.categories) {
@@ -639,6 +780,42 @@ function main() {
     renderSearch();
   });
 
+  navBookingBtn?.addEventListener('click', () => {
+    setView('booking');
+    refreshAvailability();
+  });
+
+  guestsDecBtn?.addEventListener('click', () => {
+    setGuests(guests - 1);
+  });
+
+  guestsIncBtn?.addEventListener('click', () => {
+    setGuests(guests + 1);
+  });
+
+  bookingNameInput?.addEventListener('input', updateBookBtn);
+  bookingPhoneInput?.addEventListener('input', updateBookBtn);
+
+  bookBtn?.addEventListener('click', () => {
+    if (!isBookingValid()) return;
+
+    const payload = JSON.stringify({
+      kind: 'booking',
+      date: bookingDay,
+      time: bookingTime,
+      guests,
+      name: (bookingNameInput?.value || '').trim(),
+      phone: (bookingPhoneInput?.value || '').trim(),
+    });
+
+    if (tg) {
+      tg.sendData(payload);
+      tg.close();
+    } else {
+      alert(payload);
+    }
+  });
+
   navCartBtn?.addEventListener('click', () => {
     renderCart();
     setView('cart');
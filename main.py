@@ -1,31 +1,123 @@
-import asyncio
+import argparse
 import logging
+from datetime import timedelta
 
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from bot.config import load_config
-from bot.db import init_db
+from bot.api import start_api
+from bot.config import Config, load_config
+from bot.db import (
+    close_pool,
+    close_report_pool,
+    init_db,
+    load_occupancy,
+    set_reservation_confirm_timeout,
+    open_pool,
+    open_report_pool,
+    start_writer,
+    stop_writer,
+    unload_occupancy,
+)
+from bot.hall_render import load_table_links
 from bot.handlers import common, webapp
+from bot.jobs import build_job_handlers
+from bot.middlewares import ChatOrderMiddleware
+from bot.notifier import Notifier
+from bot.outbox import OutboxDispatcher
+from bot.runtime import build_session, run
+from bot.scheduler import JobScheduler
+from bot.webhook import run_webhook
 
 
-async def main() -> None:
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cafe Telegram bot")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--webhook",
+        dest="bot_mode",
+        action="store_const",
+        const="webhook",
+        help="serve a webhook instead of polling (overrides BOT_MODE)",
+    )
+    mode.add_argument(
+        "--polling",
+        dest="bot_mode",
+        action="store_const",
+        const="polling",
+        help="use long polling (overrides BOT_MODE)",
     )
+    return parser.parse_args()
 
-    config = load_config()
-    await init_db(config.db_path)
 
-    bot = Bot(token=config.bot_token)
+async def main(config: Config) -> None:
+    await init_db(config.db_path, table_links=load_table_links(config.hall_layout_path))
+    await open_pool(config.db_path, size=config.db_pool_size)
+    await open_report_pool(config.db_path, size=config.db_report_pool_size)
+    await start_writer(config.db_path, batch_window=config.db_write_batch_ms / 1000)
+    await load_occupancy(config.db_path)
+    if config.reservation_confirm_timeout_min:
+        set_reservation_confirm_timeout(
+            config.db_path,
+            timedelta(minutes=config.reservation_confirm_timeout_min),
+        )
+
+    bot = Bot(token=config.bot_token, session=build_session(config))
     dp = Dispatcher(storage=MemoryStorage())
+    ordering = ChatOrderMiddleware(
+        limit=config.update_concurrency,
+        wait=config.bot_mode == "webhook",
+    )
+    dp.update.outer_middleware(ordering)
+    notifier = Notifier(
+        bot,
+        global_rate=config.notify_global_rate,
+        chat_rate=config.notify_chat_rate,
+        group_rate=config.notify_group_rate_per_min / 60,
+    )
+    await notifier.start()
+    dp["notifier"] = notifier
 
     dp.include_router(common.router)
     dp.include_router(webapp.router)
 
-    await dp.start_polling(bot, config=config)
+    scheduler = JobScheduler(config.db_path, build_job_handlers(notifier, config))
+    await scheduler.start()
+    outbox = OutboxDispatcher(
+        config.db_path,
+        notifier,
+        batch_size=config.outbox_batch_size,
+        max_attempts=config.outbox_max_attempts,
+        warn_depth=config.outbox_warn_depth,
+    )
+    await outbox.start()
+    api = await start_api(config)
+
+    try:
+        if config.bot_mode == "webhook":
+            await run_webhook(dp, bot, config, outbox=outbox)
+        else:
+            # getUpdates is refused while a webhook is registered.
+            await bot.delete_webhook()
+            # Updates are fed one by one; ChatOrderMiddleware runs them in parallel.
+            await dp.start_polling(bot, config=config, handle_as_tasks=False)
+    finally:
+        await ordering.drain()
+        if api is not None:
+            await api.cleanup()
+        await scheduler.stop()
+        await outbox.stop()
+        await notifier.stop()
+        unload_occupancy(config.db_path)
+        await stop_writer(config.db_path)
+        await close_report_pool(config.db_path)
+        await close_pool(config.db_path)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    config = load_config(bot_mode=parse_args().bot_mode)
+    run(main(config), event_loop=config.event_loop)
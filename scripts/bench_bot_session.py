@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from aiogram import Bot
+from aiogram.client.telegram import TelegramAPIServer
+import aiohttp
+from aiohttp import web
+
+from bot.runtime import MethodTimeoutSession, uvloop
+
+
+TOKEN = "123456:BENCHMARK"
+
+
+def build_stand_in(delay: float, handshake: float) -> web.Application:
+    """Minimal Bot API: every method answers with a message after `delay` seconds.
+
+    The first request on a new connection waits `handshake` seconds more, like
+    the TCP+TLS setup to api.telegram.org. GET /stats returns (and resets) the
+    number of distinct client connections.
+    """
+
+    connections: set = set()
+
+    async def method(request: web.Request) -> web.Response:
+        peer = request.transport.get_extra_info("peername")
+        data = await request.post()
+        pause = delay + (handshake if peer not in connections else 0.0)
+        connections.add(peer)
+        if pause:
+            await asyncio.sleep(pause)
+        return web.json_response(
+            {
+                "ok": True,
+                "result": {
+                    "message_id": 1,
+                    "date": int(time.time()),
+                    "chat": {"id": int(data.get("chat_id", 1)), "type": "private"},
+                    "text": str(data.get("text", "")),
+                },
+            }
+        )
+
+    async def stats(request: web.Request) -> web.Response:
+        count = len(connections)
+        connections.clear()
+        return web.json_response({"connections": count})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", method)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+def serve_stand_in(port: int, delay: float, handshake: float) -> None:
+    # Own process and loop, so the server does not compete with the client being measured.
+    web.run_app(build_stand_in(delay, handshake), host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+async def wait_for_stand_in(base: str) -> None:
+    async with aiohttp.ClientSession() as http:
+        for _ in range(100):
+            try:
+                async with http.get(f"{base}/stats"):
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("Bot API stand-in did not start")
+
+
+async def bench(label: str, base: str, args: argparse.Namespace) -> None:
+    session = MethodTimeoutSession()
+    session.api = TelegramAPIServer.from_base(base)
+    bot = Bot(token=TOKEN, session=session)
+    latencies: list[float] = []
+    queue: asyncio.Queue[int] = asyncio.Queue()
+
+    async def worker() -> None:
+        while not queue.empty():
+            n = queue.get_nowait()
+            t0 = time.perf_counter()
+            await bot.send_message(chat_id=n % 1000 + 1, text=f"message {n}")
+            latencies.append(time.perf_counter() - t0)
+
+    await bot.send_message(chat_id=1, text="warm-up")
+    elapsed = 0.0
+    for burst in range(args.bursts):
+        if burst:
+            # Idle like a quiet hour; connections may expire meanwhile.
+            await asyncio.sleep(args.gap)
+        for n in range(args.messages):
+            queue.put_nowait(n)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed += time.perf_counter() - t0
+    await bot.session.close()
+
+    async with aiohttp.ClientSession() as http:
+        async with http.get(f"{base}/stats") as resp:
+            connections = (await resp.json())["connections"]
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{label:<20} {args.messages * args.bursts / elapsed:>8.0f} msg/s   "
+        f"median {statistics.median(latencies) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms   "
+        f"connections {connections}"
+    )
+
+
+def run_variant(label: str, loop_name: str, base: str, args: argparse.Namespace) -> None:
+    async def go() -> None:
+        await wait_for_stand_in(base)
+        await bench(label, base, args)
+
+    if loop_name == "uvloop":
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(go())
+    else:
+        asyncio.run(go())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="sendMessage latency/throughput against a local Bot API stand-in: "
+        "the bot's session on the default asyncio loop vs uvloop."
+    )
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--delay", type=float, default=0.0, help="stand-in processing time per call, s")
+    parser.add_argument("--handshake", type=float, default=0.0, help="extra delay on a new connection, s")
+    parser.add_argument("--bursts", type=int, default=1, help="send --messages this many times")
+    parser.add_argument("--gap", type=float, default=20.0, help="idle time between bursts, s")
+    parser.add_argument("--port", type=int, default=8181, help="port for the stand-in")
+    args = parser.parse_args()
+
+    base = f"http://127.0.0.1:{args.port}"
+    server = multiprocessing.Process(target=serve_stand_in, args=(args.port, args.delay, args.handshake), daemon=True)
+    server.start()
+    try:
+        print(
+            f"{args.messages} sendMessage calls, {args.concurrency} concurrent, "
+            f"stand-in delay {args.delay * 1000:.0f} ms, handshake {args.handshake * 1000:.0f} ms, "
+            f"{args.bursts} burst(s) {args.gap:.0f} s apart"
+        )
+        run_variant("asyncio", "asyncio", base, args)
+        if uvloop is not None and hasattr(asyncio, "Runner"):
+            run_variant("uvloop", "uvloop", base, args)
+        else:
+            print("uvloop is not installed: skipped the uvloop runs")
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import aiosqlite
+
+from bot.db import (
+    close_pool,
+    create_reservation,
+    fetch_tables,
+    init_db,
+    open_pool,
+    start_writer,
+    stop_writer,
+)
+
+
+async def count_overlaps(db_path: str) -> int:
+    async with aiosqlite.connect(db_path) as db:
+        cur = await db.execute(
+            """
+            SELECT COUNT(*)
+            FROM reservation a
+            JOIN reservation b
+                ON b.table_id = a.table_id
+                AND b.id > a.id
+                AND b.start_at < a.end_at
+                AND b.end_at > a.start_at
+            WHERE
+                a.status IN ('pending', 'confirmed')
+                AND b.status IN ('pending', 'confirmed')
+            """
+        )
+        (overlaps,) = await cur.fetchone()
+        await cur.close()
+    return int(overlaps)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fire concurrent bookings at one slot and check that no table is double-booked."
+    )
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--no-writer", action="store_true", help="write via pooled connections only")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        await init_db(db_path)
+        await open_pool(db_path, size=8)
+        if not args.no_writer:
+            await start_writer(db_path)
+
+        tables = await fetch_tables(db_path, 1)
+        start_at = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+        start_at = start_at.replace(hour=19)
+
+        async def book(n: int) -> bool:
+            # Everyone wants 19:00; a few guests drift by 30 minutes to make overlaps partial.
+            shift = timedelta(minutes=random.choice([0, 0, 0, 30, -30]))
+            reservation_id = await create_reservation(
+                db_path,
+                user_id=n,
+                table_id=random.choice(tables).id,
+                start_at=start_at + shift,
+                guests=2,
+                name=f"guest {n}",
+                phone="+70000000000",
+            )
+            return reservation_id is not None
+
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(book(n) for n in range(args.bookings)))
+        elapsed = time.perf_counter() - t0
+
+        if not args.no_writer:
+            await stop_writer(db_path)
+        await close_pool(db_path)
+
+        overlaps = await count_overlaps(db_path)
+
+    booked = sum(results)
+    print(f"bookings:   {args.bookings} ({'pool only' if args.no_writer else 'single writer'})")
+    print(f"booked:     {booked}")
+    print(f"conflicts:  {args.bookings - booked}")
+    print(f"elapsed:    {elapsed * 1000:.1f} ms ({args.bookings / elapsed:.0f} bookings/s)")
+    print(f"overlaps:   {overlaps}")
+    if overlaps:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import aiohttp
+from dotenv import load_dotenv
+
+
+def load_updates(path: Path) -> list[dict]:
+    """Updates from a JSON array or a JSONL file (one Update object per line)."""
+
+    text = path.read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        return list(json.loads(text))
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def main() -> None:
+    load_dotenv()
+    port = os.getenv("WEBHOOK_PORT", "").strip() or "8080"
+    path = os.getenv("WEBHOOK_PATH", "").strip() or "/telegram/webhook"
+
+    parser = argparse.ArgumentParser(
+        description="POST recorded Telegram updates to a bot running with --webhook."
+    )
+    parser.add_argument("updates", type=Path, help="JSON array or JSONL file of Update objects")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{port}{path}")
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", "").strip())
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel requests, like max_connections")
+    parser.add_argument("--repeat", type=int, default=1, help="send the whole file this many times")
+    args = parser.parse_args()
+
+    updates = load_updates(args.updates)
+    # Fresh update_id per send so repeated replays look like new updates.
+    next_id = itertools.count(int(time.time()) * 1000)
+    queue: asyncio.Queue[dict] = asyncio.Queue()
+    for _ in range(args.repeat):
+        for update in updates:
+            queue.put_nowait({**update, "update_id": next(next_id)})
+
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+
+    async def worker(session: aiohttp.ClientSession) -> None:
+        while not queue.empty():
+            update = queue.get_nowait()
+            t0 = time.perf_counter()
+            async with session.post(args.url, json=update, headers=headers) as resp:
+                await resp.read()
+                statuses[resp.status] = statuses.get(resp.status, 0) + 1
+            latencies.append(time.perf_counter() - t0)
+
+    total = queue.qsize()
+    t0 = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(worker(session) for _ in range(max(1, args.concurrency))))
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    print(f"updates:    {total} -> {args.url}")
+    print(f"statuses:   {', '.join(f'{k}: {v}' for k, v in sorted(statuses.items()))}")
+    print(f"elapsed:    {elapsed * 1000:.1f} ms ({total / elapsed:.0f} updates/s)")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"latency:    median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms")
+    if set(statuses) - {200}:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from bot.db import init_db
+from bot.hall_render import load_table_links
+
+
+LAYOUT_PATH = Path(__file__).resolve().parent.parent / "assets" / "hall_layout.json"
+
+
+@pytest.fixture
+def table_links() -> list[tuple[str, str]]:
+    return load_table_links(str(LAYOUT_PATH))
+
+
+@pytest.fixture
+def db_path(tmp_path, table_links) -> str:
+    """A fresh database seeded the way main.py seeds it."""
+
+    path = str(tmp_path / "cafe.db")
+    asyncio.run(init_db(path, table_links=table_links))
+    return path
+
+
+@pytest.fixture
+def evening() -> datetime:
+    """Tomorrow at 18:00, a slot start well inside opening hours."""
+
+    tomorrow = datetime.now().date() + timedelta(days=1)
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day, 18, 0)
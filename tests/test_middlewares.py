@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, Update, User
+
+from bot.middlewares import ChatOrderMiddleware
+
+
+class Flow(StatesGroup):
+    a = State()
+    b = State()
+
+
+def _update(update_id: int, chat_id: int, text: str) -> Update:
+    user = User(id=chat_id, is_bot=False, first_name="Guest")
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=chat_id, type="private"),
+            from_user=user,
+            text=text,
+        ),
+    )
+
+
+def _dispatcher(ordering: ChatOrderMiddleware, seen: list) -> Dispatcher:
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.update.outer_middleware(ordering)
+    router = Router()
+
+    @router.message(StateFilter(Flow.a))
+    async def step_a(message: Message, state: FSMContext) -> None:
+        # Yield so the next update of the chat is queued meanwhile.
+        await asyncio.sleep(0.01)
+        await state.set_state(Flow.b)
+        seen.append(("a", message.text))
+
+    @router.message(StateFilter(Flow.b))
+    async def step_b(message: Message) -> None:
+        seen.append(("b", message.text))
+
+    dp.include_router(router)
+    return dp
+
+
+async def _feed_same_chat(wait: bool) -> list:
+    seen: list = []
+    ordering = ChatOrderMiddleware(wait=wait)
+    dp = _dispatcher(ordering, seen)
+    bot = Bot("42:TEST")
+    await dp.fsm.get_context(bot, chat_id=1, user_id=1).set_state(Flow.a)
+
+    await asyncio.gather(
+        dp.feed_update(bot, _update(1, 1, "first")),
+        dp.feed_update(bot, _update(2, 1, "second")),
+    )
+    await ordering.drain()
+    await bot.session.close()
+    return seen
+
+
+def test_same_chat_updates_see_the_state_left_by_the_previous_one():
+    assert asyncio.run(_feed_same_chat(wait=False)) == [("a", "first"), ("b", "second")]
+
+
+def test_same_chat_updates_see_the_new_state_in_webhook_mode():
+    assert asyncio.run(_feed_same_chat(wait=True)) == [("a", "first"), ("b", "second")]
+
+
+async def _feed_two_chats() -> list:
+    seen: list = []
+    ordering = ChatOrderMiddleware()
+    dp = _dispatcher(ordering, seen)
+    bot = Bot("42:TEST")
+    for chat_id in (1, 2):
+        await dp.fsm.get_context(bot, chat_id=chat_id, user_id=chat_id).set_state(Flow.a)
+
+    await dp.feed_update(bot, _update(1, 1, "one"))
+    await dp.feed_update(bot, _update(2, 2, "two"))
+    await ordering.drain()
+    await bot.session.close()
+    return seen
+
+
+def test_other_chats_keep_their_own_state():
+    assert sorted(asyncio.run(_feed_two_chats())) == [("a", "one"), ("a", "two")]
+
+
+async def _feed_failing(with_error_handler: bool) -> list:
+    caught: list = []
+    ordering = ChatOrderMiddleware()
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.update.outer_middleware(ordering)
+
+    @dp.message()
+    async def boom(message: Message) -> None:
+        raise RuntimeError(message.text)
+
+    if with_error_handler:
+
+        @dp.errors()
+        async def on_error(event) -> None:
+            caught.append(str(event.exception))
+
+    bot = Bot("42:TEST")
+    await dp.feed_update(bot, _update(1, 1, "boom"))
+    await ordering.drain()
+    await bot.session.close()
+    return caught
+
+
+def test_detached_failures_reach_the_errors_router():
+    assert asyncio.run(_feed_failing(with_error_handler=True)) == ["boom"]
+
+
+def test_unhandled_detached_failures_are_logged(caplog):
+    assert asyncio.run(_feed_failing(with_error_handler=False)) == []
+    assert "Update 1 failed" in caplog.text
@@ -0,0 +1,52 @@
+import asyncio
+import sqlite3
+from datetime import datetime
+
+import aiosqlite
+
+from bot.db import SCHEMA_PATH
+from bot.migrations import MIGRATIONS, migrate
+
+
+def _baseline_db(path: str) -> None:
+    """A database as the baseline release left it (user_version 0)."""
+
+    with sqlite3.connect(path) as db:
+        db.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+        db.executemany(
+            "INSERT INTO menu_item(category, title, price_cents, is_active) VALUES (?, ?, ?, ?)",
+            [("Блины", "Сырники", 500, 0), ("Блины", "Сырники", 550, 1)],
+        )
+        db.execute("INSERT INTO cafe_table(code, seats) VALUES ('T1', 2)")
+        db.execute(
+            """
+            INSERT INTO reservation(user_id, table_id, start_at, end_at, guests, name, phone, status)
+            VALUES (1, 1, '2026-03-01T18:00:00', '2026-03-01T20:15:00', 2, 'Гость', '+7', 'pending')
+            """
+        )
+        db.execute("INSERT INTO cafe_order(user_id, type, status, name, phone) VALUES (1, 'pickup', 'new', 'Гость', '+7')")
+        db.execute("INSERT INTO cafe_order_item(order_id, menu_item_id, qty, item_price_cents) VALUES (1, 1, 2, 500)")
+
+
+async def _migrate(path: str) -> tuple[int, int]:
+    async with aiosqlite.connect(path) as db:
+        first = await migrate(db)
+        again = await migrate(db)
+    return first, again
+
+
+def test_baseline_database_is_upgraded_in_place(tmp_path):
+    path = str(tmp_path / "old.db")
+    _baseline_db(path)
+
+    assert asyncio.run(_migrate(path)) == (len(MIGRATIONS), len(MIGRATIONS))
+
+    with sqlite3.connect(path) as db:
+        assert db.execute("PRAGMA user_version").fetchone() == (len(MIGRATIONS),)
+        # Duplicate menu rows collapse onto the active one; order items follow it.
+        assert db.execute("SELECT id, price_cents FROM menu_item").fetchall() == [(2, 550)]
+        assert db.execute("SELECT menu_item_id, item_price_cents FROM cafe_order_item").fetchall() == [(2, 500)]
+        # Wall-clock text times become epoch seconds.
+        assert db.execute("SELECT start_at FROM reservation").fetchone() == (
+            int(datetime(2026, 3, 1, 18, 0).timestamp()),
+        )
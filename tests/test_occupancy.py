@@ -0,0 +1,40 @@
+from datetime import date, datetime, timedelta
+
+from bot.occupancy import OccupancyIndex
+
+
+def _ts(day: date, hour: int) -> int:
+    return int(datetime(day.year, day.month, day.day, hour).timestamp())
+
+
+def test_prune_drops_past_days_and_keeps_overnight_bookings():
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    index = OccupancyIndex()
+    index.add(1, 10, _ts(yesterday, 12), _ts(yesterday, 14))
+    index.add(2, 10, _ts(yesterday, 22), _ts(today, 1))
+    index.add(3, 10, _ts(today, 18), _ts(today, 20))
+
+    assert index.prune(today) == 1
+
+    assert len(index) == 2
+    assert index.day_intervals(10, yesterday) == []
+    assert not index.is_free(10, _ts(today, 0), _ts(today, 2))
+    assert not index.is_free(10, _ts(today, 19), _ts(today, 21))
+    # The overnight booking can still be removed after its first day is gone.
+    index.remove(2)
+    assert index.is_free(10, _ts(today, 0), _ts(today, 2))
+
+
+def test_first_add_of_a_day_prunes_earlier_days():
+    today = date.today()
+    last_week = today - timedelta(days=7)
+    index = OccupancyIndex()
+    index.add(1, 10, _ts(last_week, 12), _ts(last_week, 14))
+    # As if that booking had been added a week ago.
+    index._pruned_on = last_week
+
+    index.add(2, 10, _ts(today, 18), _ts(today, 20))
+
+    assert len(index) == 1
+    assert index.day_intervals(10, last_week) == []
@@ -0,0 +1,69 @@
+import asyncio
+import sqlite3
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+from aiogram.methods import SendMessage
+
+from bot.db import create_reservation, fetch_outbox_depth
+from bot.outbox import OutboxDispatcher
+
+
+class FlakyNotifier:
+    """Fails the first send to `flaky`, always refuses `blocked`."""
+
+    def __init__(self, *, flaky: int, blocked: int) -> None:
+        self.flaky = flaky
+        self.blocked = blocked
+        self.sent: list[tuple[int, str]] = []
+
+    async def send(self, chat_id: int, text: str) -> None:
+        method = SendMessage(chat_id=chat_id, text=text)
+        if chat_id == self.blocked:
+            raise TelegramForbiddenError(method, "bot was blocked by the user")
+        if chat_id == self.flaky:
+            self.flaky = 0
+            raise TelegramNetworkError(method, "connection reset")
+        self.sent.append((chat_id, text))
+
+
+def _statuses(db_path: str) -> dict[int, tuple[str, int]]:
+    with sqlite3.connect(db_path) as db:
+        rows = db.execute("SELECT chat_id, status, attempts FROM outbox").fetchall()
+    return {chat_id: (status, attempts) for chat_id, status, attempts in rows}
+
+
+async def _deliver(db_path: str, when) -> FlakyNotifier:
+    notifier = FlakyNotifier(flaky=-100, blocked=-300)
+    outbox = OutboxDispatcher(db_path, notifier, retry_delay=0)
+    await outbox.start()
+    try:
+        reservation_id = await create_reservation(
+            db_path,
+            user_id=1,
+            table_id=1,
+            start_at=when,
+            guests=2,
+            name="Гость",
+            phone="+7",
+            alert_to=[-100, -200, -300],
+            alert=lambda rid: f"Бронь #{rid}",
+        )
+        assert reservation_id is not None
+        for _ in range(200):
+            if (await fetch_outbox_depth(db_path))[0] == 0:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await outbox.stop()
+    return notifier
+
+
+def test_alerts_are_retried_or_dropped_and_the_outbox_drains(db_path, evening):
+    notifier = asyncio.run(_deliver(db_path, evening))
+
+    assert sorted(chat_id for chat_id, _ in notifier.sent) == [-200, -100]
+    assert _statuses(db_path) == {
+        -100: ("delivered", 2),
+        -200: ("delivered", 1),
+        -300: ("failed", 1),
+    }
@@ -0,0 +1,65 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from bot.db import find_best_fit, init_db
+
+
+def _codes(tables) -> list[str]:
+    return [t.code for t in tables] if tables else []
+
+
+def _links(db_path: str) -> set[tuple[str, str]]:
+    with sqlite3.connect(db_path) as db:
+        rows = db.execute(
+            """
+            SELECT a.code, b.code
+            FROM cafe_table_link l
+            JOIN cafe_table a ON a.id = l.table_id
+            JOIN cafe_table b ON b.id = l.other_table_id
+            """
+        ).fetchall()
+    return {tuple(sorted(row)) for row in rows}
+
+
+def test_every_layout_link_is_seeded(db_path, table_links):
+    expected = {tuple(sorted(pair)) for pair in table_links}
+    assert expected
+    assert _links(db_path) == expected
+
+
+def test_every_table_on_the_plan_is_seeded(db_path):
+    with sqlite3.connect(db_path) as db:
+        codes = {code for (code,) in db.execute("SELECT code FROM cafe_table")}
+    assert codes == {f"T{n}" for n in range(1, 20)}
+
+
+@pytest.mark.parametrize(
+    ("guests", "tables"),
+    [
+        (2, ["T1"]),
+        (6, ["T10"]),
+        (7, ["T12", "T13"]),
+        (10, ["T14", "T15", "T16"]),
+    ],
+)
+def test_best_fit_on_a_fresh_database(db_path, evening, guests, tables):
+    assert _codes(asyncio.run(find_best_fit(db_path, guests, evening))) == tables
+
+
+def test_parties_larger_than_any_joinable_group_get_nothing(db_path, evening):
+    assert asyncio.run(find_best_fit(db_path, 13, evening)) is None
+
+
+def test_removed_link_stays_removed_after_restart(db_path, table_links):
+    with sqlite3.connect(db_path) as db:
+        db.execute(
+            """
+            DELETE FROM cafe_table_link
+            WHERE table_id = (SELECT id FROM cafe_table WHERE code = 'T12')
+            """
+        )
+    asyncio.run(init_db(db_path, table_links=table_links))
+    assert ("T12", "T13") not in _links(db_path)
+    assert ("T17", "T18") in _links(db_path)
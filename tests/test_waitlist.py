@@ -0,0 +1,104 @@
+import asyncio
+import sqlite3
+
+from bot.db import (
+    create_reservation,
+    fetch_reservation,
+    join_waitlist,
+    load_occupancy,
+    unload_occupancy,
+    update_reservation_status,
+)
+from bot.utils import waitlist_promotion_alert, waitlist_promotion_text
+
+
+ADMINS = [-100, -200]
+
+
+def _table_id(db_path: str, code: str) -> int:
+    with sqlite3.connect(db_path) as db:
+        (table_id,) = db.execute("SELECT id FROM cafe_table WHERE code = ?", (code,)).fetchone()
+    return table_id
+
+
+def _outbox(db_path: str) -> list[int]:
+    with sqlite3.connect(db_path) as db:
+        return sorted(chat_id for (chat_id,) in db.execute("SELECT chat_id FROM outbox"))
+
+
+async def _book(db_path: str, code: str, when, user_id: int = 1) -> int:
+    reservation_id = await create_reservation(
+        db_path,
+        user_id=user_id,
+        table_id=_table_id(db_path, code),
+        start_at=when,
+        guests=2,
+        name="Гость",
+        phone="+70000000000",
+    )
+    assert reservation_id is not None
+    return reservation_id
+
+
+async def _set(db_path: str, reservation_id: int, status: str):
+    return await update_reservation_status(
+        db_path,
+        reservation_id,
+        status,
+        alert_to=ADMINS,
+        alert=waitlist_promotion_alert,
+        notice=waitlist_promotion_text,
+    )
+
+
+async def _cancel_with_waitlist(db_path: str, when):
+    await load_occupancy(db_path)
+    try:
+        booking = await _book(db_path, "T14", when)
+        # Twelve guests fit only on T14+T15+T16, so they wait for T14.
+        await join_waitlist(db_path, user_id=7, start_at=when, guests=12, name="Компания", phone="+7")
+        promotions = await _set(db_path, booking, "canceled")
+        reactivated = await _set(db_path, booking, "confirmed")
+        return booking, promotions, reactivated
+    finally:
+        unload_occupancy(db_path)
+
+
+def test_cancel_promotes_the_waitlist_and_queues_its_messages(db_path, evening):
+    _, promotions, _ = asyncio.run(_cancel_with_waitlist(db_path, evening))
+
+    assert [p.user_id for p in promotions] == [7]
+    assert [t.code for t in promotions[0].assignment.tables] == ["T14", "T15", "T16"]
+    assert _outbox(db_path) == sorted([7, *ADMINS])
+
+
+def test_reactivation_is_refused_once_the_table_is_taken(db_path, evening):
+    booking, _, reactivated = asyncio.run(_cancel_with_waitlist(db_path, evening))
+
+    assert reactivated is None
+    assert asyncio.run(fetch_reservation(db_path, booking)).status == "canceled"
+
+
+async def _cancel_and_restore(db_path: str, when):
+    booking = await _book(db_path, "T14", when)
+    await _set(db_path, booking, "canceled")
+    restored = await _set(db_path, booking, "confirmed")
+    # The restored booking holds the table again.
+    rival = await create_reservation(
+        db_path,
+        user_id=2,
+        table_id=_table_id(db_path, "T14"),
+        start_at=when,
+        guests=2,
+        name="Другой",
+        phone="+7",
+    )
+    return booking, restored, rival
+
+
+def test_reactivation_of_a_free_table_succeeds(db_path, evening):
+    booking, restored, rival = asyncio.run(_cancel_and_restore(db_path, evening))
+
+    assert restored == []
+    assert rival is None
+    assert asyncio.run(fetch_reservation(db_path, booking)).status == "confirmed"